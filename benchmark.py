@@ -0,0 +1,255 @@
+"""
+benchmark.py - Pipeline benchmark suite
+Group 6 | DevOps Midterm
+
+Generates the sample schema at each requested size, then times each of the
+five src steps and run_pipeline end to end, recording wall time, rows/s and
+peak RSS. Every size runs in a fresh process so one measurement's memory
+does not leak into the next. Results are saved as JSON, named after the
+current commit, to be compared across commits:
+
+    python benchmark.py --rows 1e3 1e5 1e6
+    python benchmark.py --rows 1e5 --compare benchmark_results/<older>.json
+    python benchmark.py --rows 1e6 --readers pyarrow pyarrow+mmap   # also time these CSV readers
+
+With --compare the exit status is 1 when a stage got slower (or its peak
+RSS grew) by more than --tolerance, so CI can fail on regressions. For very
+large sizes (1e8 rows) use --no-modules and --chunksize, which keep the
+end-to-end run bounded in memory; the module timings load the whole frame.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+import generate_sample_data
+from src.feature_pipeline import STEP_NAMES
+from src.instrumentation import children_peak_rss_mb, peak_rss_mb, reset_peak_rss, rss_mb
+from src.readers import READERS, get_reader
+
+
+RESULTS_DIR = "benchmark_results"
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+MIN_SECONDS = 0.05                  # shorter timings are too noisy to compare
+AS_OF = '2026-01-01'                # fixed data and reference date, so runs are comparable
+STEPS = STEP_NAMES
+
+
+def _round(mb):
+    return None if mb is None else round(mb, 1)
+
+
+def _measure(stage, rows, fn):
+    resettable = reset_peak_rss()
+    rss_before = rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return result, {
+        'rows': rows,
+        'stage': stage,
+        'seconds': round(wall, 6),
+        'cpu_seconds': round(cpu, 6),
+        'rows_per_s': round(rows / wall, 1) if wall else None,
+        'rss_before_mb': _round(rss_before),
+        'peak_rss_mb': _round(peak_rss_mb()),
+        # Without a reset the peak is the process's, not the stage's
+        'peak_is_stage': resettable,
+    }
+
+
+# ─────────────────────────────────────────────
+#  BENCHMARK TASKS (each in a fresh process)
+# ─────────────────────────────────────────────
+
+def _bench_modules(csv_path, rows, readers=()):
+    from src.feature_pipeline import quiet
+    from src.derive_computed_columns import derive_computed_columns
+    from src.encode_categorical_features import encode_categorical_features
+    from src.bin_numeric_ranges import bin_numeric_ranges
+    from src.time_based_feature_extraction import time_based_feature_extraction
+    from src.flag_anomalies_column import flag_anomalies_column
+
+    steps = [
+        lambda d: derive_computed_columns(d, inplace=True),
+        lambda d: encode_categorical_features(d, inplace=True),
+        lambda d: bin_numeric_ranges(d, inplace=True),
+        lambda d: time_based_feature_extraction(d, as_of=AS_OF, inplace=True),
+        lambda d: flag_anomalies_column(d, inplace=True),
+    ]
+    df, record = _measure('read_csv', rows, lambda: pd.read_csv(csv_path))
+    records = [record]
+    for name in readers:
+        reader = get_reader(name)
+        _, record = _measure(f'read_csv[{name}]', rows, lambda: reader.read(csv_path))
+        records.append(record)
+    for name, step in zip(STEPS, steps):
+        with quiet():
+            df, record = _measure(name, rows, lambda: step(df))
+        records.append(record)
+    return records
+
+
+def _bench_pipeline(input_dir, rows, options):
+    import main
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                _, record = _measure('run_pipeline', rows,
+                                     lambda: main.run_pipeline(input_dir, output_dir, as_of=AS_OF, **options))
+            finally:
+                sys.stdout = stdout
+    # Worker processes (--workers / --row-workers) have their own peak
+    children = children_peak_rss_mb()
+    if children is not None and record['peak_rss_mb'] is not None:
+        record['peak_rss_mb'] = round(max(record['peak_rss_mb'], children), 1)
+    return [record]
+
+
+def _in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+# ─────────────────────────────────────────────
+#  RUN / COMPARE
+# ─────────────────────────────────────────────
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmarks(sizes=DEFAULT_ROWS, modules=True, pipeline=True, extra_categoricals=0,
+                   extra_dates=0, pipeline_options=None, data_dir=None, readers=()):
+    """
+    Benchmark each size and return the results document. data_dir keeps the
+    generated CSVs (reused when present) instead of a temporary directory.
+    readers adds a read_csv[<reader>] timing per src/readers.py reader to
+    compare with pd.read_csv.
+    """
+    pipeline_options = pipeline_options or {}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = data_dir or tmp
+        for rows in sizes:
+            name = f'bench_{rows}_{extra_categoricals}c_{extra_dates}d'
+            input_dir = os.path.join(data_dir, name)
+            csv_path = os.path.join(input_dir, 'data.csv')
+            if not os.path.exists(csv_path):
+                _, record = _measure('generate', rows, lambda: generate_sample_data.write_sample(
+                    csv_path, rows, today=AS_OF, extra_categoricals=extra_categoricals,
+                    extra_dates=extra_dates))
+                results.append(record)
+            print(f"  {rows} rows: {os.path.getsize(csv_path) / 1e6:.1f} MB CSV")
+
+            if modules:
+                results += _in_fresh_process(_bench_modules, csv_path, rows, tuple(readers))
+            if pipeline:
+                results += _in_fresh_process(_bench_pipeline, input_dir, rows, pipeline_options)
+            for record in results:
+                if record['rows'] == rows:
+                    print(f"    {record['stage']:<30} {record['seconds']:9.3f} s "
+                          f"{record['rows_per_s'] or 0:14,.0f} rows/s {record['peak_rss_mb'] or 0:9.1f} MB")
+
+    return {
+        'commit': _commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': {'extra_categoricals': extra_categoricals, 'extra_dates': extra_dates,
+                    'pipeline': pipeline_options, 'readers': list(readers)},
+        'results': results,
+    }
+
+
+def compare(baseline, current, tolerance=0.10):
+    """
+    (rows, stage, metric, old, new, ratio) for every shared measurement that
+    regressed by more than tolerance. Timings under MIN_SECONDS in both runs
+    are skipped as noise.
+    """
+    old = {(r['rows'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    for record in current['results']:
+        before = old.get((record['rows'], record['stage']))
+        if before is None:
+            continue
+        for metric in ('seconds', 'peak_rss_mb'):
+            if metric == 'seconds' and max(before[metric], record[metric]) < MIN_SECONDS:
+                continue
+            if record[metric] is None:
+                continue
+            if before[metric] and record[metric] > before[metric] * (1 + tolerance):
+                regressions.append((record['rows'], record['stage'], metric, before[metric], record[metric],
+                                    record[metric] / before[metric]))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline benchmark suite - Group 6")
+    parser.add_argument("--rows", type=lambda s: int(float(s)), nargs="+", default=DEFAULT_ROWS,
+                        help="dataset sizes, e.g. 1e3 1e5 1e6")
+    parser.add_argument("--extra-categoricals", type=int, default=0)
+    parser.add_argument("--extra-dates", type=int, default=0)
+    parser.add_argument("--no-modules", action="store_true", help="skip the per-module timings")
+    parser.add_argument("--no-pipeline", action="store_true", help="skip the end-to-end run_pipeline timing")
+    parser.add_argument("--chunksize", type=int, help="run_pipeline chunksize")
+    parser.add_argument("--row-workers", type=int, help="run_pipeline row_workers")
+    parser.add_argument("--readers", nargs="+", choices=READERS, default=[],
+                        help="also time reading the CSV with these readers")
+    parser.add_argument("--reader", choices=READERS, help="run_pipeline reader")
+    parser.add_argument("--data-dir", help="keep (and reuse) the generated CSVs here")
+    parser.add_argument("--output", help=f"results file (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed slowdown / memory growth before --compare fails (default 0.10)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {k: v for k, v in (('chunksize', args.chunksize), ('row_workers', args.row_workers),
+                                 ('reader', args.reader)) if v}
+    report = run_benchmarks(args.rows, modules=not args.no_modules, pipeline=not args.no_pipeline,
+                            extra_categoricals=args.extra_categoricals, extra_dates=args.extra_dates,
+                            pipeline_options=options, data_dir=args.data_dir, readers=args.readers)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  Saved: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for rows, stage, metric, before, after, ratio in regressions:
+            print(f"  REGRESSION {rows} rows {stage} {metric}: {before} -> {after} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"  No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
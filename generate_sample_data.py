@@ -1,46 +1,116 @@
 """
 generate_sample_data.py
 Generates a sample CSV file and places it in the input/ folder
+
+    python generate_sample_data.py                      # input/sample_data.csv, 1000 rows
+    python generate_sample_data.py --rows 1e7 --extra-categoricals 2 --extra-dates 1
+
+Every column is drawn with whole-array NumPy calls, so large files only cost
+the CSV write. Files with more than chunk_rows rows are generated and
+appended chunk by chunk from one random stream, so memory stays bounded;
+up to chunk_rows rows the output is the same as the original per-row
+generator for the same seed.
 """
 
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+import argparse
 import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_ROWS = 1000
+DEFAULT_SEED = 42
+DEFAULT_PATH = "input/sample_data.csv"
+CHUNK_ROWS = 1_000_000
+ANOMALY_SHARE = 0.05
+
+GENDERS = ['Male', 'Female', 'Other']
+EDUCATION = ['High School', 'Bachelor', 'Master', 'PhD']
+PRODUCT_CATEGORIES = ['Electronics', 'Clothing', 'Food', 'Books', 'Home']
+
+
+def _days_before(today, offsets, span):
+    """YYYY-MM-DD strings of today - offsets: each of the span dates is formatted once"""
+    labels = (today - np.arange(span)).astype(str)
+    return labels[offsets]
+
+
+def generate(n=DEFAULT_ROWS, rng=None, first_id=1, today=None, extra_categoricals=0, extra_dates=0):
+    """
+    n rows with the sample schema, drawn from rng (a np.random.RandomState;
+    default: seeded with DEFAULT_SEED). purchase_date falls in the 365 days
+    before today (default: the current date), formatted as YYYY-MM-DD. extra_categoricals
+    adds columns extra_category_1.. with 10, 20, .. labels; extra_dates adds
+    date columns extra_date_1.. over the last three years.
+    """
+    rng = rng if rng is not None else np.random.RandomState(DEFAULT_SEED)
+    today = np.datetime64(pd.Timestamp(today if today is not None else datetime.now()).date(), 'D')
+
+    income          = rng.randint(20000, 150000, n)
+    purchase_amount = rng.uniform(10, 5000, n).round(2)
+
+    # Inject anomalies
+    anomalies = int(round(n * ANOMALY_SHARE))
+    idx = rng.choice(n, anomalies, replace=False)
+    income[idx]          = rng.randint(200000, 500000, anomalies)
+    purchase_amount[idx] = rng.uniform(8000, 15000, anomalies).round(2)
+
+    data = {
+        'customer_id':      np.arange(first_id, first_id + n),
+        'age':              rng.randint(18, 80, n),
+        'gender':           rng.choice(GENDERS, n),
+        'education':        rng.choice(EDUCATION, n),
+        'income':           income,
+        'purchase_amount':  purchase_amount,
+        'purchase_date':    _days_before(today, rng.randint(0, 365, n), 365),
+        'product_category': rng.choice(PRODUCT_CATEGORIES, n),
+        'rating':           rng.uniform(1, 5, n).round(1),
+        'discount_percent': rng.uniform(0, 50, n).round(2),
+        'shipping_cost':    rng.uniform(0, 50, n).round(2),
+    }
+    for i in range(1, extra_categoricals + 1):
+        labels = np.array([f'group_{i}_{k}' for k in range(10 * i)])
+        data[f'extra_category_{i}'] = labels[rng.randint(0, len(labels), n)]
+    for i in range(1, extra_dates + 1):
+        data[f'extra_date_{i}'] = _days_before(today, rng.randint(0, 3 * 365, n), 3 * 365)
+
+    return pd.DataFrame(data)
+
+
+def write_sample(path=DEFAULT_PATH, rows=DEFAULT_ROWS, seed=DEFAULT_SEED, chunk_rows=CHUNK_ROWS, **options):
+    """Write rows generated rows to path, chunk_rows at a time; options go to generate()"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    rng = np.random.RandomState(seed)
+    for start in range(0, rows, chunk_rows):
+        chunk = generate(min(chunk_rows, rows - start), rng, first_id=start + 1, **options)
+        chunk.to_csv(path, index=False, mode='w' if start == 0 else 'a', header=start == 0)
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a sample CSV with the pipeline's schema")
+    parser.add_argument("--rows", type=lambda s: int(float(s)), default=DEFAULT_ROWS,
+                        help=f"number of rows, e.g. 1e6 (default {DEFAULT_ROWS})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    parser.add_argument("--extra-categoricals", type=int, default=0,
+                        help="add N extra categorical columns")
+    parser.add_argument("--extra-dates", type=int, default=0, help="add N extra date columns")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.makedirs("output", exist_ok=True)
+    output_path = write_sample(args.output, args.rows, args.seed,
+                               extra_categoricals=args.extra_categoricals, extra_dates=args.extra_dates)
 
-os.makedirs("input", exist_ok=True)
-os.makedirs("output", exist_ok=True)
-
-np.random.seed(42)
-n = 1000
-
-income          = np.random.randint(20000, 150000, n)
-purchase_amount = np.random.uniform(10, 5000, n).round(2)
-
-# Inject anomalies
-idx = np.random.choice(n, 50, replace=False)
-income[idx]          = np.random.randint(200000, 500000, 50)
-purchase_amount[idx] = np.random.uniform(8000, 15000, 50).round(2)
-
-data = {
-    'customer_id':      range(1, n + 1),
-    'age':              np.random.randint(18, 80, n),
-    'gender':           np.random.choice(['Male', 'Female', 'Other'], n),
-    'education':        np.random.choice(['High School', 'Bachelor', 'Master', 'PhD'], n),
-    'income':           income,
-    'purchase_amount':  purchase_amount,
-    'purchase_date':    [(datetime.now() - timedelta(days=int(np.random.randint(0, 365)))).strftime('%Y-%m-%d')
-                         for _ in range(n)],
-    'product_category': np.random.choice(['Electronics', 'Clothing', 'Food', 'Books', 'Home'], n),
-    'rating':           np.random.uniform(1, 5, n).round(1),
-    'discount_percent': np.random.uniform(0, 50, n).round(2),
-    'shipping_cost':    np.random.uniform(0, 50, n).round(2),
-}
-
-df = pd.DataFrame(data)
-output_path = "input/sample_data.csv"
-df.to_csv(output_path, index=False)
-
-print(f"Sample CSV generated: {output_path}")
-print(f"Shape: {df.shape}")
-print(df.head(3))
+    print(f"Sample CSV generated: {output_path}")
+    if args.rows <= CHUNK_ROWS:
+        df = pd.read_csv(output_path)
+        print(f"Shape: {df.shape}")
+        print(df.head(3))
+    else:
+        print(f"Rows: {args.rows}")
@@ -6,18 +6,41 @@ Automatically detects CSV files in /input and saves results to /output
 
 import os
 import sys
+import io
+import argparse
+import contextlib
+import json
+import signal
+import threading
+import time
+import traceback
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
 from src.derive_computed_columns import process_csv as derive_columns
-from src.encode_categorical_features import process_csv as encode_features
-from src.bin_numeric_ranges import process_csv as bin_features
-from src.time_based_feature_extraction import process_csv as extract_time_features
+from src.encode_categorical_features import process_csv as encode_features, HIGH_CARDINALITY
+from src.bin_numeric_ranges import process_csv as bin_features, BIN_SPECS, use_bin_specs
+from src.time_based_feature_extraction import process_csv as extract_time_features, recompute_recency
 from src.flag_anomalies_column import process_csv as flag_anomalies
+from src.streaming_pipeline import run_streaming, DEFAULT_CHUNKSIZE
+from src.dtype_policy import print_memory_report
+from src.instrumentation import PROFILERS, StepMetrics, format_table
+from src.column_projection import Projection
+from src.readers import DEFAULT_READER, READERS, read_csv
+from src.writers import APPENDABLE_FORMATS, STREAMABLE_FORMATS, OUTPUT_FORMATS, STEP_SUFFIXES, output_path, write_frame, read_frame
+# The optional modes (partitioned, incremental, result cache, overlapped I/O,
+# watch) are imported where they are used, so a plain run does not load them
 
 
 INPUT_DIR  = "input"
 OUTPUT_DIR = "output"
+METADATA_FILE = "run_metadata.json"
+METRICS_FILE = "run_metrics.json"
+PROFILE_DIR = "profiles"
+POLL_INTERVAL = 0.5     # seconds between scans of input/ in watch mode
+QUEUE_SIZE = 8          # files waiting for a worker in watch mode, beyond one per worker
 
 
 def detect_csv_files(folder):
@@ -29,87 +52,398 @@ def detect_csv_files(folder):
     return csv_files
 
 
-def run_pipeline():
+def process_file(csv_file, input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, chunksize=None,
+                 row_workers=None, save_steps=False, output_format='csv', as_of=None,
+                 incremental=False, float32=False, memory_report=False, profile=None,
+                 features=None, passthrough=False, reader=None, high_cardinality='onehot',
+                 exact_quantiles=False, overlapped=None):
+    """
+    Run all five steps on one CSV and save the FINAL output (plus the four
+    intermediate snapshots when save_steps is set). as_of is the reference
+    time of the recency features; float32 stores the derived ratios as
+    float32; memory_report prints the memory of the generated columns
+    (whole-frame modes only). features limits the input columns read and
+    the FINAL columns written to those the listed features need (see
+    src/column_projection.py), plus every input column with passthrough.
+    reader names the CSV engine (see src/readers.py); high_cardinality the
+    encoding of one-hot columns with many categories (see
+    src/encode_categorical_features.py); exact_quantiles makes the
+    quartiles of a chunked or incremental run exact (see
+    src/global_statistics.py).
+    overlapped, an OverlappedIO (see src/overlapped_io.py) whose loads are
+    _load_input, takes the frame from its prefetch and queues the writes
+    on it, in the whole-file modes; the caller then waits for them with
+    overlapped.finish(csv_file).
+    Returns the summary entry for all_results, with the per-stage
+    measurements under 'metrics', or None if the file failed.
+    """
+    input_path = os.path.join(input_dir, csv_file)
+    base_name  = csv_file.replace('.csv', '')
+    metrics = StepMetrics(profile, os.path.join(output_dir, PROFILE_DIR), base_name)
+    if incremental or chunksize:
+        overlapped = None
+    projection = None
+
+    def read():
+        nonlocal projection
+        if overlapped is not None:
+            # Read on the prefetch thread; read_wait is the part not hidden behind earlier work
+            with metrics.measure('read_wait') as stage:
+                (projection, df), (seconds, cpu_seconds) = overlapped.load(csv_file)
+                stage.rows = len(df)
+            metrics.add('read_csv', len(df), seconds, cpu_seconds)
+            return df
+        with metrics.measure('read_csv') as stage:
+            df = projection.read_csv(input_path) if projection else read_csv(input_path, reader)
+            stage.rows = len(df)
+        return df
+
+    def save(df, suffix):
+        if suffix == '_FINAL' and projection:
+            rest = None
+            if projection.passthrough and projection.rest:
+                with metrics.measure('read_passthrough', len(df)):
+                    rest = projection.read_rest(input_path)
+            df = projection.select(df, rest)
+        if suffix == '_FINAL' or save_steps:
+            path = output_path(output_dir, base_name, suffix, output_format)
+            if overlapped is not None:
+                # Blocks only while the write queue is full
+                with metrics.measure('write_wait', len(df)):
+                    return overlapped.write(csv_file, df, path, output_format)
+            with metrics.measure('write', len(df)):
+                return write_frame(df, path, output_format)
+
+    print(f"\n{'='*60}")
+    print(f"  Processing: {csv_file}")
+    print(f"{'='*60}")
+
+    try:
+        if features and overlapped is None:
+            # Inside the try: a file lacking a requested column fails on its own
+            projection = Projection.from_csv(input_path, features, passthrough, reader)
+        if incremental:
+            from src.incremental_pipeline import run_incremental
+            info = run_incremental(input_path, output_dir, base_name, save_steps=save_steps,
+                                   output_format=output_format, as_of=as_of, float32=float32,
+                                   metrics=metrics, high_cardinality=high_cardinality,
+                                   exact_quantiles=exact_quantiles)
+        elif chunksize:
+            info = run_streaming(input_path, output_dir, base_name, chunksize,
+                                 save_steps=save_steps, output_format=output_format, as_of=as_of,
+                                 float32=float32, metrics=metrics, projection=projection, reader=reader,
+                                 high_cardinality=high_cardinality, exact_quantiles=exact_quantiles)
+        elif row_workers:
+            info = _process_partitioned(read, save, row_workers, as_of, float32, high_cardinality,
+                                        memory_report, metrics)
+        else:
+            info = _process_in_memory(read, save, as_of, float32, high_cardinality, memory_report, metrics)
+        if projection:
+            columns = projection.output_columns(info.pop('columns'))
+            info.update(original_cols=len(projection.header), final_cols=len(columns),
+                        new_features=len(projection.generated(columns)))
+        else:
+            info.pop('columns', None)
+        info['metrics'] = {'stages': metrics.records(), 'profiles': metrics.close()}
+        return info
+
+    except Exception as e:
+        print(f"\n  ERROR processing {csv_file}: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+    finally:
+        metrics.close()
+
+
+def _process_in_memory(read, save, as_of, float32, high_cardinality, memory_report, metrics):
+    df = read()
+    original_shape = df.shape
+    rows = len(df)
+    print(f"  Rows: {original_shape[0]} | Columns: {original_shape[1]}")
+
+    # The frame is ours, so every step attaches its columns in place
+    # instead of copying a frame that keeps growing
+
+    # Step 1 - Derive Computed Columns
+    print("\nSTEP 1/5: derive_computed_columns")
+    with metrics.measure('derive_computed_columns', rows):
+        df = derive_columns(df, inplace=True, float32=float32)
+    save(df, '_step1_computed')
+
+    # Step 2 - Encode Categorical Features
+    print("\nSTEP 2/5: encode_categorical_features")
+    with metrics.measure('encode_categorical_features', rows):
+        df = encode_features(df, inplace=True, high_cardinality=high_cardinality)
+    save(df, '_step2_encoded')
+
+    # Step 3 - Bin Numeric Ranges
+    print("\nSTEP 3/5: bin_numeric_ranges")
+    with metrics.measure('bin_numeric_ranges', rows):
+        df = bin_features(df, inplace=True)
+    save(df, '_step3_binned')
+
+    # Step 4 - Time-Based Feature Extraction
+    print("\nSTEP 4/5: time_based_feature_extraction")
+    with metrics.measure('time_based_feature_extraction', rows):
+        df = extract_time_features(df, inplace=True, as_of=as_of)
+    save(df, '_step4_time')
+
+    # Step 5 - Flag Anomalies
+    print("\nSTEP 5/5: flag_anomalies_column")
+    with metrics.measure('flag_anomalies_column', rows):
+        df = flag_anomalies(df, inplace=True)
+
+    # Save final output
+    final_path = save(df, '_FINAL')
+
+    print(f"\n  Saved final output: {final_path}")
+    if memory_report:
+        print_memory_report(df, df.columns[original_shape[1]:])
+
+    return {
+        'original_cols': original_shape[1],
+        'final_cols': df.shape[1],
+        'rows': len(df),
+        'new_features': df.shape[1] - original_shape[1],
+        'columns': list(df.columns),
+    }
+
+
+def _process_partitioned(read, save, row_workers, as_of, float32, high_cardinality, memory_report, metrics):
+    from src.partitioned_executor import run_partitioned
+    original_df = read()
+    print(f"  Rows: {len(original_df)} | Columns: {len(original_df.columns)}")
+    print(f"\n  Partitioned mode: {row_workers} worker processes, steps 1-5")
+
+    # The five steps run interleaved across the workers, so they are measured as one stage
+    with metrics.measure('run_partitioned', len(original_df)):
+        frames = run_partitioned(original_df, workers=row_workers, as_of=as_of, float32=float32,
+                                 high_cardinality=high_cardinality)
+    for suffix, df in zip(STEP_SUFFIXES, frames):
+        final_path = save(df, suffix)
+
+    print(f"\n  Saved final output: {final_path}")
+    if memory_report:
+        print_memory_report(df, df.columns[original_df.shape[1]:])
+
+    return {
+        'original_cols': original_df.shape[1],
+        'final_cols': df.shape[1],
+        'rows': len(df),
+        'new_features': df.shape[1] - original_df.shape[1],
+        'columns': list(df.columns),
+    }
+
+
+def _load_input(input_path, features=None, passthrough=False, reader=None):
+    """(projection or None, frame) as process_file reads input_path; for OverlappedIO"""
+    if not features:
+        return None, read_csv(input_path, reader)
+    projection = Projection.from_csv(input_path, features, passthrough, reader)
+    return projection, projection.read_csv(input_path)
+
+
+def _process_file_captured(csv_file, **options):
+    # Runs in a worker process. The log is buffered and handed back so the
+    # parent prints each file's output whole, in order, instead of interleaved
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        info = process_file(csv_file, **options)
+    return info, log.getvalue()
+
+
+def run_pipeline(input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, chunksize=None, workers=1,
+                 row_workers=None, save_steps=False, output_format='csv', as_of=None,
+                 cache_dir=None, cache_max_bytes=None, incremental=False,
+                 float32=False, memory_report=False, profile=None, features=None, passthrough=False,
+                 reader=DEFAULT_READER, high_cardinality='onehot', overlap=False,
+                 exact_quantiles=False):
+    """
+    chunksize: when set, each file is streamed in chunks of that many rows
+               (two passes, memory bounded by the chunk) instead of being
+               loaded whole. The quartiles behind the price edges and the
+               IQR anomaly thresholds then come from a quantile sketch (see
+               src/online_anomaly.py for its error).
+    workers:   number of worker processes; with more than one, each file's
+               five-step run is dispatched to its own process.
+    row_workers: when set, each file is split into row blocks that are
+               processed on that many cores (see src/partitioned_executor.py).
+    save_steps: also write the _step1.._step4 snapshots, not just FINAL.
+    output_format: csv, parquet, feather or npy (see src/writers.py).
+    as_of:     reference time for the days_from_today / is_recent features.
+               Defaults to the start of today, so reruns on the same day give
+               identical outputs; recorded in run_metadata.json.
+    cache_dir: when set, outputs are cached there per input file (see
+               src/result_cache.py) and unchanged files are restored instead
+               of recomputed; least recently used entries beyond
+               cache_max_bytes (default 1 GiB) are evicted.
+    incremental: only process the rows appended to each file since the
+               last incremental run (see src/incremental_pipeline.py);
+               each run costs O(appended rows). Needs csv or npy output.
+    float32:   store price_per_rating, income_purchase_ratio and
+               spending_power_index as float32 (see src/dtype_policy.py).
+    memory_report: print each generated column's dtype and the memory its
+               compact dtype saves (in-memory and partitioned modes).
+    profile:   'cprofile' or 'tracemalloc' adds a profiler to the per-stage
+               measurements (see src/instrumentation.py); .prof files go to
+               output_dir/profiles/. The measurements of every run are
+               written to run_metrics.json.
+    features:  output columns, input columns or step names (derive, encode,
+               bin, time, anomaly) to produce; only the input columns they
+               need are parsed and FINAL holds only them (see
+               src/column_projection.py). Not with incremental.
+    passthrough: with features, FINAL also keeps every input column.
+    reader:    the CSV engine, one of READERS: 'pandas' (default) or the
+               multi-threaded 'pyarrow' parser, '+mmap' to read through a
+               memory map (see src/readers.py). Incremental mode reads its
+               appended byte ranges with pandas.
+    high_cardinality: encoding of one-hot columns with more than
+               MAX_ONEHOT categories: 'onehot' (top categories plus an other
+               flag), 'codes' or 'hash' (see src/encode_categorical_features.py).
+    overlap:   read the next file on a background thread while the current
+               one is processed, and write the outputs through a bounded
+               background writer, so a file's FINAL write overlaps the next
+               file's steps (see src/overlapped_io.py). Whole-file modes
+               with one worker; holds up to three files' frames at once.
+    exact_quantiles: with chunksize, keep the values of the anomaly
+               columns (8 bytes per row each) so the quartiles, and the
+               outputs, are those of the in-memory run. With incremental,
+               the state keeps them, so each run costs O(history).
+    """
+    _check_options(incremental, cache_dir, features, output_format, chunksize)
     start_time = datetime.now()
+    as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp(start_time).normalize()
 
     print("\n" + "="*60)
     print("  FEATURE ENGINEERING PIPELINE - GROUP 6")
     print("  DevOps Midterm | CI/CD Automated Run")
     print("="*60)
     print(f"  Started : {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"  Input   : {INPUT_DIR}/")
-    print(f"  Output  : {OUTPUT_DIR}/")
+    print(f"  Input   : {input_dir}/")
+    print(f"  Output  : {output_dir}/")
+    print(f"  As of   : {as_of}")
     print("="*60)
 
     # Ensure output folder exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
 
     # Auto-detect CSV files
-    csv_files = detect_csv_files(INPUT_DIR)
+    csv_files = detect_csv_files(input_dir)
 
     if not csv_files:
         print("\n  No CSV files found in input/. Generating sample data...")
         import generate_sample_data
-        csv_files = detect_csv_files(INPUT_DIR)
+        generate_sample_data.write_sample(os.path.join(input_dir, 'sample_data.csv'))
+        csv_files = detect_csv_files(input_dir)
 
     print(f"\n  Found {len(csv_files)} CSV file(s): {csv_files}\n")
 
-    all_results = {}
-
-    for csv_file in csv_files:
-        input_path = os.path.join(INPUT_DIR, csv_file)
-        base_name  = csv_file.replace('.csv', '')
-
-        print(f"\n{'='*60}")
-        print(f"  Processing: {csv_file}")
-        print(f"{'='*60}")
+    results = {}
+    metrics = {}
+    options = dict(input_dir=input_dir, output_dir=output_dir, chunksize=chunksize,
+                   row_workers=row_workers, save_steps=save_steps, output_format=output_format,
+                   as_of=as_of, incremental=incremental, float32=float32,
+                   memory_report=memory_report, profile=profile, features=features,
+                   passthrough=passthrough, reader=reader, high_cardinality=high_cardinality,
+                   exact_quantiles=exact_quantiles)
+
+    # Files whose input, code and parameters match a cached run are restored
+    cache = None
+    if cache_dir:
+        from src.result_cache import ResultCache
+        cache = ResultCache(cache_dir, cache_max_bytes)
+    keys = {}
+    pending = csv_files
+    if cache:
+        cache_params = {'as_of': as_of.isoformat(), 'save_steps': save_steps,
+                        'output_format': output_format, 'float32': float32,
+                        'features': features, 'passthrough': passthrough,
+                        'high_cardinality': high_cardinality, 'exact_quantiles': exact_quantiles,
+                        'bins': [spec.to_dict() for spec in BIN_SPECS],
+                        # The execution mode: a result is only restored for the mode that computed it
+                        'chunksize': chunksize, 'row_workers': row_workers}
+        pending = []
+        for csv_file in csv_files:
+            keys[csv_file] = cache.key(os.path.join(input_dir, csv_file), cache_params)
+            info = cache.restore(keys[csv_file], output_dir)
+            if info is None:
+                pending.append(csv_file)
+            else:
+                print(f"  Cached: {csv_file} (outputs restored, not recomputed)")
+                results[csv_file] = info
+                metrics[csv_file] = {'cached': True}
+
+    def finished(csv_file, info):
+        metrics[csv_file] = info.pop('metrics')
+        results[csv_file] = info
+        if cache:
+            base_name = csv_file.replace('.csv', '')
+            cache.store(keys[csv_file], [output_path(output_dir, base_name, suffix, output_format)
+                                         for suffix in STEP_SUFFIXES
+                                         if suffix == '_FINAL' or save_steps], info)
+
+    workers = min(workers, len(pending))
+    if workers > 1:
+        print(f"  Parallel mode: {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_process_file_captured, csv_file, **options)
+                       for csv_file in pending]
+            # Collected in submission order so the log and summary match a serial run
+            for csv_file, future in zip(pending, futures):
+                try:
+                    info, log = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. killed); other files are unaffected
+                    print(f"\n  ERROR processing {csv_file}: {e}")
+                    continue
+                sys.stdout.write(log)
+                if info is not None:
+                    finished(csv_file, info)
+    elif overlap and not (chunksize or incremental):
+        from src.overlapped_io import OverlappedIO
+        print("  Overlapped I/O: prefetching inputs, writing outputs in the background")
+        overlapped = OverlappedIO(lambda csv_file: _load_input(os.path.join(input_dir, csv_file),
+                                                               features, passthrough, reader))
+
+        def settle(csv_file, info):
+            # The file's queued writes finish while the next file is computed
+            try:
+                timings = overlapped.finish(csv_file)
+            except Exception as e:
+                print(f"\n  ERROR writing {csv_file}: {e}")
+                return
+            if info is None:
+                return
+            writes = StepMetrics()
+            for rows, seconds, cpu_seconds in timings:
+                writes.add('write', rows, seconds, cpu_seconds)
+            info['metrics']['stages'] += writes.records()
+            finished(csv_file, info)
 
         try:
-            original_df = pd.read_csv(input_path)
-            print(f"  Rows: {len(original_df)} | Columns: {len(original_df.columns)}")
-
-            # Step 1 - Derive Computed Columns
-            print("\nSTEP 1/5: derive_computed_columns")
-            df = derive_columns(input_path)
-            df.to_csv(f"{OUTPUT_DIR}/{base_name}_step1_computed.csv", index=False)
-
-            # Step 2 - Encode Categorical Features
-            print("\nSTEP 2/5: encode_categorical_features")
-            df = encode_features(df)
-            df.to_csv(f"{OUTPUT_DIR}/{base_name}_step2_encoded.csv", index=False)
-
-            # Step 3 - Bin Numeric Ranges
-            print("\nSTEP 3/5: bin_numeric_ranges")
-            df = bin_features(df)
-            df.to_csv(f"{OUTPUT_DIR}/{base_name}_step3_binned.csv", index=False)
-
-            # Step 4 - Time-Based Feature Extraction
-            print("\nSTEP 4/5: time_based_feature_extraction")
-            df = extract_time_features(df)
-            df.to_csv(f"{OUTPUT_DIR}/{base_name}_step4_time.csv", index=False)
-
-            # Step 5 - Flag Anomalies
-            print("\nSTEP 5/5: flag_anomalies_column")
-            df = flag_anomalies(df)
-
-            # Save final output
-            final_path = f"{OUTPUT_DIR}/{base_name}_FINAL.csv"
-            df.to_csv(final_path, index=False)
-
-            all_results[csv_file] = {
-                'original_cols': original_df.shape[1],
-                'final_cols': df.shape[1],
-                'rows': len(df),
-                'new_features': df.shape[1] - original_df.shape[1]
-            }
-
-            print(f"\n  Saved final output: {final_path}")
-
-        except Exception as e:
-            print(f"\n  ERROR processing {csv_file}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
+            previous = None
+            for i, csv_file in enumerate(pending):
+                overlapped.prefetch(csv_file)
+                if i + 1 < len(pending):
+                    overlapped.prefetch(pending[i + 1])
+                info = process_file(csv_file, overlapped=overlapped, **options)
+                if previous:
+                    settle(*previous)
+                previous = csv_file, info
+            if previous:
+                settle(*previous)
+        finally:
+            overlapped.close()
+    else:
+        for csv_file in pending:
+            info = process_file(csv_file, **options)
+            if info is not None:
+                finished(csv_file, info)
+
+    all_results = {f: results[f] for f in csv_files if f in results}
+
+    write_metadata(output_dir, {'as_of': as_of.isoformat(), 'output_format': output_format,
+                                'save_steps': save_steps, 'files': all_results})
 
     # Final summary
     end_time = datetime.now()
@@ -119,14 +453,16 @@ def run_pipeline():
     print("  PIPELINE SUMMARY")
     print("="*60)
     for fname, info in all_results.items():
-        print(f"\n  File    : {fname}")
-        print(f"  Rows    : {info['rows']}")
-        print(f"  Before  : {info['original_cols']} columns")
-        print(f"  After   : {info['final_cols']} columns")
-        print(f"  Added   : {info['new_features']} new features")
+        _print_file_summary(fname, info, metrics[fname])
+
+    write_metrics(output_dir, {'started': start_time.isoformat(timespec='seconds'),
+                               'duration_seconds': round(duration, 6), 'profile': profile,
+                               'files': {f: metrics[f] for f in all_results}})
 
     print(f"\n  Duration  : {duration:.2f} seconds")
-    print(f"  Output in : {OUTPUT_DIR}/")
+    if cache:
+        print(f"  Cache     : {cache.summary()}")
+    print(f"  Output in : {output_dir}/")
     print("="*60)
     print("  ALL STEPS COMPLETED SUCCESSFULLY")
     print("="*60 + "\n")
@@ -134,5 +470,273 @@ def run_pipeline():
     return all_results
 
 
+def _warm_worker(_):
+    # Unpickling this function imports main, and with it pandas and the
+    # pipeline modules, so the first file does not pay for the imports
+    return os.getpid()
+
+
+def _start_pool(workers):
+    pool = ProcessPoolExecutor(max_workers=workers)
+    list(pool.map(_warm_worker, range(workers)))
+    return pool
+
+
+def watch(input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, workers=1, queue_size=QUEUE_SIZE,
+          poll_interval=POLL_INTERVAL, settle_seconds=None, as_of=None,
+          max_files=None, stop=None, **options):
+    """
+    Daemon mode: watch input_dir and process each CSV once it is completely
+    written (see src/directory_watcher.py), and again whenever it changes
+    (e.g. appended rows with incremental=True).
+
+    Files run on a pool of `workers` processes that is started, with the
+    pipeline imported, before the first file arrives. At most workers +
+    queue_size files are handed to the pool at a time; further files wait
+    on disk until a slot frees up, so a burst of files cannot pile up in
+    memory. as_of defaults to the start of the day each file is processed.
+    options are run_pipeline's per-file options (chunksize, row_workers,
+    save_steps, output_format, incremental, float32, features, ...).
+
+    Runs until stop (a threading.Event) is set, Ctrl+C, or max_files files
+    were processed; the files in progress are finished first. Returns the
+    summary entries of the processed files, which are also kept in
+    run_metadata.json / run_metrics.json after each file.
+    """
+    _check_options(options.get('incremental'), None, options.get('features'),
+                   options.get('output_format', 'csv'), options.get('chunksize'))
+    from src.directory_watcher import DirectoryWatcher
+    stop = stop or threading.Event()
+    os.makedirs(input_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    watcher = DirectoryWatcher(input_dir, settle_seconds=settle_seconds)
+    capacity = workers + queue_size
+    results, metrics = {}, {}
+    in_flight = {}      # future -> (csv_file, signature, as_of, submitted at)
+    processed = 0
+
+    def finished(future):
+        nonlocal pool, processed
+        csv_file, signature, file_as_of, submitted = in_flight.pop(future)
+        watcher.done(csv_file, signature)
+        processed += 1
+        try:
+            info, log = future.result()
+        except Exception as e:
+            # The worker itself died (e.g. killed); the next file gets a fresh pool
+            print(f"\n  ERROR processing {csv_file}: {e}")
+            if isinstance(e, BrokenProcessPool) and pool is not None:
+                pool.shutdown(wait=False)
+                pool = None
+            return
+        sys.stdout.write(log)
+        if info is None:
+            return
+        metrics[csv_file] = info.pop('metrics')
+        results[csv_file] = info
+        _print_file_summary(csv_file, info, metrics[csv_file])
+        print(f"  Done in : {time.monotonic() - submitted:.2f} seconds")
+        write_metadata(output_dir, {'as_of': file_as_of.isoformat(),
+                                    'output_format': options.get('output_format', 'csv'),
+                                    'save_steps': options.get('save_steps', False), 'files': results})
+        write_metrics(output_dir, {'started': start_time.isoformat(timespec='seconds'),
+                                   'profile': options.get('profile'), 'files': metrics})
+
+    start_time = datetime.now()
+    pool = _start_pool(workers)
+    print(f"\n  Watching {input_dir}/ with {workers} warm worker(s), up to {capacity} files queued "
+          f"(Ctrl+C to stop)")
+    try:
+        while not stop.is_set() and (max_files is None or processed < max_files):
+            wanted = capacity - len(in_flight)
+            if max_files is not None:
+                wanted = min(wanted, max_files - processed - len(in_flight))
+            if wanted > 0:
+                busy = {name for name, *_ in in_flight.values()}
+                for csv_file, signature in watcher.poll(exclude=busy)[:wanted]:
+                    if pool is None:
+                        pool = _start_pool(workers)
+                    file_as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now().normalize()
+                    print(f"\n  Landed: {csv_file}")
+                    future = pool.submit(_process_file_captured, csv_file, input_dir=input_dir,
+                                         output_dir=output_dir, as_of=file_as_of, **options)
+                    in_flight[future] = (csv_file, signature, file_as_of, time.monotonic())
+            if in_flight:
+                done, _ = wait(list(in_flight), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished(future)
+            else:
+                stop.wait(poll_interval)
+    except KeyboardInterrupt:
+        print("\n  Stopping: finishing the files in progress")
+    finally:
+        for future in list(in_flight):
+            wait([future])
+            finished(future)
+        if pool is not None:
+            pool.shutdown()
+    print(f"\n  Stopped watching after {processed} file(s)")
+    return results
+
+
+def _check_options(incremental, cache_dir, features, output_format, chunksize=None):
+    if incremental and cache_dir:
+        raise ValueError("incremental mode keeps its own state; it cannot be combined with cache_dir")
+    if incremental and features:
+        raise ValueError("incremental mode reads whole lines; it cannot be combined with features")
+    if incremental and output_format not in APPENDABLE_FORMATS:
+        raise ValueError(f"incremental mode appends to its outputs; use one of {APPENDABLE_FORMATS}")
+    if chunksize and output_format not in STREAMABLE_FORMATS:
+        raise ValueError(f"{output_format} output is written in one piece; with chunksize use one of "
+                         f"{STREAMABLE_FORMATS}")
+
+
+def _print_file_summary(fname, info, metrics):
+    print(f"\n  File    : {fname}")
+    print(f"  Rows    : {info['rows']}")
+    if 'new_rows' in info:
+        print(f"  New     : {info['new_rows']} rows processed this run")
+    print(f"  Before  : {info['original_cols']} columns")
+    print(f"  After   : {info['final_cols']} columns")
+    print(f"  Added   : {info['new_features']} new features")
+    if metrics.get('stages'):
+        print(format_table(metrics['stages']))
+
+
+def write_metadata(output_dir, metadata):
+    with open(os.path.join(output_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2, sort_keys=True)
+
+
+def write_metrics(output_dir, metrics):
+    with open(os.path.join(output_dir, METRICS_FILE), 'w') as f:
+        json.dump(metrics, f, indent=2)
+
+
+def read_metadata(output_dir):
+    with open(os.path.join(output_dir, METADATA_FILE)) as f:
+        return json.load(f)
+
+
+def refresh_recency(output_dir=OUTPUT_DIR, as_of=None):
+    """
+    Move a finished run to a new as_of: only the days_from_today / is_recent
+    columns of the step-4 and FINAL outputs are recomputed and rewritten.
+    Every output is refreshed before any is written, so an output that
+    cannot be (one projected without its date column) leaves the run and
+    its metadata untouched.
+    """
+    metadata = read_metadata(output_dir)
+    as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now().normalize()
+    fmt = metadata['output_format']
+    print(f"\n  Refreshing recency features: {metadata['as_of']} -> {as_of.isoformat()}")
+
+    refreshed = {}
+    for csv_file in metadata['files']:
+        base_name = csv_file.replace('.csv', '')
+        for suffix in ['_step4_time', '_FINAL']:
+            path = output_path(output_dir, base_name, suffix, fmt)
+            if not os.path.exists(path):
+                continue
+            # Copied: npy columns are memory maps of the files being rewritten
+            try:
+                refreshed[path] = recompute_recency(read_frame(path, fmt).copy(), as_of, inplace=True)
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}") from e
+
+    for path, df in refreshed.items():
+        write_frame(df, path, fmt)
+        print(f"  Updated: {path}")
+
+    metadata['as_of'] = as_of.isoformat()
+    write_metadata(output_dir, metadata)
+    return metadata
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Feature Engineering Pipeline - Group 6")
+    parser.add_argument("--input-dir", default=INPUT_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--chunksize", type=int, nargs="?", const=DEFAULT_CHUNKSIZE,
+                        help=f"stream each file in row chunks (default {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--workers", type=int, nargs="?", const=os.cpu_count(), default=1,
+                        help="process files in parallel (default: one worker per CPU)")
+    parser.add_argument("--row-workers", type=int, nargs="?", const=os.cpu_count(),
+                        help="split each file into row blocks processed on N cores")
+    parser.add_argument("--save-steps", action="store_true",
+                        help="also write the _step1.._step4 intermediate outputs")
+    parser.add_argument("--format", dest="output_format", default="csv", choices=sorted(OUTPUT_FORMATS),
+                        help="output format (parquet/feather need pyarrow)")
+    parser.add_argument("--cache-dir", help="reuse the outputs of unchanged input files cached here")
+    parser.add_argument("--cache-size", type=int,
+                        help="cache size limit in MB (default 1024; least recently used entries are evicted)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only process rows appended since the last --incremental run")
+    parser.add_argument("--as-of", help="reference date for the recency features (default: today)")
+    parser.add_argument("--refresh-recency", action="store_true",
+                        help="only recompute the recency features of the existing outputs for --as-of")
+    parser.add_argument("--float32", action="store_true",
+                        help="store the derived ratio columns as float32 (about 7 significant digits)")
+    parser.add_argument("--exact-quantiles", action="store_true",
+                        help="with --chunksize or --incremental, keep the anomaly columns' values (8 bytes "
+                             "per row each) so the quartile edges and IQR thresholds are exact")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print the memory each generated column takes and saves")
+    parser.add_argument("--features", nargs="+",
+                        help="only read the input columns these outputs / input columns / steps "
+                             "(derive encode bin time anomaly) need, and only write them to FINAL")
+    parser.add_argument("--passthrough", action="store_true",
+                        help="with --features, also keep every input column in FINAL")
+    parser.add_argument("--high-cardinality", choices=HIGH_CARDINALITY, default='onehot',
+                        help="encoding of one-hot columns with many categories: top categories + other "
+                             "(default), integer codes, or hashed flags")
+    parser.add_argument("--reader", choices=READERS, default=DEFAULT_READER,
+                        help="CSV parser: pandas, or pyarrow's multi-threaded one with the declared schema; "
+                             "+mmap reads through a memory map")
+    parser.add_argument("--bin-spec", action="append", metavar="FILE",
+                        help="JSON file of further bins for the bin step (see src/bin_spec.py); repeatable")
+    parser.add_argument("--overlap", action="store_true",
+                        help="prefetch the next file and write outputs on background threads while "
+                             "the current file is computed")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running: process each CSV as it lands in the input folder, "
+                             "on warm --workers processes")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL,
+                        help=f"with --watch, seconds between scans of the input folder (default {POLL_INTERVAL})")
+    parser.add_argument("--settle", type=float,
+                        help="with --watch, seconds a file must stay unchanged before it is processed "
+                             "(default 1)")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help=f"with --watch, files queued beyond one per worker (default {QUEUE_SIZE})")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="also profile each stage (cProfile files in output/profiles/, or tracemalloc peaks)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    run_pipeline()
+    args = parse_args()
+    for path in args.bin_spec or []:
+        use_bin_specs(path)
+    if args.refresh_recency:
+        refresh_recency(output_dir=args.output_dir, as_of=args.as_of)
+    elif args.watch:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        watch(input_dir=args.input_dir, output_dir=args.output_dir, workers=args.workers,
+              queue_size=args.queue_size, poll_interval=args.poll_interval, settle_seconds=args.settle,
+              as_of=args.as_of, stop=stop, chunksize=args.chunksize, row_workers=args.row_workers,
+              save_steps=args.save_steps, output_format=args.output_format, incremental=args.incremental,
+              float32=args.float32, memory_report=args.memory_report, profile=args.profile,
+              features=args.features, passthrough=args.passthrough, reader=args.reader,
+              high_cardinality=args.high_cardinality, exact_quantiles=args.exact_quantiles)
+    else:
+        run_pipeline(input_dir=args.input_dir, output_dir=args.output_dir,
+                     chunksize=args.chunksize, workers=args.workers, row_workers=args.row_workers,
+                     save_steps=args.save_steps, output_format=args.output_format, as_of=args.as_of,
+                     cache_dir=args.cache_dir,
+                     cache_max_bytes=args.cache_size * 2**20 if args.cache_size is not None else None,
+                     incremental=args.incremental, float32=args.float32,
+                     memory_report=args.memory_report, profile=args.profile,
+                     features=args.features, passthrough=args.passthrough, reader=args.reader,
+                     high_cardinality=args.high_cardinality, overlap=args.overlap,
+                     exact_quantiles=args.exact_quantiles)
@@ -1,6 +1,13 @@
 """
 Feature Engineering Pipeline - Group 6
+
+The step functions are bound eagerly: each shares its name with its
+submodule, and importing a submodule sets that name on the package, which
+would shadow a lazily resolved function. FeaturePipeline, which pulls in the
+streaming statistics and readers, is resolved on first access.
 """
+import importlib
+
 from .derive_computed_columns import derive_computed_columns, process_csv as derive_csv
 from .encode_categorical_features import encode_categorical_features, process_csv as encode_csv
 from .bin_numeric_ranges import bin_numeric_ranges, process_csv as bin_csv
@@ -9,3 +16,25 @@ from .flag_anomalies_column import flag_anomalies_column, process_csv as anomaly
 
 __version__ = "1.0.0"
 __author__ = "Group 6"
+
+# public name -> (submodule, attribute), resolved on first access
+_LAZY_EXPORTS = {
+    'FeaturePipeline': ('feature_pipeline', 'FeaturePipeline'),
+}
+
+__all__ = ['derive_computed_columns', 'derive_csv', 'encode_categorical_features', 'encode_csv',
+           'bin_numeric_ranges', 'bin_csv', 'time_based_feature_extraction', 'time_csv',
+           'flag_anomalies_column', 'anomaly_csv', *_LAZY_EXPORTS]
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _LAZY_EXPORTS[name]
+    value = getattr(importlib.import_module(f'.{module}', __name__), attr)
+    globals()[name] = value     # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -3,72 +3,144 @@ Feature Engineering Module 3: Bin Numeric Ranges
 Group 6 - Groups continuous numerical variables into discrete bins
 """
 
+import functools
+import os
+
 import pandas as pd
 import numpy as np
 
-
-def bin_numeric_ranges(df):
-    df_new = df.copy()
-
-    if 'age' in df_new.columns:
-        bins = [0, 25, 35, 50, 65, 100]
-        labels = ['18-25', '26-35', '36-50', '51-65', '65+']
-        df_new['age_group'] = pd.cut(df_new['age'], bins=bins, labels=labels, include_lowest=True)
-        print(f"  Created: age_group  {labels}")
-
-    if 'income' in df_new.columns:
-        bins = [0, 30000, 50000, 75000, 100000, np.inf]
-        labels = ['Low', 'Lower-Middle', 'Middle', 'Upper-Middle', 'High']
-        df_new['income_bracket'] = pd.cut(df_new['income'], bins=bins, labels=labels)
-        print(f"  Created: income_bracket  {labels}")
-
-    if 'purchase_amount' in df_new.columns:
-        bins = [0, 100, 500, 1000, 2000, np.inf]
-        labels = ['Very Low', 'Low', 'Medium', 'High', 'Very High']
-        df_new['purchase_category'] = pd.cut(df_new['purchase_amount'], bins=bins, labels=labels)
-        print(f"  Created: purchase_category  {labels}")
-
-    if 'rating' in df_new.columns:
-        bins = [0, 2, 3, 4, 5]
-        labels = ['Poor', 'Fair', 'Good', 'Excellent']
-        df_new['rating_category'] = pd.cut(df_new['rating'], bins=bins, labels=labels, include_lowest=True)
-        print(f"  Created: rating_category  {labels}")
-
-    if 'discount_percent' in df_new.columns:
-        bins = [0, 10, 25, 40, 100]
-        labels = ['No Discount', 'Low Discount', 'Medium Discount', 'High Discount']
-        df_new['discount_tier'] = pd.cut(df_new['discount_percent'], bins=bins, labels=labels, include_lowest=True)
-        print(f"  Created: discount_tier  {labels}")
-
-    if 'final_price' in df_new.columns:
-        df_new['price_quartile'] = pd.qcut(df_new['final_price'], q=4,
-                                            labels=['Q1', 'Q2', 'Q3', 'Q4'],
-                                            duplicates='drop')
-        print("  Created: price_quartile (quantile-based Q1-Q4)")
-
-    if 'income_purchase_ratio' in df_new.columns:
-        df_new['spending_ratio_bin'] = pd.cut(df_new['income_purchase_ratio'], bins=5)
-        print("  Created: spending_ratio_bin (5 equal-width bins)")
-
-    return df_new
+from .bin_spec import BinSpec, load_bin_specs
+from .copy_policy import working_copy
+from .feature_registry import REGISTRY, Feature
+from .readers import read_step_input
 
 
-def process_csv(input_file, output_file=None):
+STEP = 'bin'
+QUARTILE_LABELS = ['Q1', 'Q2', 'Q3', 'Q4']
+QUARTILES = [0, 0.25, 0.5, 0.75, 1]
+SPENDING_RATIO_BINS = 5
+
+# The fixed bins (age_group, income_bracket, ...), declared in bins.json (see src/bin_spec.py)
+SPEC_FILE = os.path.join(os.path.dirname(__file__), 'bins.json')
+# os.pathsep-separated JSON files of further bins, set by use_bin_specs for worker processes
+SPEC_FILES_ENV = 'FEATURE_BIN_SPECS'
+
+BIN_SPECS = []
+_spec_files = set()
+
+
+def register_bin_spec(spec):
+    """Add spec as a feature of the bin step"""
+    def cut(cols, params):
+        return spec.bin(cols[spec.source])
+    REGISTRY.add(Feature(spec.output, [spec.source], cut, STEP, note=f"  {spec.labels}"))
+    BIN_SPECS.append(spec)
+
+
+def _load_spec_file(path):
+    path = os.path.abspath(path)
+    if path not in _spec_files:
+        _spec_files.add(path)
+        for spec in load_bin_specs(path):
+            register_bin_spec(spec)
+
+
+def use_bin_specs(path):
+    """
+    Add the bins of a JSON spec file to the bin step, in this process and in
+    the worker processes it starts afterwards. The new columns follow the
+    built-in ones.
+    """
+    _load_spec_file(path)
+    os.environ[SPEC_FILES_ENV] = os.pathsep.join(sorted(_spec_files - {os.path.abspath(SPEC_FILE)}))
+
+
+def equal_width_edges(mn, mx, nbins=SPENDING_RATIO_BINS):
+    """Same edges pd.cut(x, bins=nbins) derives from the data min/max"""
+    if mn == mx:
+        mn -= 0.001 * abs(mn) if mn != 0 else 0.001
+        mx += 0.001 * abs(mx) if mx != 0 else 0.001
+        return np.linspace(mn, mx, nbins + 1, endpoint=True)
+    edges = np.linspace(mn, mx, nbins + 1, endpoint=True)
+    edges[0] -= (mx - mn) * 0.001
+    return edges
+
+
+_load_spec_file(SPEC_FILE)
+
+
+# Specs of the fitted edges, so each chunk or partition reuses one categorical dtype
+@functools.lru_cache(maxsize=64)
+def _quartile_spec(edges):
+    return BinSpec('price_quartile', 'final_price', edges, QUARTILE_LABELS, include_lowest=True)
+
+
+@functools.lru_cache(maxsize=64)
+def _ratio_spec(edges):
+    return BinSpec('spending_ratio_bin', 'income_purchase_ratio', edges)
+
+
+@REGISTRY.feature('price_quartile', inputs=['final_price'], step=STEP,
+                  note=" (quantile-based Q1-Q4)")
+def price_quartile(cols, params):
+    values = cols['final_price']
+    edges = params.get('price_edges')
+    if edges is None:
+        # pd.qcut's edges; with tied quartiles or no values, pd.qcut's own handling
+        edges = values.dropna().quantile(QUARTILES).to_numpy() \
+            if pd.api.types.is_numeric_dtype(values) else None
+        if edges is None or not np.all(np.diff(edges) > 0):
+            return pd.qcut(values, q=4, labels=QUARTILE_LABELS, duplicates='drop')
+    if not np.all(np.diff(edges) > 0):
+        # Tied quartiles: pd.cut drops the duplicate edges (and rejects the four labels)
+        return pd.cut(values, bins=edges, labels=QUARTILE_LABELS, include_lowest=True, duplicates='drop')
+    return _quartile_spec(tuple(edges)).bin(values)
+
+
+@REGISTRY.feature('spending_ratio_bin', inputs=['income_purchase_ratio'], step=STEP,
+                  note=" (5 equal-width bins)")
+def spending_ratio_bin(cols, params):
+    values = cols['income_purchase_ratio']
+    edges = params.get('ratio_edges')
+    if edges is None:
+        mn, mx = (values.min(), values.max()) if pd.api.types.is_numeric_dtype(values) else (np.nan, np.nan)
+        if not (np.isfinite(mn) and np.isfinite(mx)):
+            # Empty, all missing or infinite: pd.cut's own handling
+            return pd.cut(values, bins=SPENDING_RATIO_BINS)
+        edges = equal_width_edges(mn, mx)
+    return _ratio_spec(tuple(edges)).bin(values)
+
+
+for _path in filter(None, os.environ.get(SPEC_FILES_ENV, '').split(os.pathsep)):
+    _load_spec_file(_path)
+
+
+def bin_numeric_ranges(df, price_edges=None, ratio_edges=None, inplace=False, features=None):
+    """
+    price_edges / ratio_edges are optional fitted bin edges for
+    price_quartile and spending_ratio_bin. When given they replace the
+    quantiles and min/max that would otherwise be taken from df. features
+    limits the run to those outputs, as in derive_computed_columns.
+    The fixed bins are the BIN_SPECS: bins.json plus the files given to
+    use_bin_specs.
+    """
+    df_new = working_copy(df, inplace)
+    return REGISTRY.apply(df_new, STEP, {'price_edges': price_edges, 'ratio_edges': ratio_edges},
+                          requested=features, inplace=inplace)
+
+
+def process_csv(input_file, output_file=None, inplace=False, features=None, reader=None):
     print("\n" + "="*55)
     print("MODULE 3: BIN NUMERIC RANGES")
     print("="*55)
 
-    if isinstance(input_file, str):
-        df = pd.read_csv(input_file)
-        print(f"Loaded: {input_file}")
-    else:
-        df = input_file.copy()
-        print("Loaded DataFrame from previous step")
+    df = read_step_input(input_file, inplace, features, reader)
 
-    print(f"Original shape: {df.shape}")
-    df_processed = bin_numeric_ranges(df)
+    original_shape = df.shape
+    print(f"Original shape: {original_shape}")
+    df_processed = bin_numeric_ranges(df, inplace=True)
     print(f"New shape: {df_processed.shape}")
-    print(f"Added {df_processed.shape[1] - df.shape[1]} new columns")
+    print(f"Added {df_processed.shape[1] - original_shape[1]} new columns")
 
     if output_file:
         df_processed.to_csv(output_file, index=False)
@@ -0,0 +1,120 @@
+"""
+Bin Specs
+Group 6 - Declarative bins applied with sorted-edge lookups
+
+    spec = BinSpec('age_group', 'age', [0, 25, 35, 50, 65, 100],
+                   ['18-25', '26-35', '36-50', '51-65', '65+'], include_lowest=True)
+    df['age_group'] = spec.bin(df['age'])
+
+A spec names the output column, its source column, the bin edges, the
+labels (default: the interval text pd.cut prints, e.g. '(0.5, 1.25]') and
+the closed side of the bins. bin() gives what pd.cut gives for the same
+arguments - an ordered categorical, missing for missing values and values
+outside the edges - from a sorted-edge lookup instead: the categorical
+dtype is built once per spec and shared by every frame, chunk and
+partition binned with it, and each call only computes int8 codes, with no
+Interval objects. The codes count the edges below each value: one
+vectorized comparison per edge for up to COMPARE_EDGES edges, else one
+np.searchsorted.
+
+Specs load from JSON, so bins can be added without code changes:
+
+    {"bins": [{"output": "tenure_band", "source": "tenure_days",
+               "edges": [0, 30, 365, "inf"], "labels": ["new", "regular", "loyal"],
+               "closed": "right", "include_lowest": true}]}
+
+Edges may be written as numbers or as "inf" / "-inf".
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from .dtype_policy import code_dtype
+
+
+CLOSED_SIDES = ['right', 'left']
+COMPARE_EDGES = 16
+
+
+def interval_labels(edges, right=True, include_lowest=False):
+    """The text of the Interval bins pd.cut makes for these edges (3 significant digits)"""
+    bins = pd.cut(np.empty(0), bins=np.asarray(edges, dtype=np.float64), right=right,
+                  include_lowest=include_lowest).categories
+    return [str(interval) for interval in bins]
+
+
+class BinSpec:
+
+    def __init__(self, output, source, edges, labels=None, closed='right', include_lowest=False):
+        edges = np.array([float(e) for e in edges], dtype=np.float64)
+        if closed not in CLOSED_SIDES:
+            raise ValueError(f"Bin spec {output!r}: closed must be one of {CLOSED_SIDES}, not {closed!r}")
+        if len(edges) < 2 or not np.all(np.diff(edges) > 0):
+            raise ValueError(f"Bin spec {output!r}: edges must be at least two strictly increasing values")
+        if labels is not None and len(labels) != len(edges) - 1:
+            raise ValueError(f"Bin spec {output!r}: {len(edges) - 1} bins need as many labels, "
+                             f"got {len(labels)}")
+        self.output = output
+        self.source = source
+        self.edges = edges
+        self.closed = closed
+        self.include_lowest = include_lowest
+        self.right = closed == 'right'
+        self.labels = list(labels) if labels is not None else \
+            interval_labels(edges, self.right, include_lowest)
+        self.dtype = pd.CategoricalDtype(self.labels, ordered=True)
+        self._code_dtype = code_dtype(len(self.labels))
+
+    def __repr__(self):
+        return f"BinSpec({self.output!r} <- {self.source!r}, {len(self.labels)} bins, closed={self.closed!r})"
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry['output'], entry['source'], entry['edges'], entry.get('labels'),
+                   entry.get('closed', 'right'), entry.get('include_lowest', False))
+
+    def to_dict(self):
+        return {'output': self.output, 'source': self.source,
+                'edges': [e if np.isfinite(e) else str(e) for e in self.edges.tolist()],
+                'labels': self.labels, 'closed': self.closed, 'include_lowest': self.include_lowest}
+
+    def codes(self, values):
+        """Bin number of each value; -1 for missing values and values outside the edges"""
+        x = np.asarray(values, dtype=np.float64)
+        # pd.cut's rule: edges[i-1] < x <= edges[i] is bin i-1 (edges[i-1] <= x < edges[i]
+        # closed left), i.e. i is the number of edges below x (at or below, closed left)
+        if len(self.edges) <= COMPARE_EDGES:
+            ids = np.zeros(len(x), dtype=self._code_dtype)
+            below = np.empty(len(x), dtype=bool)
+            compare = np.greater if self.right else np.greater_equal
+            for edge in self.edges:
+                ids += compare(x, edge, out=below)      # NaN is below no edge: bin -1
+        else:
+            # NaN sorts after every edge, so it falls outside like values past the last
+            ids = np.searchsorted(self.edges, x, side='left' if self.right else 'right')
+        if self.include_lowest:
+            ids[x == self.edges[0]] = 1
+        ids[ids == len(self.edges)] = 0
+        ids -= 1
+        return ids.astype(self._code_dtype, copy=False)
+
+    def bin(self, values):
+        """values (a Series) binned as an ordered categorical Series"""
+        dtype = values.dtype
+        if not (isinstance(dtype, np.dtype) and dtype.kind in 'iuf'):
+            # Nullable, boolean or text columns: pd.cut's own conversions and errors
+            return pd.cut(values, bins=self.edges, labels=self.labels, right=self.right,
+                          include_lowest=self.include_lowest).astype(self.dtype)
+        return pd.Series(pd.Categorical.from_codes(self.codes(values.to_numpy()), dtype=self.dtype),
+                         index=values.index, name=values.name)
+
+
+def load_bin_specs(path):
+    """The BinSpecs of a JSON file: {"bins": [spec, ...]} or a plain list of specs"""
+    with open(path) as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries['bins']
+    return [BinSpec.from_dict(entry) for entry in entries]
@@ -0,0 +1,115 @@
+"""
+Calendar Features
+Group 6 - Calendar features computed once per distinct day
+
+A datetime column with millions of rows usually covers a few hundred days.
+Each value is reduced to its day number (days since 1970-01-01), the
+calendar features are computed for the days that occur, and one integer
+take per feature broadcasts them back to the rows. Month, day and season
+names come out as categoricals over a fixed label list, so every chunk and
+file shares the same categories.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .dtype_policy import FLAG, SMALL_INT, YEAR, DAY_COUNT
+
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+
+# month (1-12) -> index into SEASONS
+SEASON_OF_MONTH = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)
+
+# Output order, matching the columns time_based_feature_extraction creates
+FEATURES = ['year', 'month', 'month_name', 'day', 'day_of_week', 'day_name', 'quarter',
+            'week_of_year', 'is_weekend', 'is_month_start', 'is_month_end',
+            'days_since_epoch', 'season']
+
+CATEGORIES = {'month_name': MONTH_NAMES, 'day_name': DAY_NAMES, 'season': SEASONS}
+
+# Last contiguous table built; chunks of a stream usually fall inside it
+_table_cache = {'first': None, 'table': None}
+
+
+def day_numbers(values):
+    """Days since 1970-01-01 (floored) and a mask of the non-missing rows"""
+    if getattr(values.dt, 'tz', None) is not None:
+        # Calendar features follow the wall clock, as the .dt accessors do
+        values = values.dt.tz_localize(None)
+    days = values.to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    return days.view(np.int64), valid
+
+
+def calendar_table(days):
+    """{feature: array} for each day number in days (which must be valid)"""
+    index = pd.DatetimeIndex(days.astype('datetime64[D]'))
+    month = index.month.to_numpy()
+    day_of_week = index.dayofweek.to_numpy()
+    return {
+        'year':             index.year.to_numpy().astype(YEAR),
+        'month':            month.astype(SMALL_INT),
+        'month_name':       (month - 1).astype(np.int8),
+        'day':              index.day.to_numpy().astype(SMALL_INT),
+        'day_of_week':      day_of_week.astype(SMALL_INT),
+        'day_name':         day_of_week.astype(np.int8),
+        'quarter':          index.quarter.to_numpy().astype(SMALL_INT),
+        'week_of_year':     index.isocalendar().week.to_numpy().astype(SMALL_INT),
+        'is_weekend':       (day_of_week >= 5).astype(FLAG),
+        'is_month_start':   index.is_month_start.astype(FLAG),
+        'is_month_end':     index.is_month_end.astype(FLAG),
+        'days_since_epoch': np.asarray(days, dtype=DAY_COUNT),
+        'season':           SEASON_OF_MONTH[month],
+    }
+
+
+def _range_table(first, last):
+    cached = _table_cache['table']
+    if cached is not None and _table_cache['first'] <= first \
+            and last < _table_cache['first'] + len(cached['year']):
+        return _table_cache['first'], cached
+    table = calendar_table(np.arange(first, last + 1, dtype=np.int64))
+    _table_cache.update(first=first, table=table)
+    return first, table
+
+
+def calendar_features(values):
+    """
+    {feature: column} for a datetime Series, in FEATURES order. Integer
+    features use the compact dtypes of src/dtype_policy.py; rows with a
+    missing date get NaN (or a missing category).
+    """
+    days, valid = day_numbers(values)
+    present = days[valid]
+
+    if present.size == 0:
+        table, positions = calendar_table(np.zeros(1, dtype=np.int64)), np.zeros(len(days), dtype=np.intp)
+    else:
+        first, last = int(present.min()), int(present.max())
+        if last - first < max(len(present), 366):
+            # Dense enough for a table over the whole range: O(n), no sort
+            first, table = _range_table(first, last)
+            positions = np.where(valid, days - first, 0)
+        else:
+            # A few days spread over a long span
+            uniques, inverse = np.unique(present, return_inverse=True)
+            table = calendar_table(uniques)
+            positions = np.zeros(len(days), dtype=np.intp)
+            positions[valid] = inverse
+
+    complete = bool(valid.all())
+    features = {}
+    for name in FEATURES:
+        taken = table[name].take(positions)
+        if name in CATEGORIES:
+            codes = taken if complete else np.where(valid, taken, -1)
+            features[name] = pd.Categorical.from_codes(codes, categories=CATEGORIES[name])
+        elif complete:
+            features[name] = taken
+        else:
+            features[name] = np.where(valid, taken, np.nan)
+    return features
@@ -0,0 +1,178 @@
+"""
+Column Projection
+Group 6 - Reads only the input columns the requested features need
+
+    projection = Projection.from_csv('input/export.csv', ['anomaly', 'purchase_date_month'])
+    df = projection.read_csv('input/export.csv')      # usecols + explicit dtypes
+    ...run the steps on df...
+    final = projection.select(df)                      # just the requested columns
+
+A requested feature is an output column name (price_quartile,
+income_is_anomaly, purchase_date_month, gender_Male, ...), an input column
+to pass through as is, or a whole step: derive, encode, bin, time, anomaly.
+Each is traced back to the input columns it is computed from - through the
+feature registry for the derive / bin columns, through the naming rules of
+the other steps for theirs - and only those are parsed. Float and text
+columns get explicit dtypes from a sample; integer columns are left to
+inference, since a missing value further down would make them float.
+
+With passthrough, the other input columns are read separately and the
+output holds every input column followed by the requested features, as the
+full run would; otherwise it holds only the requested columns.
+"""
+
+import pandas as pd
+
+from . import derive_computed_columns, bin_numeric_ranges    # noqa: F401  (register their features)
+from .calendar_features import FEATURES as CALENDAR_FEATURES
+from .encode_categorical_features import ONEHOT_COLUMNS
+from .feature_registry import REGISTRY
+from .flag_anomalies_column import PRIORITY_COLUMNS
+from .readers import get_reader
+from .schema_inference import infer_datetime_columns, is_datetime_name, text_columns
+
+
+STEP_GROUPS = ['derive', 'encode', 'bin', 'time', 'anomaly']
+SAMPLE_ROWS = 1000
+
+TIME_SUFFIXES = CALENDAR_FEATURES + ['days_from_today', 'is_recent']
+ANOMALY_SUFFIXES = ['anomaly_zscore', 'anomaly_iqr', 'is_anomaly']
+ANOMALY_TOTALS = ['anomaly_score', 'has_any_anomaly']
+
+
+def classify(col, header):
+    """(step, input columns) of a generated column name, or None if no step makes it"""
+    if col in REGISTRY.producers:
+        feature = REGISTRY.producers[col]
+        return feature.step, feature.inputs
+    if col == 'education_encoded':
+        return 'encode', ['education']
+    for source in ONEHOT_COLUMNS:
+        if col.startswith(source + '_') and source in header:
+            return 'encode', [source]
+    if col.endswith('_freq') and col[:-len('_freq')] in header:
+        return 'encode', [col[:-len('_freq')]]
+    for suffix in TIME_SUFFIXES:
+        source = col[:-len(suffix) - 1]
+        if col.endswith('_' + suffix) and source in header and is_datetime_name(source):
+            return 'time', [source]
+    for suffix in ANOMALY_SUFFIXES:
+        source = col[:-len(suffix) - 1]
+        if col.endswith('_' + suffix) and source in PRIORITY_COLUMNS:
+            return 'anomaly', [source]
+    if col in ANOMALY_TOTALS:
+        return 'anomaly', list(PRIORITY_COLUMNS)
+    return None
+
+
+class Projection:
+
+    def __init__(self, header, features, sample, passthrough=False, reader=None):
+        self.header = list(header)
+        self.features = list(features)
+        self.passthrough = passthrough
+        self.reader = get_reader(reader)
+        self.needed = self._resolve(sample)
+        self.sources = [c for c in self.header if c in self.needed]
+        self.rest = [c for c in self.header if c not in self.needed]
+        self.dtypes = {c: sample[c].dtype for c in self.sources if sample[c].dtype.kind == 'f'
+                       or c in text_columns(sample)}
+
+    @classmethod
+    def from_csv(cls, path, features, passthrough=False, reader=None):
+        sample = pd.read_csv(path, nrows=SAMPLE_ROWS)
+        return cls(sample.columns, features, sample, passthrough, reader)
+
+    def _group_columns(self, group, sample):
+        if group in ('derive', 'bin'):
+            return REGISTRY.outputs(group)
+        if group == 'encode':
+            parsed = infer_datetime_columns(sample)
+            return [c for c in text_columns(sample) if c not in parsed]
+        if group == 'time':
+            return [c for c in self.header if is_datetime_name(c)]
+        return ANOMALY_TOTALS
+
+    def _resolve(self, sample):
+        """Every column (input or intermediate) the requested features are computed from"""
+        needed, stack = set(), []
+        for feature in self.features:
+            if feature in STEP_GROUPS:
+                stack.extend(self._group_columns(feature, sample))
+            elif feature in self.header or classify(feature, self.header) is not None:
+                stack.append(feature)
+            else:
+                raise ValueError(f"Unknown feature {feature!r}: not an input column, a generated "
+                                 f"column or one of {STEP_GROUPS}")
+        while stack:
+            col = stack.pop()
+            if col in needed:
+                continue
+            needed.add(col)
+            if col not in self.header:
+                stack.extend(c for c in classify(col, self.header)[1]
+                             if c in self.header or c in REGISTRY.producers)
+        return needed
+
+    @property
+    def registry_features(self):
+        """The derive / bin outputs to compute, for the steps' features argument"""
+        return sorted(c for c in self.needed if c in REGISTRY.producers)
+
+    def read_options(self):
+        return {'usecols': self.sources, 'dtype': self.dtypes}
+
+    def read_csv(self, path):
+        try:
+            return self.reader.read(path, **self.read_options())
+        except (ValueError, TypeError):
+            # A column the sample typed as float turned out to hold text further down
+            return self.reader.read(path, usecols=self.sources)
+
+    def read_chunks(self, path, chunksize):
+        return self.reader.chunks(path, chunksize, **self.read_options())
+
+    def read_rest(self, path, chunksize=None):
+        """The input columns the features do not need, for passthrough"""
+        if chunksize:
+            return self.reader.chunks(path, chunksize, usecols=self.rest)
+        return self.reader.read(path, usecols=self.rest)
+
+    def wanted(self, columns):
+        """The requested columns among a transformed frame's columns, in its order"""
+        groups = {f for f in self.features if f in STEP_GROUPS}
+        names = set(self.features) - groups
+        chosen = []
+        for col in columns:
+            if col in names:
+                chosen.append(col)
+            elif groups and col not in self.header:
+                kind = classify(col, self.header)
+                if kind is not None and kind[0] in groups:
+                    chosen.append(col)
+        return chosen
+
+    def generated(self, columns):
+        return [c for c in columns if c not in self.header]
+
+    def output_columns(self, columns):
+        """The output's columns for a transformed frame with these columns"""
+        wanted = self.wanted(columns)
+        return self.header + self.generated(wanted) if self.passthrough else wanted
+
+    def select(self, df, rest=None):
+        """
+        The output frame: the requested columns of df, after every input
+        column (from df, or else from rest) with passthrough
+        """
+        columns = self.output_columns(df.columns)
+        if not self.passthrough:
+            return df[columns]
+        return pd.DataFrame({c: df[c] if c in df.columns else rest[c] for c in columns}, index=df.index)
+
+
+def read_projected(path, features=None, reader=None):
+    """path read with reader (see src/readers.py), only the input columns features need if given"""
+    if not features:
+        return get_reader(reader).read(path)
+    return Projection.from_csv(path, features, reader=reader).read_csv(path)
@@ -6,57 +6,81 @@ Group 6 - Creates new columns from mathematical operations on existing columns
 import pandas as pd
 import numpy as np
 
+from .copy_policy import working_copy
+from .dtype_policy import ratio_dtype
+from .expressions import compile_formulas
+from .feature_registry import REGISTRY, Feature
+from .readers import read_step_input
 
-def derive_computed_columns(df):
-    df_new = df.copy()
 
-    if 'purchase_amount' in df_new.columns and 'shipping_cost' in df_new.columns:
-        df_new['total_cost'] = (df_new['purchase_amount'] + df_new['shipping_cost']).round(2)
-        print("  Created: total_cost")
+STEP = 'derive'
 
-    if 'purchase_amount' in df_new.columns and 'discount_percent' in df_new.columns:
-        df_new['discount_amount'] = (df_new['purchase_amount'] * df_new['discount_percent'] / 100).round(2)
-        print("  Created: discount_amount")
+# output -> formula over the input columns and the outputs above it (see src/expressions.py);
+# a division by zero (e.g. a rating of 0) gives a missing value
+FORMULAS = {
+    'total_cost':            'round(purchase_amount + shipping_cost, 2)',
+    'discount_amount':       'round(purchase_amount * discount_percent / 100, 2)',
+    'final_price':           'round(total_cost - discount_amount, 2)',
+    'price_per_rating':      'round(final_price / rating, 2)',
+    'income_purchase_ratio': 'round(purchase_amount / income * 100, 2)',
+    'age_squared':           'age ** 2',
+    'spending_power_index':  'round(income / 1000 / age, 2)',
+}
+# Stored as ratio_dtype(float32) on request; they are float64 otherwise
+RATIOS = ['price_per_rating', 'income_purchase_ratio', 'spending_power_index']
 
-    if 'total_cost' in df_new.columns and 'discount_amount' in df_new.columns:
-        df_new['final_price'] = (df_new['total_cost'] - df_new['discount_amount']).round(2)
-        print("  Created: final_price")
 
-    if 'final_price' in df_new.columns and 'rating' in df_new.columns:
-        df_new['price_per_rating'] = (df_new['final_price'] / df_new['rating']).round(2)
-        print("  Created: price_per_rating")
+def _formulas(outputs, float32):
+    return compile_formulas(tuple((output, FORMULAS[output], ratio_dtype(True) if float32 and output in RATIOS
+                                   else None) for output in outputs))
 
-    if 'income' in df_new.columns and 'purchase_amount' in df_new.columns:
-        df_new['income_purchase_ratio'] = (df_new['purchase_amount'] / df_new['income'] * 100).round(2)
-        print("  Created: income_purchase_ratio")
 
-    if 'age' in df_new.columns:
-        df_new['age_squared'] = df_new['age'] ** 2
-        print("  Created: age_squared")
+def _formula_feature(output):
+    formulas = compile_formulas(((output, FORMULAS[output], None),))
 
-    if 'income' in df_new.columns and 'age' in df_new.columns:
-        df_new['spending_power_index'] = ((df_new['income'] / 1000) / df_new['age']).round(2)
-        print("  Created: spending_power_index")
+    def evaluate(cols, params):
+        # One formula on its own; the step evaluates them fused (evaluate_formulas)
+        return _formulas([output], params.get('float32')).evaluate_pandas(cols)[output]
+    REGISTRY.add(Feature(output, formulas.inputs, evaluate, STEP))
 
-    return df_new
 
+for _output in FORMULAS:
+    _formula_feature(_output)
 
-def process_csv(input_file, output_file=None):
+
+def evaluate_formulas(df, features, params, workers):
+    """The planned derive features, compiled together into one blocked evaluation"""
+    values = _formulas([f.name for f in features], params.get('float32')).evaluate(df, len(df), workers)
+    return {output: pd.Series(array, index=df.index, name=output, copy=False) if isinstance(array, np.ndarray)
+            else array for output, array in values.items()}
+
+
+REGISTRY.fuse(STEP, evaluate_formulas)
+
+
+def derive_computed_columns(df, inplace=False, float32=False, features=None):
+    """
+    Computes the derive features of src/feature_registry.py that df has the
+    inputs for. float32=True stores the three ratio columns as float32 (see
+    src/dtype_policy.py); features limits the run to those outputs (of any
+    step) and what they need from this one.
+    """
+    df_new = working_copy(df, inplace)
+    return REGISTRY.apply(df_new, STEP, {'float32': float32}, requested=features, inplace=inplace)
+
+
+def process_csv(input_file, output_file=None, inplace=False, float32=False, features=None, reader=None):
     print("\n" + "="*55)
     print("MODULE 1: DERIVE COMPUTED COLUMNS")
     print("="*55)
 
-    if isinstance(input_file, str):
-        df = pd.read_csv(input_file)
-        print(f"Loaded: {input_file}")
-    else:
-        df = input_file.copy()
-        print("Loaded DataFrame from previous step")
+    df = read_step_input(input_file, inplace, features, reader)
 
-    print(f"Original shape: {df.shape}")
-    df_processed = derive_computed_columns(df)
+    original_shape = df.shape
+    print(f"Original shape: {original_shape}")
+    df_processed = derive_computed_columns(df, inplace=True, float32=float32)
     print(f"New shape: {df_processed.shape}")
-    print(f"Added {df_processed.shape[1] - df.shape[1]} new columns")
+    print(f"Added {df_processed.shape[1] - original_shape[1]} new columns")
 
     if output_file:
         df_processed.to_csv(output_file, index=False)
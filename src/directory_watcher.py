@@ -0,0 +1,80 @@
+"""
+Directory Watcher
+Group 6 - Notices CSV files landing in a folder, once they are completely written
+
+    watcher = DirectoryWatcher('input')
+    for name, signature in watcher.poll():       # call it every poll interval
+        ...process name...
+        watcher.done(name, signature)
+
+The folder is polled (one scandir per call; no platform notification API
+is needed). A file is handed out once its size and modification time have
+not changed for settle_seconds (or it was last modified longer ago than
+that), so a file still being copied in is left alone until the copy
+stops. Files are handed out again only when they change after being marked
+done (e.g. rows appended, for incremental mode).
+Hidden files and other extensions are ignored: writers that cannot finish
+within settle_seconds should write to a temporary name and rename it.
+"""
+
+import os
+import time
+
+
+DEFAULT_SETTLE_SECONDS = 1.0
+
+
+class DirectoryWatcher:
+
+    def __init__(self, folder, suffix='.csv', settle_seconds=None, clock=time.monotonic):
+        self.folder = folder
+        self.suffix = suffix
+        self.settle_seconds = DEFAULT_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self.clock = clock
+        self._seen = {}         # name -> (signature, time it was first seen with it)
+        self._done = {}         # name -> signature it was processed with
+
+    def _scan(self):
+        signatures = {}
+        try:
+            entries = list(os.scandir(self.folder))
+        except FileNotFoundError:
+            return signatures
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.name.endswith(self.suffix):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:       # removed between scandir and stat
+                continue
+            if entry.is_file():
+                signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self, exclude=()):
+        """
+        [(name, signature)] of the files that are new or changed since they
+        were marked done and have been stable for settle_seconds, sorted by
+        name; names in exclude (e.g. files being processed) are skipped
+        """
+        now = self.clock()
+        signatures = self._scan()
+        for name in list(self._seen):
+            if name not in signatures:
+                del self._seen[name]
+
+        ready = []
+        for name, signature in sorted(signatures.items()):
+            seen = self._seen.get(name)
+            if seen is None or seen[0] != signature:
+                self._seen[name] = (signature, now)
+                seen = self._seen[name]
+            settled = (now - seen[1] >= self.settle_seconds
+                       or time.time() - signature[1] / 1e9 >= self.settle_seconds)
+            if self._done.get(name) != signature and name not in exclude and settled:
+                ready.append((name, signature))
+        return ready
+
+    def done(self, name, signature):
+        """Mark name as processed in the state signature (as returned by poll)"""
+        self._done[name] = signature
@@ -0,0 +1,165 @@
+"""
+Dtype Policy
+Group 6 - The dtypes every step emits for its generated columns
+
+Each kind of generated column gets the smallest dtype its known range
+allows. The dtypes are fixed per column, not picked from the data, so every
+chunk, partition and incremental run of a file agrees on the schema.
+
+    FLAG       int8    0/1 indicators: one-hot columns, is_weekend, is_month_start/end,
+                       is_recent, all anomaly flags (int8 rather than bool so the
+                       CSV keeps 0/1)
+    SMALL_INT  int8    month, day, day_of_week, quarter, week_of_year, education_encoded
+    YEAR       int16
+    DAY_COUNT  int32   days_since_epoch, days_from_today
+    code_dtype int8/16/32  category codes (<col>_code): the smallest holding
+                       the fitted number of categories
+    names / seasons / bins are categoricals
+
+Columns that can hold missing values (e.g. the calendar features of a NaT)
+stay float with NaN. The derived ratios can optionally be float32, which
+halves them but rounds their values to about 7 significant digits.
+
+Whether a column holds a missing value is a property of the whole file, so
+runs over parts of it (chunks, partitions) take their dtypes from
+probe_rows(): run on a few rows carrying every column's dtype and first
+missing value, the steps give the dtypes they give the whole file, and
+match_dtypes() casts each part to them. Incremental runs append to outputs
+written earlier, so conform() casts each new batch to the dtypes saved with
+them.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+FLAG = np.int8
+SMALL_INT = np.int8
+YEAR = np.int16
+DAY_COUNT = np.int32
+
+# derive_computed_columns outputs that become float32 with float32=True
+RATIO_COLUMNS = ['price_per_rating', 'income_purchase_ratio', 'spending_power_index']
+
+
+def compact(values, dtype):
+    """values as dtype, unless they hold missing values an integer dtype cannot"""
+    if np.issubdtype(np.dtype(dtype), np.integer) and pd.isna(values).any():
+        return values
+    if isinstance(values, pd.Series):
+        return values.astype(dtype)
+    return np.asarray(values).astype(dtype, copy=False)
+
+
+def code_dtype(categories):
+    """Signed integer dtype for codes 0..categories-1 and -1 (missing)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if categories <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.int64
+
+
+def ratio_dtype(float32=False):
+    return np.float32 if float32 else np.float64
+
+
+def probe_rows(frame, head=1):
+    """
+    The first head rows of frame, plus the first row missing a value in
+    each column that has one; kept with frame's dtypes, so the probes of
+    several chunks concatenate to the dtypes of the whole file
+    """
+    rows = set(range(min(head, len(frame))))
+    missing = frame.isna().to_numpy()
+    for col in np.flatnonzero(missing.any(axis=0)):
+        rows.add(int(np.argmax(missing[:, col])))
+    return frame.iloc[sorted(rows)]
+
+
+def match_dtypes(df, dtypes):
+    """
+    df with each numeric column cast to its dtype in dtypes (e.g. int
+    calendar features to float where another chunk held a NaT). Only casts
+    that keep every value are made.
+    """
+    cast = {}
+    for col in df.columns:
+        have, want = df[col].dtype, dtypes.get(col)
+        if isinstance(have, np.dtype) and isinstance(want, np.dtype) and have != want \
+                and have.kind in 'biuf' and want.kind in 'biuf' and np.can_cast(have, want):
+            cast[col] = want
+    return df.astype(cast) if cast else df
+
+
+def nullable(dtype):
+    """The pandas nullable dtype of a numpy bool / integer dtype (int8 -> Int8)"""
+    if dtype.kind == 'b':
+        return pd.BooleanDtype()
+    return pd.api.types.pandas_dtype(('UInt' + dtype.name[4:]) if dtype.kind == 'u' else 'Int' + dtype.name[3:])
+
+
+def conform(df, dtypes):
+    """
+    df with the columns of dtypes ({column: dtype name}, in order) and, where
+    its values allow, their dtypes: for a batch appended to an output written
+    earlier (incremental mode), so the batch matches the header and writes
+    its numbers as the earlier rows did. A column df lacks is all missing;
+    an integer column holding missing values becomes the nullable integer
+    dtype of the same width, which writes 35 rather than 35.0.
+    """
+    df = df.reindex(columns=list(dtypes))
+    cast = {}
+    for col, name in dtypes.items():
+        values, want = df[col], pd.api.types.pandas_dtype(name)
+        have = values.dtype
+        if have == want:
+            continue
+        missing = values.isna()
+        if isinstance(want, np.dtype) and want.kind in 'biu' and missing.any():
+            want = nullable(want)
+        if missing.all():
+            cast[col] = want
+        elif isinstance(have, np.dtype) and have.kind in 'biuf' and pd.api.types.is_numeric_dtype(want):
+            if have.kind == 'f' and want.kind in 'biu':
+                if (values[~missing] % 1 == 0).all():
+                    cast[col] = want
+            elif np.can_cast(have, want):
+                cast[col] = want
+    return df.astype(cast) if cast else df
+
+
+def default_bytes(values):
+    """Memory the column would take with the pre-policy dtypes (int64 / float64 / object)"""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or not isinstance(dtype, np.dtype):
+        return int(values.astype(object).memory_usage(deep=True, index=False))
+    return len(values) * 8 if dtype.kind in 'biuf' else int(values.memory_usage(deep=True, index=False))
+
+
+def memory_report(df, columns=None):
+    """
+    Per column: dtype, bytes now, bytes with the default dtypes, and bytes
+    saved, largest saving first
+    """
+    rows = []
+    for col in (df.columns if columns is None else columns):
+        values = df[col]
+        now = int(values.memory_usage(deep=True, index=False))
+        before = default_bytes(values)
+        rows.append({'column': col, 'dtype': str(values.dtype), 'bytes': now,
+                     'default_bytes': before, 'saved': before - now})
+    report = pd.DataFrame(rows, columns=['column', 'dtype', 'bytes', 'default_bytes', 'saved'])
+    return report.sort_values('saved', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def print_memory_report(df, columns=None):
+    report = memory_report(df, columns)
+    saved = report[report['saved'] > 0]
+    print(f"\n  Memory report ({len(saved)} compacted column(s)):")
+    for row in saved.itertuples():
+        print(f"    {row.column:<40} {row.dtype:<10} {row.bytes / 1e6:8.2f} MB"
+              f"  (saved {row.saved / 1e6:.2f} MB)")
+    total_before, total_now = report['default_bytes'].sum(), report['bytes'].sum()
+    print(f"  Total: {total_now / 1e6:.2f} MB instead of {total_before / 1e6:.2f} MB"
+          f" (saved {(total_before - total_now) / 1e6:.2f} MB)")
+    return report
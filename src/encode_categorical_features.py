@@ -1,71 +1,207 @@
 """
 Feature Engineering Module 2: Encode Categorical Features
 Group 6 - Converts categorical variables into numerical representations
+
+The one-hot columns are cardinality-aware. Up to MAX_ONEHOT categories get
+one int8 column each, as before. A larger set is encoded with the
+high_cardinality strategy, so the output width stays bounded however many
+categories there are:
+
+    onehot  the MAX_ONEHOT most frequent categories, the rest folded into
+            one <col>__other flag (default)
+    codes   one <col>_code integer column: the category's rank by
+            frequency, -1 for missing or unseen values
+    hash    HASH_WIDTH <col>_hash_<i> flags, each category hashed into one
+
+onehot_matrix() gives the full one-hot encoding of any cardinality as a
+scipy.sparse CSR matrix, for models that take sparse input.
 """
 
 import pandas as pd
 import numpy as np
 
-
-def encode_categorical_features(df):
-    df_new = df.copy()
-
-    categorical_cols = df_new.select_dtypes(include=['object']).columns.tolist()
+from .copy_policy import add_columns, working_copy
+from .dtype_policy import FLAG, SMALL_INT, code_dtype, compact
+from .readers import read_step_input
+from .schema_inference import infer_datetime_columns, is_datetime_name, text_columns
+
+
+ONEHOT_COLUMNS = ['gender', 'product_category']
+ALREADY_ENCODED = ['education', 'gender', 'product_category']
+
+MAX_ONEHOT = 20
+HIGH_CARDINALITY = ['onehot', 'codes', 'hash']
+HASH_WIDTH = 32
+OTHER = 'other'
+
+
+def rank_categories(counts):
+    """
+    The encoded categories from their value counts: sorted by label when
+    there are at most MAX_ONEHOT, otherwise most frequent first (ties by label)
+    """
+    if len(counts) <= MAX_ONEHOT:
+        return sorted(counts.index)
+    return list(counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable').index)
+
+
+def category_codes(values, categories=None):
+    """
+    (codes, categories): each value's position in categories (default:
+    rank_categories of values), -1 for missing or unknown values
+    """
+    return _category_codes(*pd.factorize(values), categories)
+
+
+def _category_codes(value_codes, uniques, categories):
+    # The values are hashed once (factorize); categories are looked up per distinct value
+    if categories is None:
+        counts = np.bincount(value_codes[value_codes >= 0], minlength=len(uniques))
+        categories = rank_categories(pd.Series(counts, index=uniques))
+    lookup = np.append(pd.Index(categories).get_indexer(uniques), -1)
+    return lookup[value_codes], categories
+
+
+def map_categories(values, mapping):
+    """
+    values.map(mapping) (a dict or Series; unmapped and missing values give
+    NaN), looked up once per distinct value instead of once per row
+    """
+    codes, uniques = pd.factorize(values)
+    lookup = pd.Series(uniques).map(mapping)
+    if (codes < 0).any() or lookup.isna().any():
+        looked_up = np.append(lookup.to_numpy(dtype=float, na_value=np.nan), np.nan)[codes]
+    else:
+        looked_up = lookup.to_numpy()[codes]
+    return pd.Series(looked_up, index=values.index, name=values.name)
+
+
+def onehot_columns(values, col, categories=None, high_cardinality='onehot'):
+    """
+    ({name: values}, categories): values encoded over categories (see
+    category_codes), built column by column so no rows x categories block
+    is allocated
+    """
+    if high_cardinality not in HIGH_CARDINALITY:
+        raise ValueError(f"Unknown high_cardinality {high_cardinality!r}; use one of {HIGH_CARDINALITY}")
+    value_codes, uniques = pd.factorize(values)
+    codes, categories = _category_codes(value_codes, uniques, categories)
+    if len(categories) <= MAX_ONEHOT:
+        return {f'{col}_{cat}': (codes == k).view(FLAG) for k, cat in enumerate(categories)}, categories
+
+    if high_cardinality == 'hash':
+        buckets = np.append(pd.util.hash_array(np.asarray(uniques, dtype=object)) % HASH_WIDTH, -1)
+        bucket = buckets[value_codes]
+        return {f'{col}_hash_{i}': (bucket == i).view(FLAG) for i in range(HASH_WIDTH)}, categories
+    if high_cardinality == 'codes':
+        return {f'{col}_code': codes.astype(code_dtype(len(categories)))}, categories
+
+    columns = {f'{col}_{cat}': (codes == k).view(FLAG) for k, cat in enumerate(categories[:MAX_ONEHOT])}
+    # The less frequent categories and values not seen when fitting
+    columns[f'{col}__{OTHER}'] = ((codes >= MAX_ONEHOT) | ((codes == -1) & (value_codes >= 0))).view(FLAG)
+    return columns, categories
+
+
+def onehot_matrix(values, categories=None):
+    """
+    (CSR matrix, categories): the one-hot encoding of values as a
+    rows x categories scipy.sparse matrix with one stored 1 per row (none
+    for missing or unknown values), so its memory follows the rows only
+    """
+    from scipy import sparse
+
+    codes, categories = category_codes(values, categories)
+    present = codes >= 0
+    indptr = np.concatenate([[0], np.cumsum(present)])
+    matrix = sparse.csr_matrix((np.ones(int(present.sum()), dtype=FLAG), codes[present], indptr),
+                               shape=(len(codes), len(categories)))
+    return matrix, categories
+
+
+def find_categorical_columns(df):
+    """Text columns that are not datetime-like"""
+    datetime_cols = infer_datetime_columns(df)
+    return [c for c in text_columns(df) if c not in datetime_cols]
+
+
+def encode_categorical_features(df, onehot_categories=None, frequencies=None,
+                                categorical_columns=None, inplace=False, high_cardinality='onehot'):
+    """
+    onehot_categories / frequencies are optional fitted statistics
+    ({col: [categories]} as from rank_categories, and {col: {value:
+    frequency}}). high_cardinality is the encoding of one-hot columns with
+    more than MAX_ONEHOT categories (see HIGH_CARDINALITY). When given, the
+    one-hot columns and frequency maps come from them instead of from df,
+    so every chunk of a larger file gets the same schema and encoding.
+    categorical_columns skips the datetime probing of the other text
+    columns when the categorical columns are already known.
+
+    Date columns found here are stored parsed, so the time step reuses
+    them instead of converting the same text again.
+    """
+    df_new = working_copy(df, inplace)
 
     # Remove datetime-like columns
-    datetime_cols = []
-    for col in categorical_cols:
-        try:
-            pd.to_datetime(df_new[col])
-            datetime_cols.append(col)
-        except:
-            pass
-    categorical_cols = [c for c in categorical_cols if c not in datetime_cols]
+    text_cols = text_columns(df_new)
+    if categorical_columns is None:
+        parsed = infer_datetime_columns(df_new, text_cols)
+        categorical_cols = [c for c in text_cols if c not in parsed]
+    else:
+        parsed = infer_datetime_columns(df_new, [c for c in text_cols if is_datetime_name(c)])
+        categorical_cols = [c for c in categorical_columns if c in df_new.columns]
+    for col, values in parsed.items():
+        if is_datetime_name(col):
+            df_new[col] = values
 
     print(f"\n  Found {len(categorical_cols)} categorical columns: {categorical_cols}")
+    new = {}
 
     # Label Encoding for ordinal features
     if 'education' in df_new.columns:
         order = ['High School', 'Bachelor', 'Master', 'PhD']
-        df_new['education_encoded'] = df_new['education'].map({v: i for i, v in enumerate(order)})
+        new['education_encoded'] = compact(map_categories(df_new['education'],
+                                                          {v: i for i, v in enumerate(order)}), SMALL_INT)
         print("  Label encoded: education -> education_encoded (0=High School, 3=PhD)")
 
     # One-Hot Encoding for nominal features
-    for col in ['gender', 'product_category']:
+    for col in ONEHOT_COLUMNS:
         if col in df_new.columns:
-            dummies = pd.get_dummies(df_new[col], prefix=col, drop_first=False)
-            # Convert boolean to int
-            dummies = dummies.astype(int)
-            df_new = pd.concat([df_new, dummies], axis=1)
-            print(f"  One-hot encoded: {col} -> {list(dummies.columns)}")
+            values = df_new[col]
+            fitted = onehot_categories.get(col) if onehot_categories is not None else None
+            encoded, categories = onehot_columns(values, col, fitted, high_cardinality)
+            new.update(encoded)
+            if len(categories) <= MAX_ONEHOT:
+                print(f"  One-hot encoded: {col} -> {list(encoded)}")
+            else:
+                print(f"  {high_cardinality.capitalize()} encoded ({len(categories)} categories): "
+                      f"{col} -> {list(encoded)[0]} .. {list(encoded)[-1]} ({len(encoded)} columns)")
 
     # Frequency Encoding for remaining categorical
-    already_encoded = ['education', 'gender', 'product_category']
     for col in categorical_cols:
-        if col not in already_encoded and col in df_new.columns:
-            freq = df_new[col].value_counts(normalize=True)
-            df_new[f'{col}_freq'] = df_new[col].map(freq).round(4)
+        if col not in ALREADY_ENCODED and col in df_new.columns:
+            if frequencies is not None and col in frequencies:
+                freq = pd.Series(frequencies[col], dtype=float)
+            else:
+                freq = df_new[col].value_counts(normalize=True)
+            new[f'{col}_freq'] = map_categories(df_new[col], freq).round(4)
             print(f"  Frequency encoded: {col} -> {col}_freq")
 
-    return df_new
+    return add_columns(df_new, new, inplace)
 
 
-def process_csv(input_file, output_file=None):
+def process_csv(input_file, output_file=None, inplace=False, features=None, reader=None,
+                high_cardinality='onehot'):
     print("\n" + "="*55)
     print("MODULE 2: ENCODE CATEGORICAL FEATURES")
     print("="*55)
 
-    if isinstance(input_file, str):
-        df = pd.read_csv(input_file)
-        print(f"Loaded: {input_file}")
-    else:
-        df = input_file.copy()
-        print("Loaded DataFrame from previous step")
+    df = read_step_input(input_file, inplace, features, reader)
 
-    print(f"Original shape: {df.shape}")
-    df_processed = encode_categorical_features(df)
+    original_shape = df.shape
+    print(f"Original shape: {original_shape}")
+    df_processed = encode_categorical_features(df, inplace=True, high_cardinality=high_cardinality)
     print(f"New shape: {df_processed.shape}")
-    print(f"Added {df_processed.shape[1] - df.shape[1]} new columns")
+    print(f"Added {df_processed.shape[1] - original_shape[1]} new columns")
 
     if output_file:
         df_processed.to_csv(output_file, index=False)
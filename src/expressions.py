@@ -0,0 +1,270 @@
+"""
+Expressions
+Group 6 - Column formulas compiled into one fused, cache-blocked evaluation
+
+    formulas = FormulaSet([('total_cost', 'round(purchase_amount + shipping_cost, 2)', None),
+                           ('final_price', 'round(total_cost - discount_amount, 2)', None)])
+    values = formulas.evaluate(df)          # {output: ndarray}
+
+A formula is a Python expression over column names and numbers with
++ - * / ** and round(x, digits); a name that is another formula's output
+refers to that formula's value. Each formula may give the dtype its output
+is stored as.
+
+The formulas are compiled together into one list of NumPy operations:
+identical subexpressions are computed once, and a formula reads the outputs
+of others directly. evaluate() runs the list over blocks of BLOCK_ROWS rows,
+so the intermediates stay in the CPU cache. Each operation writes through
+out= into a block-sized buffer, and a buffer is reused as soon as its
+value is no longer needed. The outputs are written into their final arrays
+directly. The values are the same as evaluating each formula with pandas
+operators (see evaluate_pandas, used for columns that are not plain NumPy
+numbers).
+
+Division by zero is missing (NaN) rather than inf, so a customer with a
+rating or an income of 0 gets no ratio instead of one that breaks the
+binning and anomaly statistics downstream.
+"""
+
+import ast
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+BLOCK_ROWS = 16384
+
+_BINARY = {ast.Add: 'add', ast.Sub: 'subtract', ast.Mult: 'multiply', ast.Div: 'divide', ast.Pow: 'power'}
+_UFUNCS = {'add': np.add, 'subtract': np.subtract, 'multiply': np.multiply, 'divide': np.true_divide,
+           'power': np.power, 'square': np.square, 'negative': np.negative}
+_OPERATORS = {'add': lambda a, b: a + b, 'subtract': lambda a, b: a - b, 'multiply': lambda a, b: a * b,
+              'power': lambda a, b: a ** b}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class FormulaSet:
+
+    def __init__(self, formulas):
+        """formulas: [(output, expression text, output dtype or None)]"""
+        self._texts = {output: text for output, text, _ in formulas}
+        self._dtypes = {output: dtype for output, _, dtype in formulas}
+        self.outputs = list(self._texts)
+        self.nodes = []         # (op, args); an arg is ('node', index) or ('const', value)
+        self._interned = {}
+        self._output_nodes = {}
+        self._building = set()
+        for output in self.outputs:
+            self._build_output(output)
+        self.inputs = [args[0] for op, args in self.nodes if op == 'column']
+        self._last_use = self._last_uses()
+
+    def __repr__(self):
+        return f"FormulaSet({self.outputs}, {len(self.nodes)} nodes)"
+
+    # ── compilation ──
+
+    def _intern(self, op, *args):
+        key = (op, args)
+        if key not in self._interned:
+            self._interned[key] = len(self.nodes)
+            self.nodes.append(key)
+        return ('node', self._interned[key])
+
+    def _build_output(self, output):
+        if output in self._output_nodes:
+            return self._output_nodes[output]
+        if output in self._building:
+            raise ValueError(f"Formula {output!r} depends on itself")
+        self._building.add(output)
+        try:
+            tree = ast.parse(self._texts[output], mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"Formula {output!r}: {e.msg}") from None
+        value = self._build(tree, output)
+        if self._dtypes[output] is not None:
+            value = self._intern('cast', value, ('const', np.dtype(self._dtypes[output]).str))
+        elif value[0] == 'const':
+            raise ValueError(f"Formula {output!r} uses no column")
+        self._building.discard(output)
+        self._output_nodes[output] = value
+        return value
+
+    def _build(self, tree, output):
+        if isinstance(tree, ast.Constant) and _is_number(tree.value):
+            return ('const', tree.value)
+        if isinstance(tree, ast.Name):
+            if tree.id in self._texts:
+                return self._build_output(tree.id)
+            return self._intern('column', tree.id)
+        if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, (ast.USub, ast.UAdd)):
+            value = self._build(tree.operand, output)
+            if isinstance(tree.op, ast.UAdd):
+                return value
+            return ('const', -value[1]) if value[0] == 'const' else self._intern('negative', value)
+        if isinstance(tree, ast.BinOp) and type(tree.op) in _BINARY:
+            op = _BINARY[type(tree.op)]
+            left, right = self._build(tree.left, output), self._build(tree.right, output)
+            if op == 'divide' and right == ('const', 0):
+                raise ValueError(f"Formula {output!r} divides by the constant 0")
+            if left[0] == right[0] == 'const':
+                return ('const', _UFUNCS[op](left[1], right[1]).item())
+            if op == 'power' and right == ('const', 2):
+                return self._intern('square', left)      # what ndarray ** 2 runs
+            return self._intern(op, left, right)
+        if isinstance(tree, ast.Call) and isinstance(tree.func, ast.Name) and tree.func.id == 'round' \
+                and len(tree.args) == 2 and not tree.keywords and isinstance(tree.args[1], ast.Constant) \
+                and isinstance(tree.args[1].value, int):
+            return self._intern('round', self._build(tree.args[0], output), ('const', tree.args[1].value))
+        raise ValueError(f"Formula {output!r}: unsupported expression {ast.unparse(tree)!r}; "
+                         f"use column names, numbers, + - * / ** and round(x, digits)")
+
+    def _last_uses(self):
+        """Index of the last node reading each node"""
+        last = {}
+        for index, (op, args) in enumerate(self.nodes):
+            for arg in args:
+                if op != 'column' and arg[0] == 'node':
+                    last[arg[1]] = index
+        return last
+
+    # ── NumPy evaluation ──
+
+    @functools.lru_cache(maxsize=16)
+    def _node_dtypes(self, input_dtypes):
+        """The dtype of every node for these input dtypes, by running each op on one value"""
+        samples, dtypes = {}, []
+        inputs = dict(zip(self.inputs, input_dtypes))
+        with np.errstate(all='ignore'):
+            for index, (op, args) in enumerate(self.nodes):
+                if op == 'column':
+                    value = np.ones(1, dtype=inputs[args[0]])
+                elif op == 'cast':
+                    value = np.ones(1, dtype=args[1][1])
+                else:
+                    value = self._apply(op, [samples[a[1]] if a[0] == 'node' else a[1] for a in args])
+                samples[index] = value
+                dtypes.append(value.dtype)
+        return dtypes
+
+    @staticmethod
+    def _apply(op, operands, out=None):
+        if op == 'round':
+            return np.round(operands[0], operands[1], out=out)
+        if op == 'cast':
+            np.copyto(out, operands[0], casting='unsafe')
+            return out
+        result = _UFUNCS[op](*operands, out=out)
+        if op == 'divide' and isinstance(operands[1], np.ndarray):
+            zero = operands[1] == 0
+            if zero.any():
+                np.putmask(result, zero, np.nan)
+        return result
+
+    def evaluate(self, columns, rows=None, workers=1):
+        """
+        {output: ndarray} for a frame (or any mapping of column name to
+        values of length rows). Columns that are not NumPy numbers are
+        evaluated with evaluate_pandas. workers > 1 splits the rows between
+        that many threads (NumPy releases the GIL).
+        """
+        arrays = {name: columns[name] for name in self.inputs}
+        if not all(isinstance(v.dtype, np.dtype) and v.dtype.kind in 'iuf' for v in arrays.values()):
+            return self.evaluate_pandas(columns)
+        arrays = {name: np.asarray(values) for name, values in arrays.items()}
+        if rows is None:
+            rows = len(columns)
+        dtypes = self._node_dtypes(tuple(arrays[name].dtype.str for name in self.inputs))
+        results = {output: np.empty(rows, dtype=dtypes[node[1]])
+                   for output, node in self._output_nodes.items() if node[0] == 'node'}
+        # The node each output array holds; an output computed under another name is copied
+        owners = {}
+        for output, node in self._output_nodes.items():
+            if node[0] == 'node' and node[1] not in owners and self.nodes[node[1]][0] != 'column':
+                owners[node[1]] = output
+
+        bounds = np.linspace(0, rows, max(1, min(workers, rows // BLOCK_ROWS)) + 1).astype(int)
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+        if len(ranges) > 1:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                list(pool.map(lambda r: self._run_range(arrays, results, owners, dtypes, *r), ranges))
+        else:
+            self._run_range(arrays, results, owners, dtypes, 0, rows)
+
+        for output, node in self._output_nodes.items():
+            if node[0] == 'const':
+                continue
+            if owners.get(node[1]) != output:
+                np.copyto(results[output], results[owners[node[1]]] if node[1] in owners
+                          else arrays[self.nodes[node[1]][1][0]])
+        return results
+
+    def _run_range(self, arrays, results, owners, dtypes, start, stop):
+        free = {}       # dtype -> block buffers not holding a live value
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for block_start in range(start, stop, BLOCK_ROWS):
+                block = slice(block_start, min(block_start + BLOCK_ROWS, stop))
+                size = block.stop - block.start
+                values = {}
+                for index, (op, args) in enumerate(self.nodes):
+                    if op == 'column':
+                        values[index] = arrays[args[0]][block]
+                        continue
+                    if index in owners:
+                        out = results[owners[index]][block]
+                    else:
+                        buffers = free.setdefault(dtypes[index], [])
+                        out = buffers.pop()[:size] if buffers else np.empty(BLOCK_ROWS, dtype=dtypes[index])[:size]
+                    operands = [values[a[1]] if a[0] == 'node' else a[1] for a in args]
+                    values[index] = self._apply(op, operands, out=out)
+                    for arg in args:
+                        if arg[0] == 'node' and self._last_use.get(arg[1]) == index:
+                            self._release(arg[1], values, owners, free)
+                for index in list(values):
+                    self._release(index, values, owners, free)
+
+    def _release(self, index, values, owners, free):
+        value = values.pop(index, None)
+        if value is not None and index not in owners and self.nodes[index][0] != 'column':
+            base = value.base if value.base is not None else value
+            free.setdefault(value.dtype, []).append(base)
+
+    # ── pandas evaluation ──
+
+    def evaluate_pandas(self, columns):
+        """{output: Series}, each formula evaluated with pandas operators"""
+        values = {}
+
+        def value(arg):
+            return values[arg[1]] if arg[0] == 'node' else arg[1]
+
+        for index, (op, args) in enumerate(self.nodes):
+            if op == 'column':
+                values[index] = columns[args[0]]
+            elif op == 'round':
+                values[index] = value(args[0]).round(args[1][1])
+            elif op == 'cast':
+                values[index] = value(args[0]).astype(np.dtype(args[1][1]))
+            elif op == 'negative':
+                values[index] = -value(args[0])
+            elif op == 'square':
+                values[index] = value(args[0]) ** 2
+            elif op == 'divide':
+                numerator, denominator = value(args[0]), value(args[1])
+                result = numerator / denominator
+                if isinstance(denominator, pd.Series):
+                    result = result.mask(denominator == 0)
+                values[index] = result
+            else:
+                values[index] = _OPERATORS[op](value(args[0]), value(args[1]))
+        return {output: value(node) for output, node in self._output_nodes.items()}
+
+
+@functools.lru_cache(maxsize=64)
+def compile_formulas(formulas):
+    """FormulaSet of a tuple of (output, expression, dtype) formulas, compiled once"""
+    return FormulaSet(formulas)
@@ -0,0 +1,165 @@
+"""
+Feature Pipeline
+Group 6 - Fit once, transform many: learns the data-dependent parameters of
+all five steps from a reference dataset, saves them to a small JSON file and
+reapplies them to new batches without recomputing anything
+
+    pipeline = FeaturePipeline().fit(reference_df)
+    pipeline.save('output/pipeline.json')
+
+    pipeline = FeaturePipeline.load('output/pipeline.json')
+    features = pipeline.transform(batch_df)
+"""
+
+import contextlib
+import io
+import json
+
+import pandas as pd
+
+from .derive_computed_columns import derive_computed_columns
+from .encode_categorical_features import encode_categorical_features
+from .bin_numeric_ranges import bin_numeric_ranges
+from .time_based_feature_extraction import time_based_feature_extraction, resolve_as_of
+from .flag_anomalies_column import flag_anomalies_column
+from .global_statistics import GlobalStatistics
+from .copy_policy import copy_on_write_enabled, working_copy
+from .dtype_policy import probe_rows
+from .readers import get_reader
+
+
+FORMAT_VERSION = 1
+
+# The five steps, in the order transform_steps yields them
+STEP_NAMES = ['derive_computed_columns', 'encode_categorical_features', 'bin_numeric_ranges',
+              'time_based_feature_extraction', 'flag_anomalies_column']
+
+# Constructor options saved with the params, so a loaded pipeline transforms as the fitted one
+OPTIONS = ['float32', 'high_cardinality', 'features', 'exact_quantiles']
+
+
+def quiet():
+    """Swallow the per-column reports the step functions print"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+class FeaturePipeline:
+
+    def __init__(self, params=None, float32=False, features=None, high_cardinality='onehot',
+                 exact_quantiles=False):
+        self.params = params
+        self.float32 = float32      # float32 ratio columns, see src/dtype_policy.py
+        self.high_cardinality = high_cardinality    # see src/encode_categorical_features.py
+        self.features = features    # derive / bin outputs to compute (default: all), see src/feature_registry.py
+        self.exact_quantiles = exact_quantiles  # exact quartiles in chunked fits, see src/global_statistics.py
+        self.rows = 0
+        self.probe = None
+
+    @property
+    def is_fitted(self):
+        return self.params is not None
+
+    def fit(self, df):
+        """Learn the statistics from one reference DataFrame"""
+        stats = GlobalStatistics(exact=True)
+        with quiet():
+            stats.update(derive_computed_columns(df, float32=self.float32, features=self.features))
+        self.params = stats.finalize()
+        self.rows = stats.rows
+        return self
+
+    def fit_csv(self, input_path, chunksize=None, reader=None, **read_options):
+        """
+        Learn the statistics from a CSV, chunk by chunk when chunksize is set.
+        reader is a src/readers.py engine; read_options (usecols / dtype of a
+        projection) go to it. probe is then a few input rows with the dtypes
+        and missing values of the whole file (see probe_rows in
+        src/dtype_policy.py). Chunked, the quartiles are sketched unless
+        exact_quantiles is set.
+        """
+        stats = GlobalStatistics(exact=self.exact_quantiles or not chunksize)
+        reader = get_reader(reader)
+        chunks = reader.chunks(input_path, chunksize, **read_options) if chunksize \
+            else [reader.read(input_path, **read_options)]
+        probes = []
+        for chunk in chunks:
+            probes.append(probe_rows(chunk))
+            with quiet():
+                stats.update(derive_computed_columns(chunk, float32=self.float32, features=self.features))
+        self.probe = pd.concat(probes, ignore_index=True) if probes else None
+        self.params = stats.finalize()
+        self.rows = stats.rows
+        return self
+
+    def transform_steps(self, df, inplace=False, as_of=None):
+        """
+        Run the five steps with the fitted statistics, yielding the frame after
+        each. With inplace=True the columns are attached to df itself and the
+        same frame is yielded five times, growing as it goes. as_of is the
+        reference time of the recency features (default: now).
+        """
+        if not self.is_fitted:
+            raise RuntimeError("FeaturePipeline is not fitted; call fit() or load() first")
+        p = self.params
+        as_of = resolve_as_of(as_of)
+        steps = [
+            lambda d, i: derive_computed_columns(d, inplace=i, float32=self.float32,
+                                                 features=self.features),
+            lambda d, i: encode_categorical_features(d, onehot_categories=p['onehot_categories'],
+                                                     frequencies=p['frequencies'],
+                                                     categorical_columns=p['categorical_columns'],
+                                                     inplace=i, high_cardinality=self.high_cardinality),
+            lambda d, i: bin_numeric_ranges(d, price_edges=p['price_edges'],
+                                            ratio_edges=p['ratio_edges'], inplace=i,
+                                            features=self.features),
+            lambda d, i: time_based_feature_extraction(d, as_of=as_of, inplace=i),
+            lambda d, i: flag_anomalies_column(d, thresholds=p['thresholds'], inplace=i),
+        ]
+        for step in steps:
+            with quiet():
+                df = step(df, inplace)
+            yield df
+
+    def transform(self, df, inplace=False, as_of=None):
+        """
+        Transform-only fast path: no statistic is recomputed from df. Unless
+        inplace, each step joins its columns to a shallow copy in one concat
+        instead of inserting them one by one (see add_columns in
+        src/copy_policy.py): a one-row transform takes about 17 ms rather
+        than 40.
+        """
+        if not copy_on_write_enabled():
+            # every step would copy the frame; attach to one copy instead
+            df, inplace = working_copy(df, inplace), True
+        for df in self.transform_steps(df, inplace=inplace, as_of=as_of):
+            pass
+        return df
+
+    def fit_transform(self, df, as_of=None):
+        return self.fit(df).transform(df, as_of=as_of)
+
+    def save(self, path):
+        if not self.is_fitted:
+            raise RuntimeError("FeaturePipeline is not fitted; nothing to save")
+        options = {name: getattr(self, name) for name in OPTIONS}
+        with open(path, 'w') as f:
+            json.dump({'format_version': FORMAT_VERSION, 'params': self.params, 'options': options}, f,
+                      separators=(',', ':'), default=_to_json)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported pipeline file version: {data.get('format_version')}")
+        # files saved before the options were stored get the defaults
+        return cls(data['params'], **data.get('options', {}))
+
+
+def _to_json(value):
+    # numpy scalars (counts, categories, edges) -> plain Python values
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (set, frozenset)):     # a features selection
+        return sorted(value)
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
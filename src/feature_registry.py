@@ -0,0 +1,181 @@
+"""
+Feature Registry
+Group 6 - Declarative features: each one names its inputs, outputs and the
+function computing them, and the steps schedule them as a dependency graph
+
+    @REGISTRY.feature('final_price', inputs=['total_cost', 'discount_amount'], step='derive')
+    def final_price(cols, params):
+        return (cols['total_cost'] - cols['discount_amount']).round(2)
+
+A feature's function gets a read-only view of the columns (the frame's own,
+plus the outputs of features computed before it) and the step parameters,
+and returns one Series / array per output (a dict for several outputs).
+
+For a step, plan() keeps the features whose inputs are all present in the
+frame or produced by another kept feature, so a missing column drops the
+whole subtree that depends on it. Restricted to requested outputs, only
+those and what they need are computed. The kept features are grouped into
+levels whose members do not depend on each other; compute() runs each
+level's features concurrently on large frames and returns the outputs in
+registration order, so the column order does not depend on the schedule.
+A step can instead register a fused evaluator, which gets all the planned
+features at once (the derive step compiles its formulas together, see
+src/expressions.py).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .copy_policy import add_columns
+
+
+# Below this many rows a thread hand-off costs more than the column work
+CONCURRENT_MIN_ROWS = 100_000
+
+
+class Feature:
+
+    def __init__(self, outputs, inputs, func, step, note=''):
+        self.outputs = [outputs] if isinstance(outputs, str) else list(outputs)
+        self.inputs = list(inputs)
+        self.func = func
+        self.step = step
+        self.note = note        # printed after "Created: <output>"
+
+    @property
+    def name(self):
+        return self.outputs[0]
+
+    def __repr__(self):
+        return f"Feature({self.outputs} <- {self.inputs}, step={self.step!r})"
+
+
+class _Columns:
+    """The frame's columns overlaid with the outputs computed so far"""
+
+    def __init__(self, df, computed):
+        self.df, self.computed = df, computed
+
+    def __getitem__(self, col):
+        return self.computed[col] if col in self.computed else self.df[col]
+
+
+class FeatureRegistry:
+
+    def __init__(self):
+        self.features = []
+        self.producers = {}
+        self.fused = {}
+
+    def add(self, feature):
+        for output in feature.outputs:
+            if output in self.producers:
+                raise ValueError(f"Feature output {output!r} is already registered")
+            self.producers[output] = feature
+        self.features.append(feature)
+        return feature
+
+    def feature(self, outputs, inputs, step, note=''):
+        """Decorator registering func as the feature producing outputs"""
+        def register(func):
+            self.add(Feature(outputs, inputs, func, step, note))
+            return func
+        return register
+
+    def fuse(self, step, evaluate):
+        """
+        Compute the step's planned features with evaluate(df, features,
+        params, workers) -> {output: values} instead of one func call each
+        """
+        self.fused[step] = evaluate
+
+    def step_features(self, step):
+        return [f for f in self.features if f.step == step]
+
+    def outputs(self, step):
+        return [output for f in self.step_features(step) for output in f.outputs]
+
+    def closure(self, requested):
+        """requested outputs plus every registered output they depend on, across steps"""
+        needed, stack = set(), list(requested)
+        while stack:
+            col = stack.pop()
+            if col in needed:
+                continue
+            needed.add(col)
+            if col in self.producers:
+                stack.extend(self.producers[col].inputs)
+        return needed
+
+    def plan(self, step, columns, requested=None):
+        """
+        Levels of the step's features that can run given the frame columns.
+        A feature needs every input either in columns or produced by a
+        runnable feature of the same step; with requested, only features
+        (transitively) needed for those outputs are planned.
+        """
+        candidates = self.step_features(step)
+        if requested is not None:
+            needed = self.closure(requested)
+            candidates = [f for f in candidates if needed.intersection(f.outputs)]
+
+        available = set(columns)
+        levels, pending = [], candidates
+        while pending:
+            level = [f for f in pending if all(col in available for col in f.inputs)]
+            if not level:
+                break       # what is left lacks an input: the subtree is skipped
+            levels.append(level)
+            for f in level:
+                available.update(f.outputs)
+            pending = [f for f in pending if f not in level]
+        return levels
+
+    def compute(self, df, step, params=None, requested=None, workers=None):
+        """
+        {output: values} for the step's runnable features, in registration
+        order. workers bounds the threads per level (default: one per CPU;
+        frames under CONCURRENT_MIN_ROWS rows run sequentially).
+        """
+        params = params or {}
+        computed = {}
+        columns = _Columns(df, computed)
+        if workers is None:
+            workers = os.cpu_count() if len(df) >= CONCURRENT_MIN_ROWS else 1
+
+        def run(feature):
+            result = feature.func(columns, params)
+            return result if isinstance(result, dict) else {feature.name: result}
+
+        levels = self.plan(step, df.columns, requested)
+        planned = [f for level in levels for f in level]
+        if step in self.fused:
+            computed.update(self.fused[step](df, planned, params, workers))
+            levels = []
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 and levels else None
+        try:
+            for level in levels:
+                if pool is not None and len(level) > 1:
+                    results = list(pool.map(run, level))
+                else:
+                    results = [run(f) for f in level]
+                for result in results:
+                    computed.update(result)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        names = {f.name for f in planned}
+        return {output: computed[output]
+                for f in self.step_features(step) if f.name in names
+                for output in f.outputs}
+
+    def apply(self, df, step, params=None, requested=None, workers=None, inplace=True):
+        """Attach the computed outputs to df and report them (see add_columns in src/copy_policy.py)"""
+        computed = self.compute(df, step, params, requested, workers)
+        for output in computed:
+            print(f"  Created: {output}{self.producers[output].note}")
+        return add_columns(df, computed, inplace)
+
+
+REGISTRY = FeatureRegistry()
@@ -3,80 +3,164 @@ Feature Engineering Module 5: Flag Anomalies Column
 Group 6 - Detects and flags outliers using statistical methods
 """
 
-import pandas as pd
 import numpy as np
-from scipy import stats
 
-
-def flag_zscore(df, column, threshold=3):
-    z_scores = np.abs(stats.zscore(df[column].dropna()))
-    flags = pd.Series(0, index=df.index)
-    flags.loc[df[column].notna()] = (z_scores > threshold).astype(int)
-    return flags
-
-
-def flag_iqr(df, column, multiplier=1.5):
-    Q1 = df[column].quantile(0.25)
-    Q3 = df[column].quantile(0.75)
-    IQR = Q3 - Q1
-    lower = Q1 - multiplier * IQR
-    upper = Q3 + multiplier * IQR
-    return ((df[column] < lower) | (df[column] > upper)).astype(int)
-
-
-def flag_anomalies_column(df):
-    df_new = df.copy()
+from .copy_policy import add_columns, working_copy
+from .readers import read_step_input
+
+
+PRIORITY_COLUMNS = ['income', 'purchase_amount', 'final_price', 'age',
+                    'shipping_cost', 'discount_percent', 'rating']
+
+
+def zscore(values):
+    """(values - mean) / std with the population std, as scipy.stats.zscore"""
+    values = np.asarray(values, dtype=float)
+    mean = values.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (values - mean) / np.sqrt(np.mean((values - mean) ** 2))
+
+
+BLOCK_ROWS = 1024
+
+
+def monitored_values(columns):
+    """1-D float arrays as one column-major rows x columns array"""
+    values = np.empty((len(columns[0]) if columns else 0, len(columns)), dtype=float, order='F')
+    for j, column in enumerate(columns):
+        values[:, j] = column
+    return values
+
+
+def column_statistics(values):
+    """
+    mean, std (ddof=0), q1, q3 of each column of a column-major float array,
+    ignoring NaN. Each column is summed the same way as on its own, so the
+    results equal the per-column scipy/pandas ones. The quartiles are found
+    by partitioning values in place, which leaves its rows reordered.
+    """
+    missing = np.isnan(values).any(axis=0)
+    with np.errstate(invalid='ignore'):
+        mean = values.mean(axis=0)
+        # Column by column: std's deviation temporary is then one column, not the matrix
+        std = np.array([values[:, j].std() for j in range(values.shape[1])])
+    q1 = np.full(values.shape[1], np.nan)
+    q3 = np.full(values.shape[1], np.nan)
+
+    for j in np.flatnonzero(missing):
+        present = values[:, j][~np.isnan(values[:, j])]
+        if len(present):
+            mean[j], std[j] = present.mean(), present.std()
+            q1[j], q3[j] = np.percentile(present, [25, 75])
+        else:
+            mean[j] = std[j] = np.nan
+
+    if len(values):
+        complete = ~missing
+        quartiles = np.percentile(values, [25, 75], axis=0, overwrite_input=True)
+        q1[complete], q3[complete] = quartiles[0, complete], quartiles[1, complete]
+    return mean, std, q1, q3
+
+
+def flag_matrix(columns, mean, std, q1, q3, threshold=3, multiplier=1.5, nrows=None):
+    """
+    z-score and IQR flags (bool, rows x columns) of equal-length 1-D float
+    arrays, worked out on 2-D row blocks so the temporaries stay small.
+    nrows sets the row count when there are no columns.
+    """
+    if nrows is None:
+        nrows = len(columns[0]) if columns else 0
+    if not columns:
+        return np.zeros((nrows, 0), dtype=bool), np.zeros((nrows, 0), dtype=bool)
+    z_flags = np.empty((nrows, len(columns)), dtype=bool, order='F')
+    iqr_flags = np.empty((nrows, len(columns)), dtype=bool, order='F')
+    lower = q1 - multiplier * (q3 - q1)
+    upper = q3 + multiplier * (q3 - q1)
+    for start in range(0, nrows, BLOCK_ROWS):
+        block = np.stack([column[start:start + BLOCK_ROWS] for column in columns], axis=1)
+        z = np.subtract(block, mean)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(z, std, out=z)
+        np.abs(z, out=z)
+        np.greater(z, threshold, out=z_flags[start:start + BLOCK_ROWS])
+        np.less(block, lower, out=iqr_flags[start:start + BLOCK_ROWS])
+        iqr_flags[start:start + BLOCK_ROWS] |= block > upper
+    return z_flags, iqr_flags
+
+
+def flag_anomalies_column(df, thresholds=None, inplace=False):
+    """
+    thresholds is an optional {col: {'mean', 'std', 'q1', 'q3'}} dict of
+    fitted statistics. Columns found in it are flagged against those values
+    instead of statistics computed from df.
+
+    The statistics of all monitored columns are taken from one rows x columns
+    array and the flags computed for all of them together; flags are int8.
+    """
+    df_new = working_copy(df, inplace)
+    thresholds = thresholds or {}
 
     numeric_cols = df_new.select_dtypes(include=[np.number]).columns.tolist()
 
     # Only flag the key meaningful columns
-    priority = ['income', 'purchase_amount', 'final_price', 'age',
-                'shipping_cost', 'discount_percent', 'rating']
-    cols_to_check = [c for c in priority if c in numeric_cols]
+    cols_to_check = [c for c in PRIORITY_COLUMNS if c in numeric_cols]
 
     print(f"\n  Flagging anomalies in: {cols_to_check}\n")
 
-    for col in cols_to_check:
-        z_flag   = flag_zscore(df_new, col, threshold=3)
-        iqr_flag = flag_iqr(df_new, col, multiplier=1.5)
-
-        df_new[f'{col}_anomaly_zscore'] = z_flag
-        df_new[f'{col}_anomaly_iqr']    = iqr_flag
-        df_new[f'{col}_is_anomaly']     = ((z_flag == 1) | (iqr_flag == 1)).astype(int)
+    # Views of float columns; only integer columns are converted
+    columns = [df_new[col].to_numpy(dtype=float, na_value=np.nan) for col in cols_to_check]
 
-        z_n   = z_flag.sum()
-        iqr_n = iqr_flag.sum()
-        both  = df_new[f'{col}_is_anomaly'].sum()
-        print(f"  {col}: Z-score={z_n}  IQR={iqr_n}  Combined={both}")
+    fitted = [thresholds.get(col) for col in cols_to_check]
+    if not cols_to_check:
+        stats_ = [np.empty(0)] * 4
+    elif all(fitted):
+        stats_ = [np.array([f[key] for f in fitted], dtype=float) for key in ('mean', 'std', 'q1', 'q3')]
+    else:
+        # The matrix is only needed (and partitioned) while the statistics are taken
+        stats_ = column_statistics(monitored_values(columns))
+        for j, f in enumerate(fitted):
+            if f:
+                for array, key in zip(stats_, ('mean', 'std', 'q1', 'q3')):
+                    array[j] = f[key]
+
+    z_flags, iqr_flags = flag_matrix(columns, *stats_, nrows=len(df_new))
+    any_flags = z_flags | iqr_flags
+
+    flags = {}
+    for j, col in enumerate(cols_to_check):
+        flags[f'{col}_anomaly_zscore'] = z_flags[:, j].view(np.int8)
+        flags[f'{col}_anomaly_iqr']    = iqr_flags[:, j].view(np.int8)
+        flags[f'{col}_is_anomaly']     = any_flags[:, j].view(np.int8)
+
+    z_n, iqr_n, both = z_flags.sum(axis=0), iqr_flags.sum(axis=0), any_flags.sum(axis=0)
+    for j, col in enumerate(cols_to_check):
+        print(f"  {col}: Z-score={z_n[j]}  IQR={iqr_n[j]}  Combined={both[j]}")
 
     # Overall anomaly score per row
-    anomaly_cols = [c for c in df_new.columns if c.endswith('_is_anomaly')]
-    df_new['anomaly_score']    = df_new[anomaly_cols].sum(axis=1)
-    df_new['has_any_anomaly']  = (df_new['anomaly_score'] > 0).astype(int)
+    score = any_flags.sum(axis=1, dtype=np.int8)
+    flags['anomaly_score']    = score
+    flags['has_any_anomaly']  = (score > 0).view(np.int8)
+    df_new = add_columns(df_new, flags, inplace)
 
-    total = df_new['has_any_anomaly'].sum()
+    total = int((score > 0).sum())
     print(f"\n  Rows with at least one anomaly: {total} ({total/len(df_new)*100:.1f}%)")
     print("  Created: anomaly_score, has_any_anomaly")
 
     return df_new
 
 
-def process_csv(input_file, output_file=None):
+def process_csv(input_file, output_file=None, inplace=False, features=None, reader=None):
     print("\n" + "="*55)
     print("MODULE 5: FLAG ANOMALIES COLUMN")
     print("="*55)
 
-    if isinstance(input_file, str):
-        df = pd.read_csv(input_file)
-        print(f"Loaded: {input_file}")
-    else:
-        df = input_file.copy()
-        print("Loaded DataFrame from previous step")
+    df = read_step_input(input_file, inplace, features, reader)
 
-    print(f"Original shape: {df.shape}")
-    df_processed = flag_anomalies_column(df)
+    original_shape = df.shape
+    print(f"Original shape: {original_shape}")
+    df_processed = flag_anomalies_column(df, inplace=True)
     print(f"New shape: {df_processed.shape}")
-    print(f"Added {df_processed.shape[1] - df.shape[1]} new columns")
+    print(f"Added {df_processed.shape[1] - original_shape[1]} new columns")
 
     if output_file:
         df_processed.to_csv(output_file, index=False)
@@ -0,0 +1,189 @@
+"""
+Global Statistics
+Group 6 - Accumulates the data-dependent parameters of the pipeline
+(one-hot categories, frequency maps, bin edges, anomaly thresholds)
+so they can be learned chunk by chunk and applied to every chunk alike
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .encode_categorical_features import ONEHOT_COLUMNS, ALREADY_ENCODED, find_categorical_columns, rank_categories
+from .bin_numeric_ranges import QUARTILES, equal_width_edges
+from .flag_anomalies_column import PRIORITY_COLUMNS
+from .online_anomaly import OnlineAnomalyDetector
+
+
+VALUES_DIR = 'values'   # exact=True: one raw float64 file per column, appended by save()
+
+class GlobalStatistics:
+    """
+    Feed it step-1 (derived) frames with update(); finalize() returns the
+    keyword arguments for encode_categorical_features, bin_numeric_ranges
+    and flag_anomalies_column.
+
+    Counts and min/max are kept as running totals. The mean/std and the
+    quartiles of the anomaly priority columns (final_price among them, so
+    the price quartile edges and the IQR thresholds come from the same
+    place) come from an OnlineAnomalyDetector: exact moments plus a quantile
+    sketch that is exact up to its k values per column and within its
+    documented rank error beyond (see src/online_anomaly.py). The state
+    does not grow with the rows. With exact=True the values of those
+    columns are kept as well, 8 bytes per row for each, and their quartiles
+    are those of a whole-frame run. Partial statistics from separate chunks
+    or workers combine with merge().
+    """
+
+    def __init__(self, exact=False):
+        self.exact = exact
+        self.categorical = []   # non-datetime object columns, in order seen
+        self.onehot = {}        # col -> pd.Series of category counts
+        self.counts = {}        # col -> pd.Series of value counts
+        self.ratio_range = None  # (min, max) of income_purchase_ratio
+        self.values = {}        # exact=True: col -> arrays of its non-missing values
+        self._saved = {}        # col -> how many of its arrays are in the saved files already
+        self.detector = OnlineAnomalyDetector(PRIORITY_COLUMNS)
+        self.rows = 0
+
+    def update(self, df):
+        self.rows += len(df)
+
+        for col in ONEHOT_COLUMNS:
+            if col in df.columns:
+                self._add_onehot(col, df[col].value_counts())
+
+        for col in find_categorical_columns(df):
+            if col not in self.categorical:
+                self.categorical.append(col)
+            if col not in ALREADY_ENCODED:
+                self._add_counts(col, df[col].value_counts())
+
+        if 'income_purchase_ratio' in df.columns:
+            ratio = df['income_purchase_ratio']
+            self._add_ratio_range(ratio.min(), ratio.max())
+
+        self.detector.update(df)
+        if self.exact:
+            for col in self.detector.columns:
+                if col in df.columns and np.issubdtype(df[col].dtype, np.number):
+                    self.values.setdefault(col, []).append(df[col].dropna().to_numpy(dtype=float))
+        return self
+
+    def _add_onehot(self, col, counts):
+        prev = self.onehot.get(col)
+        self.onehot[col] = counts if prev is None else prev.add(counts, fill_value=0)
+
+    def _add_counts(self, col, counts):
+        prev = self.counts.get(col)
+        self.counts[col] = counts if prev is None else prev.add(counts, fill_value=0)
+
+    def _add_ratio_range(self, mn, mx):
+        if pd.isna(mn):
+            return
+        if self.ratio_range is not None:
+            mn, mx = min(mn, self.ratio_range[0]), max(mx, self.ratio_range[1])
+        self.ratio_range = (mn, mx)
+
+    def merge(self, other):
+        """Fold in the statistics of other (e.g. another worker's rows)"""
+        self.rows += other.rows
+        for col in other.categorical:
+            if col not in self.categorical:
+                self.categorical.append(col)
+        for col, counts in other.onehot.items():
+            self._add_onehot(col, counts)
+        for col, counts in other.counts.items():
+            self._add_counts(col, counts)
+        if other.ratio_range is not None:
+            self._add_ratio_range(*other.ratio_range)
+        for col, arrays in other.values.items():
+            self.values.setdefault(col, []).extend(arrays)
+        self.detector.merge(other.detector)
+        return self
+
+    def finalize(self):
+        params = {
+            'categorical_columns': list(self.categorical),
+            'onehot_categories': {col: rank_categories(counts) for col, counts in self.onehot.items()},
+            'frequencies': {col: (counts / counts.sum()).to_dict()
+                            for col, counts in self.counts.items()},
+            'price_edges': None,
+            'ratio_edges': None,
+            'thresholds': self.detector.thresholds(),
+        }
+
+        quartiles = {col: self._quartiles(col) for col in self.detector.sketches}
+        for col, threshold in params['thresholds'].items():
+            threshold['q1'], threshold['q3'] = quartiles[col][1], quartiles[col][3]
+        if quartiles.get('final_price'):
+            params['price_edges'] = quartiles['final_price']
+
+        if self.ratio_range is not None:
+            params['ratio_edges'] = equal_width_edges(*self.ratio_range).tolist()
+
+        return params
+
+    def _quartiles(self, col):
+        """[min, q1, median, q3, max] of col, or None before any value"""
+        if self.exact and col in self.values:
+            values = np.concatenate(self.values[col])
+            # What bin_numeric_ranges and flag_anomalies_column take from a whole frame
+            return pd.Series(values).quantile(QUARTILES).tolist() if len(values) else None
+        sketch = self.detector.sketches[col]
+        return [sketch.quantile(q) for q in QUARTILES] if sketch.n else None
+
+    # ─────────────────────────────────────────
+    #  PERSISTENCE
+    # ─────────────────────────────────────────
+
+    def save(self, directory):
+        """
+        Write the running totals and sketches to directory/statistics.json,
+        which stays the same size however many rows were seen. With exact=True
+        the values added since the last save() or load() are appended to
+        directory/values/, which grows with the rows.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if self.exact:
+            os.makedirs(os.path.join(directory, VALUES_DIR), exist_ok=True)
+            for col, arrays in self.values.items():
+                with open(os.path.join(directory, VALUES_DIR, f'{col}.bin'), 'ab') as f:
+                    for values in arrays[self._saved.get(col, 0):]:
+                        f.write(values.tobytes())
+                self._saved[col] = len(arrays)
+        state = {
+            'exact': self.exact,
+            'rows': self.rows,
+            'categorical': self.categorical,
+            'onehot': {col: counts.to_dict() for col, counts in self.onehot.items()},
+            'counts': {col: counts.to_dict() for col, counts in self.counts.items()},
+            'ratio_range': self.ratio_range,
+            'detector': self.detector.to_state(),
+        }
+        with open(os.path.join(directory, 'statistics.json'), 'w') as f:
+            json.dump(state, f, default=lambda v: v.item())
+
+    @classmethod
+    def load(cls, directory):
+        """The statistics written by save(); with exact=True that reads every value seen"""
+        with open(os.path.join(directory, 'statistics.json')) as f:
+            state = json.load(f)
+        stats = cls(exact=state.get('exact', False))
+        stats.rows = state['rows']
+        stats.categorical = state['categorical']
+        # Older states hold the category list only
+        stats.onehot = {col: pd.Series(1.0, index=cats) if isinstance(cats, list) else pd.Series(cats, dtype=float)
+                        for col, cats in state['onehot'].items()}
+        stats.counts = {col: pd.Series(counts, dtype=float) for col, counts in state['counts'].items()}
+        stats.ratio_range = tuple(state['ratio_range']) if state['ratio_range'] else None
+        stats.detector = OnlineAnomalyDetector.from_state(state['detector'])
+        if stats.exact:
+            for col in stats.detector.columns:
+                path = os.path.join(directory, VALUES_DIR, f'{col}.bin')
+                if os.path.exists(path):
+                    stats.values[col] = [np.fromfile(path)]
+                    stats._saved[col] = 1
+        return stats
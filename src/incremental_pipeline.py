@@ -0,0 +1,190 @@
+"""
+Incremental Pipeline
+Group 6 - Processes only the rows appended to an input CSV since the last run
+
+For append-only inputs (daily logs) each run remembers a watermark per file:
+the byte offset and row count of the last complete line it processed, plus
+a digest of the bytes just before it to notice when the file was rewritten
+rather than appended to. The next run seeks to the watermark, parses only
+the new lines, and appends their features to the existing outputs.
+
+The global statistics (one-hot categories, frequency maps, quartile and
+ratio bin edges, anomaly thresholds) are kept as running totals next to the
+watermark and updated with each delta, so the new rows are encoded and
+flagged against the statistics of the whole history so far. Rows written
+by earlier runs keep the statistics (and as_of) they were written with.
+The state is the bounded one of src/global_statistics.py, so a run reads,
+updates and rewrites a fixed amount of it however long the history: its
+cost follows the delta. The quartiles are then sketched (see
+src/online_anomaly.py); only the first run, which holds the whole file
+anyway, takes them exactly and matches a full run. With exact_quantiles
+every run appends its delta's values to the state and reloads all of them,
+so its quartiles are exact but each run costs O(history).
+One-hot columns keep the categories of the first run, so the appended rows
+get the same columns as the rows already written; a category appearing
+later gets all-zero flags (or falls into the other bucket, for columns with
+more than MAX_ONEHOT categories). Each appended batch is cast to the columns
+and dtypes of the outputs it extends (see conform in src/dtype_policy.py):
+a batch whose dates are all missing still writes every time column, and
+an int column with a missing value still writes 35, not 35.0. The format
+of each date column is decided by the first run and kept with the
+watermark (see date_formats in src/schema_inference.py), so a delta of
+ambiguous dates parses as the history did.
+
+If the file shrank, changed before the watermark, or the run options
+differ, the file is processed from scratch.
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from .dtype_policy import conform
+from .derive_computed_columns import derive_computed_columns
+from .feature_pipeline import FeaturePipeline, STEP_NAMES, quiet
+from .global_statistics import GlobalStatistics
+from .instrumentation import StepMetrics
+from .schema_inference import date_formats
+from .time_based_feature_extraction import resolve_as_of
+from .writers import STEP_SUFFIXES, open_writer, output_path
+
+
+STATE_DIR = '.incremental'
+ANCHOR_BYTES = 4096
+
+
+def _anchor(path, offset):
+    """Digest of the bytes just before offset"""
+    start = max(0, offset - ANCHOR_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return hashlib.blake2b(f.read(offset - start), digest_size=16).hexdigest()
+
+
+def _load_watermark(state_dir):
+    try:
+        with open(os.path.join(state_dir, 'watermark.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_new_lines(input_path, offset):
+    """The complete lines from offset on, and the offset after the last one"""
+    with open(input_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1     # a partly written last line waits for the next run
+    return data[:end], offset + end
+
+
+def _read_delta(data, dtypes):
+    """New lines parsed with the column types of the first run, so e.g. a
+    float column whose new values happen to be whole stays float. Integer
+    columns are parsed as float, which also holds their missing values;
+    conform() casts the outputs back."""
+    names = list(dtypes)
+    parse = {col: 'float64' if pd.api.types.is_integer_dtype(dtype) else dtype
+             for col, dtype in dtypes.items()}
+    try:
+        return pd.read_csv(io.BytesIO(data), header=None, names=names, dtype=parse)
+    except (ValueError, TypeError):
+        # e.g. text in a numeric column
+        return pd.read_csv(io.BytesIO(data), header=None, names=names)
+
+
+def run_incremental(input_path, output_dir, base_name, save_steps=False, output_format='csv',
+                    as_of=None, float32=False, metrics=None, high_cardinality='onehot',
+                    exact_quantiles=False):
+    metrics = metrics or StepMetrics()
+    state_dir = os.path.join(output_dir, STATE_DIR, base_name)
+    watermark = _load_watermark(state_dir)
+    options = {'save_steps': save_steps, 'output_format': output_format, 'float32': float32,
+               'high_cardinality': high_cardinality, 'exact_quantiles': exact_quantiles}
+    size = os.path.getsize(input_path)
+
+    resume = (watermark is not None
+              and watermark['options'] == options
+              and 'output_dtypes' in watermark
+              and size >= watermark['bytes']
+              and _anchor(input_path, watermark['bytes']) == watermark['anchor'])
+
+    if resume:
+        stats = GlobalStatistics.load(state_dir)
+        dtypes = watermark['dtypes']
+        columns = list(dtypes)
+        print(f"  Incremental mode: resuming after row {watermark['rows']}")
+        with metrics.measure('read_csv') as stage:
+            data, end = _read_new_lines(input_path, watermark['bytes'])
+            delta = _read_delta(data, dtypes) if data else None
+            stage.rows = 0 if delta is None else len(delta)
+    else:
+        if watermark is not None:
+            print("  Incremental mode: input rewritten or options changed, reprocessing")
+        shutil.rmtree(state_dir, ignore_errors=True)
+        stats = GlobalStatistics(exact=True)      # the whole file is read anyway
+        with metrics.measure('read_csv') as stage:
+            data, end = _read_new_lines(input_path, 0)
+            delta = pd.read_csv(io.BytesIO(data))
+            stage.rows = len(delta)
+        columns = list(delta.columns)
+        dtypes = {col: str(dtype) for col, dtype in delta.dtypes.items()}
+        print("  Incremental mode: processing the whole file")
+
+    frozen = watermark.get('frozen_categories', {}) if resume else {}
+    output_dtypes = watermark['output_dtypes'] if resume else {}     # suffix -> {column: dtype}
+    formats = watermark.get('date_formats', {}) if resume else {}     # decided by the first run
+    new_rows = 0 if delta is None else len(delta)
+    print(f"  New rows: {new_rows}")
+
+    if new_rows:
+        with quiet(), metrics.measure('fit', new_rows):
+            stats.update(derive_computed_columns(delta, float32=float32))
+        params = stats.finalize()
+        for col, categories in params['onehot_categories'].items():
+            params['onehot_categories'][col] = frozen.setdefault(col, categories)
+        pipeline = FeaturePipeline(params, float32=float32, high_cardinality=high_cardinality)
+
+        paths = [output_path(output_dir, base_name, suffix, output_format) for suffix in STEP_SUFFIXES]
+        writers = [open_writer(path, output_format, append=resume) if save_steps or path == paths[-1]
+                   else None for path in paths]
+        try:
+            with date_formats(formats):
+                steps = pipeline.transform_steps(delta, inplace=True, as_of=resolve_as_of(as_of))
+                for suffix, writer, df in zip(STEP_SUFFIXES, writers, metrics.iterate(STEP_NAMES, steps)):
+                    if writer is not None:
+                        if suffix in output_dtypes:
+                            df = conform(df, output_dtypes[suffix])
+                        else:
+                            output_dtypes[suffix] = {col: str(dtype) for col, dtype in df.dtypes.items()}
+                        with metrics.measure('write', len(df)):
+                            writer.write(df)
+        finally:
+            for writer in writers:
+                if writer is not None:
+                    writer.close()
+        final_cols = df.shape[1]
+        print(f"\n  Saved final output: {paths[-1]}")
+    else:
+        final_cols = watermark['final_cols'] if watermark else len(columns)
+
+    # The watermark only moves once the outputs hold the new rows
+    stats.exact = exact_quantiles       # what the state keeps for the next runs
+    stats.save(state_dir)
+    with open(os.path.join(state_dir, 'watermark.json'), 'w') as f:
+        json.dump({'bytes': end, 'rows': stats.rows, 'anchor': _anchor(input_path, end),
+                   'dtypes': dtypes, 'final_cols': final_cols, 'options': options,
+                   'frozen_categories': frozen, 'output_dtypes': output_dtypes, 'date_formats': formats},
+                  f, default=lambda v: v.item())
+
+    return {
+        'original_cols': len(columns),
+        'final_cols': final_cols,
+        'rows': stats.rows,
+        'new_features': final_cols - len(columns),
+        'new_rows': new_rows,
+    }
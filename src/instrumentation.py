@@ -0,0 +1,205 @@
+"""
+Instrumentation
+Group 6 - Wall time, CPU time, throughput and peak memory of each pipeline stage
+
+    metrics = StepMetrics()
+    with metrics.measure('read_csv') as stage:
+        df = pd.read_csv(path)
+        stage.rows = len(df)
+
+Repeated stages (one per chunk in streaming mode) add up into one record:
+seconds and rows are summed, the peak memory delta is the largest seen.
+The peak delta is the process's peak RSS during the stage minus its RSS
+before it; on Linux the kernel's peak is reset before each stage
+(/proc/self/clear_refs), elsewhere it is the process-wide peak so far.
+Where neither /proc nor the resource module exists (Windows), the memory
+figures are None. CPU time covers this process only, not the workers of
+--row-workers.
+
+profile='tracemalloc' also records the peak of Python-level allocations
+per stage (precise, but slows numpy-heavy stages down); profile='cprofile'
+collects one cProfile per stage and dumps it to profile_dir as
+<name>_<stage>.prof (view with `python -m pstats` or snakeviz).
+"""
+
+import cProfile
+import contextlib
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+
+PROFILERS = ['cprofile', 'tracemalloc']
+_DONE = object()
+
+
+def _status_mb(field):
+    """VmRSS / VmHWM of this process in MB, or None off Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    return _status_mb('VmRSS')
+
+
+def reset_peak_rss():
+    """Restart the peak RSS at the current RSS; False where the kernel does not allow it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_mb(who):
+    """ru_maxrss of getrusage(who) in MB, or None without the resource module (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024      # ru_maxrss is bytes on macOS, KB elsewhere
+    return resource.getrusage(getattr(resource, who)).ru_maxrss / scale / 1024
+
+
+def peak_rss_mb():
+    peak = _status_mb('VmHWM')
+    return peak if peak is not None else _maxrss_mb('RUSAGE_SELF')
+
+
+def children_peak_rss_mb():
+    """Largest peak RSS of the finished child processes, or None where it is not known"""
+    return _maxrss_mb('RUSAGE_CHILDREN')
+
+
+class _Stage:
+    """Handed to the with-block, which sets the number of rows it handled
+    (or skip, to leave the call out of the record)"""
+
+    def __init__(self, rows=0):
+        self.rows = rows
+        self.skip = False
+
+
+class StepMetrics:
+
+    def __init__(self, profile=None, profile_dir=None, name='run'):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profile!r}; use one of {PROFILERS}")
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.name = name
+        self.stages = {}
+        self._profiles = {}
+        self._started_tracing = False
+        if profile == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextlib.contextmanager
+    def measure(self, stage, rows=0):
+        handle = _Stage(rows)
+        reset_peak_rss()
+        rss_before = rss_mb()
+        if self.profile == 'tracemalloc':
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        profiler = self._profiles.setdefault(stage, cProfile.Profile()) if self.profile == 'cprofile' else None
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield handle
+        finally:
+            if profiler:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = None if rss_before is None else peak_rss_mb()
+            delta = None if peak is None else peak - rss_before
+            traced = None
+            if self.profile == 'tracemalloc':
+                traced = (tracemalloc.get_traced_memory()[1] - traced_before) / 2**20
+            if not handle.skip:
+                self._add(stage, handle.rows, wall, cpu, delta, traced)
+
+    def add(self, stage, rows=0, seconds=0.0, cpu_seconds=0.0):
+        """Record a call timed elsewhere (e.g. on a background thread), without memory figures"""
+        self._add(stage, rows, seconds, cpu_seconds, None, None)
+
+    def iterate(self, stages, iterable):
+        """
+        Yield the items of iterable, measuring the production of each one
+        (with len(item) as its rows). stages is one stage name for every
+        item, or a sequence of names, one per item.
+        """
+        iterator = iter(iterable)
+        names = itertools.repeat(stages) if isinstance(stages, str) else stages
+        for name in names:
+            with self.measure(name) as stage:
+                item = next(iterator, _DONE)
+                stage.skip = item is _DONE
+                if not stage.skip:
+                    stage.rows = len(item)
+            if item is _DONE:
+                return
+            yield item
+
+    def _add(self, stage, rows, wall, cpu, delta, traced):
+        record = self.stages.setdefault(stage, {'stage': stage, 'calls': 0, 'rows': 0, 'seconds': 0.0,
+                                                'cpu_seconds': 0.0, 'peak_delta_mb': None})
+        record['calls'] += 1
+        record['rows'] += rows
+        record['seconds'] += wall
+        record['cpu_seconds'] += cpu
+        if delta is not None:
+            record['peak_delta_mb'] = max(record['peak_delta_mb'] or 0.0, delta)
+        if traced is not None:
+            record['traced_peak_mb'] = max(record.get('traced_peak_mb', 0.0), traced)
+
+    def records(self):
+        """One dict per stage in first-seen order, with rows_per_s"""
+        out = []
+        for record in self.stages.values():
+            record = dict(record)
+            record['rows_per_s'] = record['rows'] / record['seconds'] if record['seconds'] and record['rows'] \
+                else None
+            for key in ('seconds', 'cpu_seconds', 'rows_per_s', 'peak_delta_mb', 'traced_peak_mb'):
+                if record.get(key) is not None:
+                    record[key] = round(record[key], 6 if 'seconds' in key else 2)
+            out.append(record)
+        return out
+
+    def close(self):
+        """Dump the cProfile stats and stop tracing; returns the written profile paths"""
+        paths = []
+        if self._profiles and self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for stage, profiler in self._profiles.items():
+                path = os.path.join(self.profile_dir, f"{self.name}_{stage}.prof")
+                profiler.dump_stats(path)
+                paths.append(path)
+            self._profiles = {}
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return paths
+
+
+def format_table(records, indent='    '):
+    """The stage records as a fixed-width text table"""
+    lines = [f"{indent}{'stage':<30} {'wall s':>9} {'cpu s':>9} {'rows/s':>13} {'peak +MB':>10}"]
+    for r in records:
+        rate = f"{r['rows_per_s']:13,.0f}" if r['rows_per_s'] else f"{'-':>13}"
+        delta = f"{r['peak_delta_mb']:10.1f}" if r['peak_delta_mb'] is not None else f"{'-':>10}"
+        lines.append(f"{indent}{r['stage']:<30} {r['seconds']:9.3f} {r['cpu_seconds']:9.3f} {rate} {delta}")
+    return '\n'.join(lines)
@@ -0,0 +1,101 @@
+"""
+Overlapped I/O
+Group 6 - Reads the next input and writes the outputs on background threads
+while the current file is computed
+
+    io = OverlappedIO(load)                  # load(key) reads one input
+    io.prefetch('b.csv')                     # starts reading b.csv now
+    value, timing = io.load('a.csv')         # a.csv, read in the background earlier
+    io.write('a.csv', df, path, 'csv')       # returns at once unless the queue is full
+    timings = io.finish('a.csv')             # waits for a.csv's writes
+
+One thread reads and one writes, so the disk sees one sequential stream
+each way. At most max_pending writes are queued: write() blocks while the
+queue is full, so a slow disk holds the compute back instead of letting
+snapshots pile up in memory. Each queued frame is a working_copy (see
+src/copy_policy.py) taken when it is queued, so the steps can keep adding
+columns to the frame while it is written.
+
+Parsing and CSV formatting hold the GIL for much of their time, so the gain
+comes from the time spent waiting on the disk, and from the pyarrow reader
+and the parquet / feather writers, which release it.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .copy_policy import working_copy
+from .writers import write_frame
+
+
+MAX_PENDING_WRITES = 2
+
+
+def _timed(func, *args):
+    """(func(*args), (wall seconds, CPU seconds of this thread))"""
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = func(*args)
+    return result, (time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+class OverlappedIO:
+
+    def __init__(self, load, max_pending=MAX_PENDING_WRITES):
+        self._load = load
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='writer')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._loads = {}        # key -> future of (value, timing)
+        self._writes = {}       # key -> [(future of timing, rows)]
+
+    def prefetch(self, key):
+        """Start reading key in the background (once)"""
+        if key not in self._loads:
+            self._loads[key] = self._reader.submit(_timed, self._load, key)
+
+    def load(self, key):
+        """(value, (seconds, cpu_seconds)) of load(key), waiting for its prefetch"""
+        self.prefetch(key)
+        return self._loads.pop(key).result()
+
+    def write(self, key, df, path, fmt='csv'):
+        """Queue write_frame(df, path, fmt) under key; returns path"""
+        self._slots.acquire()
+        try:
+            future = self._writer.submit(self._write, working_copy(df), path, fmt)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._writes.setdefault(key, []).append((future, len(df)))
+        return path
+
+    def _write(self, df, path, fmt):
+        try:
+            return _timed(write_frame, df, path, fmt)[1]
+        finally:
+            self._slots.release()
+
+    def finish(self, key):
+        """
+        Wait for key's queued writes; [(rows, seconds, cpu_seconds)] per
+        write. Raises the first write's error, after every write is done.
+        """
+        timings, error = [], None
+        for future, rows in self._writes.pop(key, []):
+            try:
+                timings.append((rows, *future.result()))
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return timings
+
+    def close(self):
+        for key in list(self._writes):
+            try:
+                self.finish(key)
+            except Exception:
+                pass        # the caller has given up on key
+        self._reader.shutdown(cancel_futures=True)
+        self._writer.shutdown()
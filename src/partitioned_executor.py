@@ -0,0 +1,303 @@
+"""
+Partitioned Executor
+Group 6 - Runs the five feature steps on one large DataFrame using several
+cores by splitting it into row blocks
+
+The row-local work (derive arithmetic, the .dt calendar features and the
+z-score/IQR comparisons) runs per block in a process pool. Blocks are
+exchanged through memory-mapped column files on tmpfs (/dev/shm), so
+workers read their input rows and write their output rows in place rather
+than pickling frames back and forth.
+
+Only the global statistics cross the partition boundary. Moments and
+category counts are reduced from per-block partials; the order statistics
+(price quartile edges, Q1/Q3) are selected once in the parent directly on
+the shared column. One-hot encoding and binning are cheap vectorised
+lookups and run in the parent with those statistics.
+"""
+
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from .derive_computed_columns import derive_computed_columns
+from .encode_categorical_features import (encode_categorical_features, find_categorical_columns,
+                                          rank_categories, ONEHOT_COLUMNS, ALREADY_ENCODED)
+from .bin_numeric_ranges import bin_numeric_ranges, equal_width_edges
+from .time_based_feature_extraction import time_based_feature_extraction, detect_datetime_columns, \
+    resolve_as_of
+from .flag_anomalies_column import flag_anomalies_column, PRIORITY_COLUMNS
+from .feature_pipeline import quiet
+from .dtype_policy import probe_rows
+from .online_anomaly import RunningMoments
+
+
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+PROBE_ROWS = 64
+
+
+def is_fixed_width(dtype):
+    """True for plain numpy bool/int/float/datetime dtypes that fit a column file"""
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufmM'
+
+
+class SharedColumns:
+    """
+    Fixed-width columns laid out back to back in one memory-mapped file.
+    spec() is a small picklable description; attach() maps the same file
+    in a worker process.
+    """
+
+    def __init__(self, path, layout, nrows, size, mode='r+'):
+        self.path = path
+        self.layout = layout      # {name: (dtype str, byte offset)}
+        self.nrows = nrows
+        self.size = size
+        self._buf = np.memmap(path, dtype=np.uint8, mode=mode, shape=(max(size, 1),))
+
+    @classmethod
+    def create(cls, directory, dtypes, nrows):
+        layout, offset = {}, 0
+        for name, dtype in dtypes.items():
+            dtype = np.dtype(dtype)
+            layout[name] = (dtype.str, offset)
+            offset += dtype.itemsize * nrows
+            offset += (-offset) % 8   # keep every column 8-byte aligned
+        path = os.path.join(directory, f'columns-{uuid.uuid4().hex}.bin')
+        return cls(path, layout, nrows, offset, mode='w+')
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(*spec)
+
+    def spec(self):
+        return (self.path, self.layout, self.nrows, self.size)
+
+    @property
+    def names(self):
+        return list(self.layout)
+
+    def array(self, name):
+        dtype, offset = self.layout[name]
+        dtype = np.dtype(dtype)
+        return self._buf[offset:offset + dtype.itemsize * self.nrows].view(dtype)
+
+    def frame(self, start, stop, names=None):
+        names = self.names if names is None else names
+        return pd.DataFrame({name: self.array(name)[start:stop] for name in names},
+                            index=pd.RangeIndex(start, stop), copy=False)
+
+
+def _new_columns(before, after):
+    return [c for c in after.columns if c not in before.columns]
+
+
+def _block(specs, start, stop):
+    frames = [SharedColumns.attach(spec).frame(start, stop) for spec in specs]
+    return pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
+
+
+# ─────────────────────────────────────────────
+#  WORKER TASKS
+# ─────────────────────────────────────────────
+
+def _derive_partition(source_spec, derived_spec, codes_spec, float32, start, stop):
+    """Step 1 on one block, plus the partial statistics of that block"""
+    block = SharedColumns.attach(source_spec).frame(start, stop)
+    with quiet():
+        result = derive_computed_columns(block, float32=float32)
+
+    derived = SharedColumns.attach(derived_spec)
+    for col in derived.names:
+        derived.array(col)[start:stop] = result[col].to_numpy()
+
+    partial = {'moments': {}, 'ratio': None, 'counts': {}}
+    numeric_cols = result.select_dtypes(include=[np.number]).columns
+    for col in PRIORITY_COLUMNS:
+        if col in numeric_cols:
+            values = result[col].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            partial['moments'][col] = RunningMoments().update(values)
+
+    if 'income_purchase_ratio' in result.columns:
+        ratio = result['income_purchase_ratio']
+        if ratio.notna().any():
+            partial['ratio'] = (ratio.min(), ratio.max())
+
+    codes_spec, n_uniques = codes_spec
+    codes = SharedColumns.attach(codes_spec)
+    for col in codes.names:
+        block_codes = codes.array(col)[start:stop]
+        partial['counts'][col] = np.bincount(block_codes[block_codes >= 0], minlength=n_uniques[col])
+
+    return partial
+
+
+def _merge_partials(a, b):
+    ratio = a['ratio'] if b['ratio'] is None else b['ratio'] if a['ratio'] is None else \
+        (min(a['ratio'][0], b['ratio'][0]), max(a['ratio'][1], b['ratio'][1]))
+    return {
+        'moments': {col: a['moments'][col].merge(b['moments'][col]) for col in a['moments']},
+        'ratio': ratio,
+        'counts': {col: a['counts'][col] + b['counts'][col] for col in a['counts']},
+    }
+
+
+def _time_anomaly_partition(input_specs, time_spec, anomaly_spec, thresholds, as_of, start, stop):
+    """Steps 4 and 5 on one block; text columns come back as codes + uniques"""
+    block = _block(input_specs, start, stop)
+    with quiet():
+        timed = time_based_feature_extraction(block, as_of=as_of)
+        flagged = flag_anomalies_column(timed, thresholds=thresholds)
+
+    uniques = {}
+    for spec in (time_spec, anomaly_spec):
+        out = SharedColumns.attach(spec)
+        for col in out.names:
+            values = flagged[col]
+            if is_fixed_width(values.dtype):
+                out.array(col)[start:stop] = values.to_numpy()
+            else:
+                codes, uniques[col] = pd.factorize(values)
+                out.array(col)[start:stop] = codes
+    return uniques
+
+
+# ─────────────────────────────────────────────
+#  PARENT SIDE
+# ─────────────────────────────────────────────
+
+def _allocate(directory, probe, columns, nrows):
+    dtypes = {c: probe[c].dtype if is_fixed_width(probe[c].dtype) else np.int32 for c in columns}
+    return SharedColumns.create(directory, dtypes, nrows)
+
+
+def _collect(out, probe, bounds, uniques, index):
+    """Copy the output columns out of the shared file into an ordinary frame"""
+    columns = {}
+    for col in out.names:
+        values = np.array(out.array(col))
+        if not is_fixed_width(probe[col].dtype):
+            decoded = np.empty(len(values), dtype=object)
+            for (start, stop), part in zip(bounds, uniques):
+                # Code -1 (a missing value) picks the None appended after the uniques
+                decoded[start:stop] = np.append(np.asarray(part[col], dtype=object), None)[values[start:stop]]
+            values = pd.array(decoded, dtype=probe[col].dtype)
+        columns[col] = values
+    return pd.DataFrame(columns, index=index)
+
+
+def partition_bounds(nrows, partitions):
+    edges = np.linspace(0, nrows, partitions + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def run_partitioned(df, workers=None, partitions=None, shared_dir=SHARED_DIR, as_of=None,
+                    float32=False, high_cardinality='onehot'):
+    """
+    Run all five steps on df using `workers` processes and return the frame
+    after each step, like FeaturePipeline.transform_steps. The result is the
+    same as running the step functions on the whole frame.
+    """
+    workers = workers or os.cpu_count()
+    as_of = resolve_as_of(as_of)    # the same reference time in every worker
+    bounds = partition_bounds(len(df), partitions or workers)
+    if not bounds:
+        raise ValueError("Cannot partition an empty DataFrame")
+
+    with tempfile.TemporaryDirectory(dir=shared_dir) as tmp, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+
+        # Shared inputs: fixed-width source columns, and the categorical
+        # columns as factorised codes so their counts can be reduced too
+        fixed = [c for c in df.columns if is_fixed_width(df[c].dtype)]
+        source = SharedColumns.create(tmp, {c: df[c].dtype for c in fixed}, len(df))
+        for col in fixed:
+            source.array(col)[:] = df[col].to_numpy()
+
+        categorical_cols = find_categorical_columns(df)
+        counted = [c for c in categorical_cols if c in ONEHOT_COLUMNS or c not in ALREADY_ENCODED]
+        uniques = {}
+        codes = SharedColumns.create(tmp, {c: np.int64 for c in counted}, len(df))
+        for col in counted:
+            codes.array(col)[:], uniques[col] = pd.factorize(df[col])
+        codes_spec = (codes.spec(), {c: len(u) for c, u in uniques.items()})
+
+        # Step 1 - row blocks in parallel, partial statistics reduced
+        with quiet():
+            probe = derive_computed_columns(probe_rows(df[fixed], PROBE_ROWS), float32=float32)
+        derived = _allocate(tmp, probe, _new_columns(df, probe), len(df))
+        partials = pool.map(_derive_partition,
+                            *zip(*[(source.spec(), derived.spec(), codes_spec, float32, a, b)
+                                   for a, b in bounds]))
+        stats = reduce(_merge_partials, partials)
+        step1 = pd.concat([df, _collect(derived, probe, bounds, None, df.index)], axis=1)
+
+        # Global statistics
+        params = {
+            'categorical_columns': categorical_cols,
+            'onehot_categories': {c: rank_categories(pd.Series(stats['counts'][c], index=uniques[c]))
+                                  for c in ONEHOT_COLUMNS if c in uniques},
+            'frequencies': {c: dict(zip(uniques[c], stats['counts'][c] / stats['counts'][c].sum()))
+                            for c in counted if c not in ALREADY_ENCODED},
+            'price_edges': None,
+            'ratio_edges': None if stats['ratio'] is None else equal_width_edges(*stats['ratio']),
+            'thresholds': {},
+        }
+        if 'final_price' in step1.columns:
+            params['price_edges'] = step1['final_price'].quantile([0, 0.25, 0.5, 0.75, 1]).tolist()
+        for col, moments in stats['moments'].items():
+            params['thresholds'][col] = {
+                'mean': moments.mean,
+                'std': moments.std,
+                'q1': step1[col].quantile(0.25),
+                'q3': step1[col].quantile(0.75),
+            }
+
+        # Steps 2-3 - categorical lookups in the parent
+        with quiet():
+            step2 = encode_categorical_features(step1, onehot_categories=params['onehot_categories'],
+                                                frequencies=params['frequencies'],
+                                                categorical_columns=params['categorical_columns'],
+                                                high_cardinality=high_cardinality)
+            step3 = bin_numeric_ranges(step2, price_edges=params['price_edges'],
+                                       ratio_edges=params['ratio_edges'])
+
+        # Steps 4-5 - date columns parsed once, then row blocks in parallel
+        step4_base = step3.copy()
+        for col, values in detect_datetime_columns(step3).items():
+            step4_base[col] = values
+        dates = [c for c in step4_base.columns
+                 if ('date' in c.lower() or 'time' in c.lower()) and is_fixed_width(step4_base[c].dtype)]
+        dates_buf = SharedColumns.create(tmp, {c: step4_base[c].dtype for c in dates}, len(df))
+        for col in dates:
+            dates_buf.array(col)[:] = step4_base[col].to_numpy()
+        flagged_cols = [c for c in params['thresholds'] if c not in dates]
+        input_specs = [dates_buf.spec(), source.spec(), derived.spec()]
+        input_cols = dates + flagged_cols
+
+        block = probe_rows(step4_base[input_cols], PROBE_ROWS)
+        with quiet():
+            timed_probe = time_based_feature_extraction(block, as_of=as_of)
+            flagged_probe = flag_anomalies_column(timed_probe, thresholds=params['thresholds'])
+        time_out = _allocate(tmp, timed_probe, _new_columns(block, timed_probe), len(df))
+        anomaly_out = _allocate(tmp, flagged_probe, _new_columns(timed_probe, flagged_probe), len(df))
+
+        # Each worker only needs the input columns, so narrow the shared specs
+        input_specs = [(spec[0], {c: spec[1][c] for c in input_cols if c in spec[1]}, spec[2], spec[3])
+                       for spec in input_specs]
+        part_uniques = list(pool.map(_time_anomaly_partition,
+                                     *zip(*[(input_specs, time_out.spec(), anomaly_out.spec(),
+                                             params['thresholds'], as_of, a, b) for a, b in bounds])))
+
+        step4 = pd.concat([step4_base, _collect(time_out, timed_probe, bounds, part_uniques, df.index)],
+                          axis=1)
+        final = pd.concat([step4, _collect(anomaly_out, flagged_probe, bounds, part_uniques, df.index)],
+                          axis=1)
+
+    return [step1, step2, step3, step4, final]
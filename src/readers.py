@@ -0,0 +1,254 @@
+"""
+Input Readers
+Group 6 - Pluggable CSV readers for the input files
+
+    pandas   pd.read_csv: single-threaded, infers every column's type (default)
+    pyarrow  pyarrow's multi-threaded CSV parser with the declared SCHEMA for
+             the known columns, converted to pandas without consolidating
+             the columns into blocks (needs pyarrow)
+
+Either engine takes a '+mmap' suffix ('pyarrow+mmap') to read the file
+through a memory map instead of buffered reads.
+
+The pyarrow reader gives the same frame as pandas: integer columns with a
+missing value become float64, text columns the pandas string dtype, and the
+same strings count as missing. Date columns are kept as text - the time
+step parses them itself (src/schema_inference.py) - and columns outside
+SCHEMA are typed from the first block of the file.
+
+A declared integer column is parsed as float64 when its first block is
+written as floats, as pandas writes an int column holding a missing value
+(43.0). When float text only turns up further down, the read (or, chunked,
+the rest of it) is parsed again with the integer columns as float64, and
+each column is cast back to int64 where it holds only whole values and no
+missing one. Such a column (or chunk) of float text without a missing value
+then reads as int64 where pandas reads float64; the streaming mode casts
+every chunk to the dtypes of the whole file, so its outputs are unaffected.
+When a column still does not parse (text in a numeric column), the read, or
+the rest of it, falls back to pandas.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .copy_policy import working_copy
+
+
+ENGINES = ['pandas', 'pyarrow']
+READERS = ENGINES + [engine + '+mmap' for engine in ENGINES]
+DEFAULT_READER = 'pandas'
+
+# Declared types of the known input columns (pandas dtype names)
+SCHEMA = {
+    'customer_id':      'int64',
+    'age':              'int64',
+    'gender':           'str',
+    'education':        'str',
+    'income':           'int64',
+    'purchase_amount':  'float64',
+    'purchase_date':    'str',
+    'product_category': 'str',
+    'region':           'str',
+    'rating':           'float64',
+    'discount_percent': 'float64',
+    'shipping_cost':    'float64',
+}
+
+# The strings pd.read_csv reads as missing
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+             '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+BLOCK_SIZE = 1 << 22        # bytes per pyarrow parse block (one thread each)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("The pyarrow reader needs pyarrow: pip install pyarrow") from None
+
+
+def _arrow_type(dtype):
+    import pyarrow as pa
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        return pa.from_numpy_dtype(dtype)
+    return pa.string()
+
+
+class CsvReader:
+
+    def __init__(self, engine=DEFAULT_READER, memory_map=False, schema=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown reader {engine!r}; use one of {READERS}")
+        if engine == 'pyarrow':
+            _require_pyarrow()
+        self.engine = engine
+        self.memory_map = memory_map
+        self.schema = SCHEMA if schema is None else schema
+
+    @property
+    def name(self):
+        return self.engine + ('+mmap' if self.memory_map else '')
+
+    def __repr__(self):
+        return f"CsvReader({self.name!r})"
+
+    def read(self, path, usecols=None, dtype=None):
+        """The whole file as one frame; dtype overrides SCHEMA for its columns"""
+        if self.engine == 'pandas':
+            return pd.read_csv(path, usecols=usecols, dtype=dtype, memory_map=self.memory_map)
+        import pyarrow as pa
+        for ints_as_float in (False, True):
+            try:
+                table, widened = self._arrow_read(path, usecols, dtype, ints_as_float)
+                return _restore_ints(table.to_pandas(split_blocks=True, self_destruct=True), widened)
+            except pa.ArrowInvalid as e:
+                error = e
+        print(f"  pyarrow could not parse {os.path.basename(path)} ({error}); reading it with pandas")
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, memory_map=self.memory_map)
+
+    def chunks(self, path, chunksize, usecols=None, dtype=None):
+        """Frames of chunksize rows, indexed on from the previous chunk like pd.read_csv's"""
+        if self.engine == 'pandas':
+            yield from pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize,
+                                   memory_map=self.memory_map)
+            return
+        import pyarrow as pa
+        start = 0
+        for ints_as_float in (False, True):
+            try:
+                # A retry carries on after the rows already yielded
+                for df in self._arrow_chunks(path, chunksize, usecols, dtype, ints_as_float, start):
+                    start += len(df)
+                    yield df
+                return
+            except pa.ArrowInvalid as e:
+                error = e
+        print(f"  pyarrow could not parse {os.path.basename(path)} ({error}); "
+              f"reading it with pandas from row {start}")
+        for df in pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize,
+                              skiprows=range(1, start + 1), memory_map=self.memory_map):
+            df.index += start
+            yield df
+
+    # ── pyarrow ──
+
+    def _source(self, path):
+        import pyarrow as pa
+        return pa.memory_map(path) if self.memory_map else path
+
+    def _options(self, path, usecols, dtype, ints_as_float=False):
+        """
+        read and convert options: declared types, float64 for the integer
+        columns written as floats (all of them with ints_as_float), and text
+        for the dates pyarrow would parse. Also returns the integer columns
+        parsed as float64 only because of ints_as_float.
+        """
+        import pyarrow as pa
+        import pyarrow.csv as csv
+        read_options = csv.ReadOptions(block_size=BLOCK_SIZE, use_threads=True)
+        declared = {**self.schema, **(dtype or {})}
+        integer = [c for c, t in declared.items() if pd.api.types.is_integer_dtype(t)]
+        # The integer columns are typed from the first block, to see how they are written
+        with csv.open_csv(self._source(path), read_options=read_options,
+                          convert_options=csv.ConvertOptions(
+                              column_types={c: _arrow_type(t) for c, t in declared.items()
+                                            if c not in integer})) as probe:
+            inferred = probe.schema
+        header = inferred.names
+        column_types = {c: _arrow_type(t) for c, t in declared.items() if c in header}
+        widened = []
+        for col in integer:
+            if col in header:
+                if pa.types.is_floating(inferred.field(col).type):
+                    column_types[col] = pa.float64()
+                elif ints_as_float:
+                    column_types[col] = pa.float64()
+                    widened.append(col)
+        for field in inferred:
+            if field.name not in column_types and pa.types.is_temporal(field.type):
+                column_types[field.name] = pa.string()
+        include = [c for c in header if usecols is None or c in usecols]
+        convert_options = csv.ConvertOptions(column_types=column_types, include_columns=include,
+                                             null_values=NA_VALUES, strings_can_be_null=True)
+        return read_options, convert_options, [c for c in widened if c in include]
+
+    def _arrow_read(self, path, usecols, dtype, ints_as_float=False):
+        import pyarrow.csv as csv
+        read_options, convert_options, widened = self._options(path, usecols, dtype, ints_as_float)
+        table = csv.read_csv(self._source(path), read_options=read_options, convert_options=convert_options)
+        return table, widened
+
+    def _arrow_chunks(self, path, chunksize, usecols, dtype, ints_as_float=False, skip=0):
+        """Frames of chunksize rows after the first skip rows"""
+        import pyarrow as pa
+        import pyarrow.csv as csv
+        read_options, convert_options, widened = self._options(path, usecols, dtype, ints_as_float)
+        batches, buffered, start = [], 0, skip
+        with csv.open_csv(self._source(path), read_options=read_options,
+                          convert_options=convert_options) as reader:
+            for batch in reader:
+                if skip:
+                    if batch.num_rows <= skip:
+                        skip -= batch.num_rows
+                        continue
+                    batch, skip = batch.slice(skip), 0
+                batches.append(batch)
+                buffered += batch.num_rows
+                while buffered >= chunksize:
+                    table = pa.Table.from_batches(batches)
+                    yield self._frame(table.slice(0, chunksize), start, widened)
+                    start += chunksize
+                    batches = table.slice(chunksize).to_batches()
+                    buffered -= chunksize
+        if buffered:
+            yield self._frame(pa.Table.from_batches(batches), start, widened)
+
+    @staticmethod
+    def _frame(table, start, widened):
+        df = _restore_ints(table.to_pandas(split_blocks=True), widened)
+        df.index = pd.RangeIndex(start, start + len(df))
+        return df
+
+
+def _restore_ints(df, columns):
+    """columns (integers parsed as float64) back to int64 where pandas would read them so"""
+    for col in columns:
+        values = df[col]
+        if not values.isna().any() and (values % 1 == 0).all():
+            df[col] = values.astype(np.int64)
+    return df
+
+
+def get_reader(reader=None):
+    """A CsvReader from a READERS name ('pyarrow+mmap'), or reader itself; None is pandas"""
+    if isinstance(reader, CsvReader):
+        return reader
+    engine, _, mmap = (reader or DEFAULT_READER).partition('+')
+    if mmap not in ('', 'mmap'):
+        raise ValueError(f"Unknown reader {reader!r}; use one of {READERS}")
+    return CsvReader(engine, memory_map=bool(mmap))
+
+
+def read_csv(path, reader=None, **options):
+    """path read with reader (see get_reader); options: usecols, dtype"""
+    return get_reader(reader).read(path, **options)
+
+
+def read_step_input(input_file, inplace=False, features=None, reader=None):
+    """
+    The frame a step's process_csv runs on: a path is read with reader,
+    parsing only the input columns features need; a frame from the
+    previous step is used as is with inplace, else a working copy of it
+    """
+    if not isinstance(input_file, str):
+        print("Loaded DataFrame from previous step")
+        return working_copy(input_file, inplace)
+    # Imported here: column projection builds on the step modules, which import this one
+    from .column_projection import read_projected
+    df = read_projected(input_file, features, reader)
+    print(f"Loaded: {input_file}")
+    return df
@@ -0,0 +1,163 @@
+"""
+Result Cache
+Group 6 - Content-addressed cache of per-file pipeline outputs
+
+An entry is keyed on a hash of the input file's bytes, the source of the
+src/ package and of main.py (plus the pandas/numpy versions), and the run
+parameters that can change the output (as_of, output format, save_steps,
+the execution mode, ...). On a hit the stored
+step/FINAL outputs are copied back instead of being recomputed.
+
+The cache directory is kept under max_bytes by evicting the least recently
+used entries; a hit refreshes an entry's timestamp.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_MAX_BYTES = 1 << 30      # 1 GiB
+ENTRY_FILE = 'entry.json'
+HASH_BLOCK = 1 << 20
+
+_code_version = None
+
+
+def file_digest(path):
+    """blake2b of a file's contents, read in 1 MiB blocks"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_files():
+    """The modules in src/, and main.py, where process_file and the per-mode drivers live"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    main = os.path.join(os.path.dirname(here), 'main.py')
+    return sorted(glob.glob(os.path.join(here, '*.py'))) + ([main] if os.path.exists(main) else [])
+
+
+def code_version():
+    """Hash of code_files() and the library versions that shape the output"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.blake2b(digest_size=20)
+        for path in code_files():
+            digest.update(os.path.basename(path).encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        digest.update(f"pandas={pd.__version__};numpy={np.__version__}".encode())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def _copy(src, dst):
+    # npy outputs are directories
+    if os.path.isdir(src):
+        if os.path.exists(dst):
+            shutil.rmtree(dst)
+        shutil.copytree(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, input_path, params):
+        """Cache key of one input file under the given run parameters"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(file_digest(input_path).encode())
+        digest.update(code_version().encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def restore(self, key, output_dir):
+        """Copy a cached entry's outputs into output_dir; its summary info, or None on a miss"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, ENTRY_FILE)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+
+        for name in entry['outputs']:
+            _copy(os.path.join(entry_dir, name), os.path.join(output_dir, name))
+        os.utime(os.path.join(entry_dir, ENTRY_FILE))      # most recently used
+        self.stats['hits'] += 1
+        return entry['info']
+
+    def store(self, key, paths, info):
+        """Save the outputs of one file under key, then evict down to max_bytes"""
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        try:
+            for path in paths:
+                _copy(path, os.path.join(tmp, os.path.basename(path)))
+            with open(os.path.join(tmp, ENTRY_FILE), 'w') as f:
+                json.dump({'outputs': [os.path.basename(p) for p in paths], 'info': info,
+                           'created': time.time()}, f)
+            entry_dir = self._entry_dir(key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.replace(tmp, entry_dir)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.stats['stored'] += 1
+        self.evict(keep=key)
+
+    def entries(self):
+        """[(last used, size, key)] for every complete entry"""
+        found = []
+        for key in os.listdir(self.directory):
+            marker = os.path.join(self.directory, key, ENTRY_FILE)
+            if not key.startswith('.') and os.path.exists(marker):
+                found.append((os.path.getmtime(marker), _size(self._entry_dir(key)), key))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+            self.stats['evicted'] += 1
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['hits']} hit(s), {s['misses']} miss(es), {s['evicted']} evicted, "
+                f"{self.size() / 1e6:.1f} MB in {self.directory}/")
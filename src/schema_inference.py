@@ -0,0 +1,146 @@
+"""
+Schema Inference
+Group 6 - Decides which text columns hold dates, and parses each of them once
+
+A column is probed on a small sample against a list of explicit formats.
+Only columns whose sample parses are converted in full, and then with the
+known format instead of element-by-element guessing.
+
+A file read in parts (the chunks of a streaming run, the deltas of
+incremental runs) is processed inside date_formats(): the first sample of
+each column decides its format for the whole file, so an ambiguous later
+chunk (03/04 as d/m or m/d) parses as the first one did. Outside it each
+frame decides from its own sample; nothing is carried from one file to the
+next.
+"""
+
+import contextlib
+import contextvars
+import warnings
+
+import pandas as pd
+
+
+SAMPLE_SIZE = 200
+
+DATETIME_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y/%m/%d',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%m/%d/%Y %H:%M:%S',
+    '%d-%m-%Y',
+    '%Y%m%d',
+    'ISO8601',
+]
+
+# Marker for a sample that only pandas' own inference could parse
+INFERRED = 'inferred'
+
+# column name -> format (or None) decided for the file being processed, see date_formats()
+_file_formats = contextvars.ContextVar('file_formats', default=None)
+
+
+@contextlib.contextmanager
+def date_formats(formats=None):
+    """
+    Scope of one input file: yields the {column: format} dict the probes
+    fill, each column's format fixed by its first sample. formats resumes
+    from the decisions of an earlier run over the same file.
+    """
+    formats = {} if formats is None else formats
+    token = _file_formats.set(formats)
+    try:
+        yield formats
+    finally:
+        _file_formats.reset(token)
+
+
+def is_datetime_name(col):
+    """The time step only extracts features from columns named like a date or time"""
+    return 'date' in str(col).lower() or 'time' in str(col).lower()
+
+
+def is_text(values):
+    return values.dtype == object or isinstance(values.dtype, pd.StringDtype)
+
+
+def text_columns(df):
+    """Object / string columns, in frame order"""
+    return [col for col in df.columns if is_text(df[col])]
+
+
+def _sample(values):
+    values = values.iloc[:SAMPLE_SIZE * 5].dropna()
+    return values.iloc[:SAMPLE_SIZE]
+
+
+def probe_datetime_format(values, col=None):
+    """
+    The format that parses a sample of values, INFERRED if only pandas'
+    inference manages it, or None if the column is not datetime-like.
+    Inside date_formats() a column already decided for the file is not
+    probed again.
+    """
+    formats = _file_formats.get()
+    if formats is not None and col in formats:
+        return formats[col]
+    sample = _sample(values)
+    if sample.empty:
+        return None
+    fmt = _probe(sample)
+    if formats is not None and col is not None:
+        formats[col] = fmt
+    return fmt
+
+
+def _probe(sample):
+    for fmt in DATETIME_FORMATS:
+        try:
+            pd.to_datetime(sample, format=fmt)
+        except (ValueError, TypeError):
+            continue
+        return fmt
+
+    try:
+        with warnings.catch_warnings():
+            # "Could not infer format" is the expected outcome for free text
+            warnings.simplefilter('ignore', UserWarning)
+            pd.to_datetime(sample)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return INFERRED
+
+
+def parse_datetime(values, fmt):
+    """
+    Full-column parse with a probed format; None if the rest of the column
+    disagrees. Each distinct text is parsed once and the results are taken
+    back to the rows, so the column is not expanded into a Python string
+    per row (dates repeat: a year of rows holds at most 366 days).
+    """
+    codes, uniques = pd.factorize(values)
+    attempts = [{}] if fmt == INFERRED else [{'format': fmt}, {}]
+    for kwargs in attempts:
+        try:
+            parsed = pd.to_datetime(uniques, **kwargs)
+        except (ValueError, TypeError, OverflowError):
+            continue
+        return pd.Series(parsed.array.take(codes, allow_fill=True), index=values.index, name=values.name)
+    return None
+
+
+def infer_datetime_columns(df, columns=None):
+    """{col: parsed datetime Series} for the text columns that hold dates"""
+    parsed = {}
+    for col in (text_columns(df) if columns is None else columns):
+        fmt = probe_datetime_format(df[col], col)
+        if fmt is None:
+            continue
+        values = parse_datetime(df[col], fmt)
+        if values is not None:
+            parsed[col] = values
+    return parsed
@@ -0,0 +1,103 @@
+"""
+Streaming Pipeline
+Group 6 - Runs the five feature steps over fixed-size row chunks so files
+larger than memory can be processed
+
+Pass 1 fits the global statistics (quartile edges, equal-width ratio bins,
+one-hot categories, frequency maps, anomaly thresholds) chunk by chunk.
+The quartiles behind the price edges and IQR thresholds come from a bounded
+quantile sketch, so a value within its rank error of an edge or fence can
+be binned or flagged differently than in the in-memory run; with
+exact_quantiles they are exact, for 8 bytes per row and monitored column.
+Pass 2 transforms each chunk with those statistics and appends it to the
+step and FINAL outputs, so only one chunk of rows is ever held as a frame.
+Each chunk and its outputs are cast to the dtypes of the whole file, taken
+from rows probed in pass 1 (see src/dtype_policy.py): a chunk without a NaT
+still writes its calendar columns as float when another chunk has one, as
+the in-memory run does. The date formats are those of the first chunk (see
+date_formats in src/schema_inference.py), as the in-memory run decides them
+on the file's first rows.
+"""
+
+import itertools
+
+from .dtype_policy import match_dtypes
+from .feature_pipeline import FeaturePipeline, STEP_NAMES
+from .instrumentation import StepMetrics
+from .readers import get_reader
+from .schema_inference import date_formats
+from .time_based_feature_extraction import resolve_as_of
+from .writers import STEP_SUFFIXES, open_writer, output_path
+
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def run_streaming(input_path, output_dir, base_name, chunksize=DEFAULT_CHUNKSIZE,
+                  save_steps=False, output_format='csv', as_of=None, float32=False, metrics=None,
+                  projection=None, reader=None, high_cardinality='onehot', exact_quantiles=False):
+    """projection: read only the columns it needs and write only its selection to FINAL
+    (see src/column_projection.py); reader: the src/readers.py engine;
+    exact_quantiles: keep the values behind the quartiles (see src/global_statistics.py)"""
+    metrics = metrics or StepMetrics()
+    reader = projection.reader if projection else get_reader(reader)
+    read_options = projection.read_options() if projection else {}
+    features = projection.registry_features if projection else None
+    print(f"  Streaming mode: {chunksize} rows per chunk")
+
+    print("\n  Pass 1/2: fitting global statistics")
+    with metrics.measure('fit') as stage:
+        pipeline = FeaturePipeline(float32=float32, features=features, high_cardinality=high_cardinality,
+                                   exact_quantiles=exact_quantiles)
+        pipeline.fit_csv(input_path, chunksize=chunksize, reader=reader, **read_options)
+        stage.rows = pipeline.rows
+    total_rows = pipeline.rows
+    print(f"  Rows: {total_rows}")
+
+    paths = [output_path(output_dir, base_name, suffix, output_format) for suffix in STEP_SUFFIXES]
+    writers = [open_writer(path, output_format) if save_steps or path == paths[-1] else None
+               for path in paths]
+
+    print("\n  Pass 2/2: transforming chunks")
+    # One reference time for every chunk
+    as_of = resolve_as_of(as_of)
+    original_cols = final_cols = new_features = rows = 0
+    input_dtypes = pipeline.probe.dtypes.to_dict()
+    step_dtypes = [df.dtypes.to_dict() for df in pipeline.transform_steps(pipeline.probe, as_of=as_of)]
+    try:
+        chunks = metrics.iterate('read_csv', reader.chunks(input_path, chunksize, **read_options))
+        rests = itertools.repeat(None)
+        if projection and projection.passthrough and projection.rest:
+            rests = metrics.iterate('read_passthrough', projection.read_rest(input_path, chunksize=chunksize))
+        # The first chunk decides the format of each date column for the whole file
+        with date_formats():
+            for i, (chunk, rest) in enumerate(zip(chunks, rests)):
+                original_cols = chunk.shape[1]
+                steps = pipeline.transform_steps(match_dtypes(chunk, input_dtypes), inplace=True, as_of=as_of)
+                for writer, df, dtypes in zip(writers, metrics.iterate(STEP_NAMES, steps), step_dtypes):
+                    df = match_dtypes(df, dtypes)
+                    if projection and writer is writers[-1]:
+                        df = projection.select(df, rest)
+                    if writer is not None:
+                        with metrics.measure('write', len(df)):
+                            writer.write(df)
+                final_cols = df.shape[1]
+                new_features = final_cols - original_cols
+                if projection:
+                    original_cols = len(projection.header)
+                    new_features = len(projection.generated(df.columns))
+                rows += len(df)
+                print(f"  Chunk {i + 1}: {rows}/{total_rows} rows")
+    finally:
+        for writer in writers:
+            if writer is not None:
+                writer.close()
+
+    print(f"\n  Saved final output: {paths[-1]}")
+
+    return {
+        'original_cols': original_cols,
+        'final_cols': final_cols,
+        'rows': rows,
+        'new_features': new_features
+    }
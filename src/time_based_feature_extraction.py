@@ -4,77 +4,114 @@ Group 6 - Extracts temporal features from datetime columns
 """
 
 import pandas as pd
-import numpy as np
 
-
-def time_based_feature_extraction(df):
-    df_new = df.copy()
-
-    # Detect datetime columns
-    datetime_cols = []
-    for col in df_new.columns:
-        if 'date' in col.lower() or 'time' in col.lower():
+from .calendar_features import calendar_features
+from .copy_policy import add_columns, working_copy
+from .dtype_policy import FLAG, DAY_COUNT, compact
+from .readers import read_step_input
+from .schema_inference import is_datetime_name, is_text, probe_datetime_format, parse_datetime
+
+
+def detect_datetime_columns(df):
+    """Columns named like a date/time that parse as datetimes -> parsed values"""
+    parsed = {}
+    for col in df.columns:
+        if not is_datetime_name(col):
+            continue
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # Already parsed upstream (encode_categorical_features)
+            parsed[col] = values
+        elif is_text(values):
+            fmt = probe_datetime_format(values, col)
+            values = parse_datetime(values, fmt) if fmt else None
+            if values is not None:
+                parsed[col] = values
+        else:
             try:
-                df_new[col] = pd.to_datetime(df_new[col])
-                datetime_cols.append(col)
+                parsed[col] = pd.to_datetime(values)
             except:
                 pass
+    return parsed
+
+
+def resolve_as_of(as_of=None):
+    """The reference time for the recency features; the current time if not given"""
+    return pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)
+
+
+def recency_features(col, dates, as_of):
+    """{col}_days_from_today and {col}_is_recent, measured from as_of"""
+    days = (as_of - dates).dt.days
+    return {f'{col}_days_from_today': compact(days, DAY_COUNT),
+            f'{col}_is_recent':       (days <= 30).astype(FLAG)}
+
+
+def recompute_recency(df, as_of, inplace=False):
+    """
+    Refresh only the recency columns of an already-featurised frame (e.g. a
+    reloaded FINAL output) for a new as_of; nothing else is recomputed.
+    Raises ValueError if a recency column's date column is not in the frame
+    (e.g. an output projected with --features), as it cannot be refreshed.
+    """
+    df_new = working_copy(df, inplace)
+    as_of = resolve_as_of(as_of)
+    cols = [c[:-len('_days_from_today')] for c in df_new.columns if c.endswith('_days_from_today')]
+    missing = [c for c in cols if c not in df_new.columns]
+    if missing:
+        raise ValueError(f"Cannot refresh the recency of {missing}: the date column is not in the frame")
+    parsed = detect_datetime_columns(df_new[cols])
+    for col in cols:
+        if col not in parsed:
+            raise ValueError(f"Column '{col}' no longer parses as a datetime")
+        for name, values in recency_features(col, parsed[col], as_of).items():
+            df_new[name] = values
+    return df_new
+
+
+def time_based_feature_extraction(df, as_of=None, inplace=False):
+    """
+    as_of: reference time for days_from_today / is_recent. Pass a fixed
+           value to make the output reproducible; defaults to now.
+    """
+    df_new = working_copy(df, inplace)
+    as_of = resolve_as_of(as_of)
+
+    # Detect datetime columns
+    parsed = detect_datetime_columns(df_new)
+    for col, values in parsed.items():
+        if not pd.api.types.is_datetime64_any_dtype(df_new[col]):
+            df_new[col] = values
+    datetime_cols = list(parsed)
 
     print(f"\n  Found {len(datetime_cols)} datetime column(s): {datetime_cols}")
 
+    new = {}
     for col in datetime_cols:
         print(f"\n  Extracting from: {col}")
 
-        df_new[f'{col}_year']         = df_new[col].dt.year
-        df_new[f'{col}_month']        = df_new[col].dt.month
-        df_new[f'{col}_month_name']   = df_new[col].dt.month_name()
-        df_new[f'{col}_day']          = df_new[col].dt.day
-        df_new[f'{col}_day_of_week']  = df_new[col].dt.dayofweek
-        df_new[f'{col}_day_name']     = df_new[col].dt.day_name()
-        df_new[f'{col}_quarter']      = df_new[col].dt.quarter
-        df_new[f'{col}_week_of_year'] = df_new[col].dt.isocalendar().week.astype(int)
-        df_new[f'{col}_is_weekend']   = df_new[col].dt.dayofweek.isin([5, 6]).astype(int)
-        df_new[f'{col}_is_month_start'] = df_new[col].dt.is_month_start.astype(int)
-        df_new[f'{col}_is_month_end']   = df_new[col].dt.is_month_end.astype(int)
-
-        epoch = pd.Timestamp('1970-01-01')
-        df_new[f'{col}_days_since_epoch'] = (df_new[col] - epoch).dt.days
-
-        month = df_new[col].dt.month
-        df_new[f'{col}_season'] = month.apply(lambda x:
-            'Winter' if x in [12, 1, 2] else
-            'Spring' if x in [3, 4, 5] else
-            'Summer' if x in [6, 7, 8] else
-            'Fall'
-        )
-
-        today = pd.Timestamp.now()
-        df_new[f'{col}_days_from_today'] = (today - df_new[col]).dt.days
-        df_new[f'{col}_is_recent']       = (df_new[f'{col}_days_from_today'] <= 30).astype(int)
-
-        new_cols = [c for c in df_new.columns if c.startswith(f'{col}_')]
-        for nc in new_cols:
+        # Every calendar feature is looked up per distinct day, not per row
+        created = {f'{col}_{name}': values for name, values in calendar_features(df_new[col]).items()}
+        created.update(recency_features(col, df_new[col], as_of))
+        for nc in created:
             print(f"    Created: {nc}")
+        new.update(created)
 
-    return df_new
+    return add_columns(df_new, new, inplace)
 
 
-def process_csv(input_file, output_file=None):
+def process_csv(input_file, output_file=None, inplace=False, as_of=None, features=None, reader=None):
     print("\n" + "="*55)
     print("MODULE 4: TIME-BASED FEATURE EXTRACTION")
     print("="*55)
 
-    if isinstance(input_file, str):
-        df = pd.read_csv(input_file)
-        print(f"Loaded: {input_file}")
-    else:
-        df = input_file.copy()
-        print("Loaded DataFrame from previous step")
+    df = read_step_input(input_file, inplace, features, reader)
 
-    print(f"Original shape: {df.shape}")
-    df_processed = time_based_feature_extraction(df)
+    original_shape = df.shape
+    print(f"Original shape: {original_shape}")
+    df_processed = time_based_feature_extraction(df, as_of=as_of, inplace=True)
     print(f"New shape: {df_processed.shape}")
-    print(f"Added {df_processed.shape[1] - df.shape[1]} new columns")
+    print(f"Added {df_processed.shape[1] - original_shape[1]} new columns")
 
     if output_file:
         df_processed.to_csv(output_file, index=False)
@@ -0,0 +1,275 @@
+"""
+Output Writers
+Group 6 - Pluggable writers for the step and FINAL outputs
+
+    csv      text, as before
+    parquet  columnar, compressed (needs pyarrow)
+    feather  Arrow IPC, fastest to reload (needs pyarrow)
+    npy      one raw NumPy column file per column plus schema.json, loadable
+             as zero-copy memory maps with read_npy_columns()
+
+The columnar formats store text and categorical columns such as age_group
+dictionary-encoded: one copy of each distinct label plus small integer codes.
+
+Every writer is opened on a path, accepts one or more frames through
+write() (appended in order, as the streaming mode needs) and is closed.
+csv and npy writers can also be reopened with append=True to extend an
+existing output (incremental mode); every frame must then have the columns
+already written.
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+STEP_SUFFIXES = ['_step1_computed', '_step2_encoded', '_step3_binned', '_step4_time', '_FINAL']
+
+OUTPUT_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'npy': '.npy',
+}
+
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"The {fmt} output format needs pyarrow: pip install pyarrow") from None
+
+
+def _is_fixed_width(dtype):
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufmM'
+
+
+def dictionary_encode(df):
+    """
+    Text and categorical columns as categoricals with string labels.
+    Non-string labels (e.g. Interval bins from pd.cut) are stored as their
+    text, which is also how they appear in the CSV.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            if not all(isinstance(c, str) for c in values.cat.categories):
+                values = values.cat.rename_categories([str(c) for c in values.cat.categories])
+        elif not _is_fixed_width(values.dtype):
+            values = values.astype('category')
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _check_columns(path, names, df):
+    """Raise unless df has the columns names, in that order"""
+    if [str(c) for c in df.columns] != names:
+        missing = [c for c in names if c not in df.columns]
+        extra = [c for c in df.columns if c not in names]
+        raise ValueError(f"{path}: the columns differ from the ones already written "
+                         f"(missing {missing}, new {extra})")
+
+
+class CsvWriter:
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.columns = None     # the header, once written
+        if append and os.path.exists(path) and os.path.getsize(path):
+            with open(path, newline='') as f:
+                self.columns = next(csv.reader(f))
+
+    def write(self, df):
+        if self.columns is None:
+            df.to_csv(self.path, mode='w', index=False)
+            self.columns = [str(c) for c in df.columns]
+        else:
+            _check_columns(self.path, self.columns, df)
+            df.to_csv(self.path, mode='a', header=False, index=False)
+
+    def close(self):
+        if self.columns is None:
+            open(self.path, 'w').close()
+
+
+class ParquetWriter:
+
+    def __init__(self, path):
+        _require_pyarrow('parquet')
+        self.path = path
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(dictionary_encode(df), preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        elif table.schema != self._writer.schema:
+            # Dictionary index widths can differ between chunks
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class FeatherWriter:
+    """Arrow IPC files cannot swap dictionaries mid-file, so this writes once"""
+
+    def __init__(self, path):
+        _require_pyarrow('feather')
+        self.path = path
+        self._written = False
+
+    def write(self, df):
+        if self._written:
+            raise ValueError("feather output cannot be appended to; use parquet or npy when streaming")
+        dictionary_encode(df).reset_index(drop=True).to_feather(self.path)
+        self._written = True
+
+    def close(self):
+        pass
+
+
+class NpyColumnsWriter:
+    """
+    A directory holding schema.json and one raw column file per column.
+    Text/categorical columns are written as int32 codes into a dictionary
+    kept in schema.json; codes stay stable when later chunks are appended.
+    Later chunks must have the same columns. A column whose values need a
+    wider dtype than the one stored (e.g. missing values in a column that
+    was int so far) has its file rewritten in the wider dtype.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.schema = None
+        self._labels = {}     # column -> {label: code}
+        os.makedirs(path, exist_ok=True)
+        schema_path = os.path.join(path, 'schema.json')
+        if append and os.path.exists(schema_path):
+            with open(schema_path) as f:
+                self.schema = json.load(f)
+            for entry in self.schema['columns']:
+                if entry['categories'] is not None:
+                    self._labels[entry['name']] = {label: i for i, label in enumerate(entry['categories'])}
+
+    def _column_file(self, i):
+        return os.path.join(self.path, f"{i:04d}.bin")
+
+    def write(self, df):
+        # Nullable integers (see conform in src/dtype_policy.py) are stored as float with NaN
+        nullable = [col for col in df.columns
+                    if not isinstance(df[col].dtype, np.dtype) and df[col].dtype.kind in 'biuf']
+        df = dictionary_encode(df.astype(dict.fromkeys(nullable, np.float64)) if nullable else df)
+        if self.schema is None:
+            self.schema = {'rows': 0, 'columns': []}
+            for i, col in enumerate(df.columns):
+                categorical = isinstance(df[col].dtype, pd.CategoricalDtype)
+                dtype = np.dtype(np.int32) if categorical else df[col].dtype
+                self.schema['columns'].append({'name': col, 'file': os.path.basename(self._column_file(i)),
+                                               'dtype': dtype.str, 'categories': [] if categorical else None})
+                open(self._column_file(i), 'wb').close()
+
+        _check_columns(self.path, [entry['name'] for entry in self.schema['columns']], df)
+
+        for i, entry in enumerate(self.schema['columns']):
+            values = df[entry['name']]
+            if entry['categories'] is not None:
+                labels = self._labels.setdefault(entry['name'], {})
+                for label in values.cat.categories:
+                    if label not in labels:
+                        labels[label] = len(labels)
+                        entry['categories'].append(label)
+                remap = np.array([labels[c] for c in values.cat.categories] + [-1], dtype=np.int32)
+                data = remap[values.cat.codes.to_numpy()]   # code -1 (missing) picks the -1 slot
+            else:
+                if values.dtype != np.dtype(entry['dtype']):
+                    self._widen(i, entry, values.dtype)
+                data = values.to_numpy(dtype=np.dtype(entry['dtype']))
+            with open(self._column_file(i), 'ab') as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+        self.schema['rows'] += len(df)
+
+    def _widen(self, i, entry, dtype):
+        """Store column i in the dtype holding both its values so far and dtype"""
+        stored = np.dtype(entry['dtype'])
+        try:
+            wider = np.promote_types(stored, dtype)
+        except TypeError:
+            raise ValueError(f"{self.path}: column {entry['name']!r} was written as {stored}, "
+                             f"cannot append {dtype}") from None
+        if wider != stored:
+            path = self._column_file(i)
+            np.fromfile(path, dtype=stored).astype(wider).tofile(path)
+            entry['dtype'] = wider.str
+
+    def close(self):
+        if self.schema is None:
+            self.schema = {'rows': 0, 'columns': []}
+        with open(os.path.join(self.path, 'schema.json'), 'w') as f:
+            json.dump(self.schema, f)
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+    'feather': FeatherWriter,
+    'npy': NpyColumnsWriter,
+}
+
+APPENDABLE_FORMATS = ['csv', 'npy']
+STREAMABLE_FORMATS = ['csv', 'parquet', 'npy']     # write() may be called more than once
+
+
+def output_path(output_dir, base_name, suffix, fmt='csv'):
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}'; choose from {sorted(OUTPUT_FORMATS)}")
+    return os.path.join(output_dir, f"{base_name}{suffix}{OUTPUT_FORMATS[fmt]}")
+
+
+def open_writer(path, fmt='csv', append=False):
+    if not append:
+        return WRITERS[fmt](path)
+    if fmt not in APPENDABLE_FORMATS:
+        raise ValueError(f"{fmt} output cannot be appended to; use one of {APPENDABLE_FORMATS}")
+    return WRITERS[fmt](path, append=True)
+
+
+def write_frame(df, path, fmt='csv'):
+    writer = open_writer(path, fmt)
+    writer.write(df)
+    writer.close()
+    return path
+
+
+def read_frame(path, fmt='csv'):
+    """Load an output written by write_frame / open_writer"""
+    if fmt == 'csv':
+        # round_trip so rewriting the frame reproduces the same float text
+        return pd.read_csv(path, float_precision='round_trip')
+    if fmt == 'npy':
+        return read_npy_columns(path)
+    _require_pyarrow(fmt)
+    return pd.read_parquet(path) if fmt == 'parquet' else pd.read_feather(path)
+
+
+def read_npy_columns(path):
+    """Load an npy output directory; numeric columns are memory-mapped, not read"""
+    with open(os.path.join(path, 'schema.json')) as f:
+        schema = json.load(f)
+    columns = {}
+    for entry in schema['columns']:
+        data = np.memmap(os.path.join(path, entry['file']), dtype=np.dtype(entry['dtype']),
+                         mode='r', shape=(schema['rows'],)) if schema['rows'] else \
+            np.empty(0, dtype=np.dtype(entry['dtype']))
+        if entry['categories'] is not None:
+            data = pd.Categorical.from_codes(np.asarray(data), categories=entry['categories'])
+        columns[entry['name']] = data
+    return pd.DataFrame(columns, copy=False)
@@ -15,10 +15,17 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.derive_computed_columns import derive_computed_columns
-from src.encode_categorical_features import encode_categorical_features
+from src.encode_categorical_features import (encode_categorical_features, map_categories, onehot_matrix,
+                                             MAX_ONEHOT, HASH_WIDTH)
 from src.bin_numeric_ranges import bin_numeric_ranges
+from src.bin_spec import BinSpec, load_bin_specs
 from src.time_based_feature_extraction import time_based_feature_extraction
-from src.flag_anomalies_column import flag_anomalies_column
+from src.flag_anomalies_column import flag_anomalies_column, zscore
+from src.schema_inference import date_formats, infer_datetime_columns, probe_datetime_format
+from src.online_anomaly import OnlineAnomalyDetector, QuantileSketch
+from src.dtype_policy import memory_report
+from src.feature_registry import REGISTRY
+from src.expressions import FormulaSet, BLOCK_ROWS
 
 
 # ─────────────────────────────────────────────
@@ -83,6 +90,67 @@ class TestDeriveComputedColumns:
         result = derive_computed_columns(sample_df)
         assert result.shape[1] > sample_df.shape[1]
 
+    def test_zero_denominator_is_missing(self, sample_df):
+        sample_df.loc[0, 'rating'] = 0.0
+        result = derive_computed_columns(sample_df)
+        assert pd.isna(result['price_per_rating'].iloc[0])
+        assert not np.isinf(result['price_per_rating']).any()
+
+
+class TestExpressions:
+
+    @pytest.fixture
+    def frame(self):
+        rng = np.random.default_rng(0)
+        rows = 3 * BLOCK_ROWS + 17       # several blocks and a partial one
+        return pd.DataFrame({'a': rng.normal(100, 30, rows), 'b': rng.integers(0, 5, rows),
+                             'c': rng.normal(0, 1, rows).astype(np.float32)})
+
+    def test_matches_pandas_operators(self, frame):
+        formulas = FormulaSet([('s', 'round(a + b * 2, 2)', None), ('r', 'round(s / b, 3)', None),
+                               ('q', 'c ** 2 - a', None), ('n', '-a / 4', None)])
+        values = formulas.evaluate(frame, workers=2)
+        expected = formulas.evaluate_pandas(frame)
+        for output in formulas.outputs:
+            np.testing.assert_array_equal(values[output], expected[output].to_numpy())
+            assert values[output].dtype == expected[output].dtype
+        np.testing.assert_array_equal(values['s'], (frame['a'] + frame['b'] * 2).round(2).to_numpy())
+
+    def test_common_subexpressions_computed_once(self):
+        formulas = FormulaSet([('x', 'round(a + b, 2)', None), ('y', 'round(a + b, 2) * 2', None),
+                               ('z', 'x * 2', None)])
+        ops = [op for op, _ in formulas.nodes]
+        assert ops.count('add') == 1 and ops.count('round') == 1 and ops.count('multiply') == 1
+
+    def test_division_by_zero_is_nan(self, frame):
+        formulas = FormulaSet([('r', 'a / b', None)])
+        values = formulas.evaluate(frame)
+        zero = frame['b'].to_numpy() == 0
+        assert zero.any() and np.isnan(values['r'][zero]).all()
+        assert np.isfinite(values['r'][~zero]).all()
+        assert formulas.evaluate_pandas(frame)['r'][zero].isna().all()
+
+    def test_output_dtype(self, frame):
+        formulas = FormulaSet([('r', 'a / 3', np.float32)])
+        values = formulas.evaluate(frame)
+        assert values['r'].dtype == np.float32
+        np.testing.assert_array_equal(values['r'], (frame['a'] / 3).astype(np.float32).to_numpy())
+
+    def test_nullable_columns_use_pandas(self, frame):
+        frame['b'] = frame['b'].astype('Int64')
+        frame.loc[0, 'b'] = pd.NA
+        values = FormulaSet([('s', 'a + b', None)]).evaluate(frame)
+        assert pd.isna(values['s'].iloc[0])
+
+    @pytest.mark.parametrize('text', ['a.b', 'max(a, b)', 'a if b else c', 'a / 0', 'round(a)', '"a" + 1'])
+    def test_rejects_unsupported_formulas(self, text):
+        with pytest.raises(ValueError):
+            FormulaSet([('x', text, None)])
+
+    def test_rejects_self_reference(self):
+        with pytest.raises(ValueError, match='depends on itself'):
+            FormulaSet([('x', 'y + 1', None), ('y', 'x * 2', None)])
+
 
 # ─────────────────────────────────────────────
 #  MODULE 2 TESTS: encode_categorical_features
@@ -90,6 +158,12 @@ class TestDeriveComputedColumns:
 
 class TestEncodeCategoricalFeatures:
 
+    @pytest.mark.parametrize('values', [['b', 'a', 'b'], ['b', None, 'zz', 'a']])
+    def test_map_categories_matches_series_map(self, values):
+        series = pd.Series(values, index=[3, 1, 4, 1][:len(values)], name='col')
+        mapping = {'a': 1, 'b': 2}
+        pd.testing.assert_series_equal(map_categories(series, mapping), series.map(mapping))
+
     def test_creates_education_encoded(self, sample_df):
         result = encode_categorical_features(sample_df)
         assert 'education_encoded' in result.columns
@@ -119,6 +193,43 @@ class TestEncodeCategoricalFeatures:
         assert len(result) == len(sample_df)
 
 
+@pytest.fixture
+def sku_df():
+    """product_category with 500 SKUs, a few of them frequent"""
+    rng = np.random.default_rng(3)
+    weights = 1 / np.arange(1, 501)
+    return pd.DataFrame({'product_category': rng.choice([f'SKU{i:03d}' for i in range(500)], 5000,
+                                                        p=weights / weights.sum())})
+
+
+class TestHighCardinalityEncoding:
+
+    def test_top_categories_and_other_bucket(self, sku_df):
+        result = encode_categorical_features(sku_df)
+        flags = [c for c in result.columns if c.startswith('product_category_')]
+        assert len(flags) == MAX_ONEHOT + 1 and flags[-1] == 'product_category__other'
+        assert 'product_category_SKU000' in flags
+        assert (result[flags].sum(axis=1) == 1).all()
+
+    def test_codes_rank_by_frequency(self, sku_df):
+        result = encode_categorical_features(sku_df, high_cardinality='codes')
+        codes = result['product_category_code']
+        assert codes.dtype == np.int16
+        assert codes[sku_df['product_category'] == 'SKU000'].eq(0).all()
+
+    def test_hash_width_is_fixed(self, sku_df):
+        result = encode_categorical_features(sku_df, high_cardinality='hash')
+        flags = [c for c in result.columns if c.startswith('product_category_hash_')]
+        assert len(flags) == HASH_WIDTH
+        assert (result[flags].sum(axis=1) == 1).all()
+
+    def test_sparse_matrix_stores_one_value_per_row(self, sku_df):
+        matrix, categories = onehot_matrix(sku_df['product_category'])
+        assert matrix.shape == (5000, sku_df['product_category'].nunique())
+        assert matrix.nnz == 5000
+        assert categories[matrix[0].indices[0]] == sku_df['product_category'].iloc[0]
+
+
 # ─────────────────────────────────────────────
 #  MODULE 3 TESTS: bin_numeric_ranges
 # ─────────────────────────────────────────────
@@ -156,6 +267,44 @@ class TestBinNumericRanges:
         assert len(result) == len(sample_df)
 
 
+class TestBinSpec:
+
+    @pytest.mark.parametrize('closed', ['right', 'left'])
+    @pytest.mark.parametrize('include_lowest', [False, True])
+    @pytest.mark.parametrize('edges', [[0, 10, 25, 40, 100], list(np.linspace(-5, 105, 30))])
+    def test_matches_pd_cut(self, closed, include_lowest, edges):
+        values = pd.Series([-1, 0, 0.5, 10, 10.01, 25, 40, 99.99, 100, 105, np.nan, np.inf])
+        spec = BinSpec('tier', 'x', edges, closed=closed, include_lowest=include_lowest)
+        expected = pd.cut(values, bins=edges, right=closed == 'right', include_lowest=include_lowest)
+        result = spec.bin(values)
+        assert result.cat.codes.tolist() == expected.cat.codes.tolist()
+        assert result.cat.ordered
+        assert result.astype(str).tolist() == expected.astype(str).tolist()
+
+    def test_chunks_share_one_dtype(self):
+        spec = BinSpec('tier', 'x', [0, 1, 2], ['low', 'high'])
+        first, second = spec.bin(pd.Series([0.5])), spec.bin(pd.Series([1.5]))
+        assert first.dtype is second.dtype
+        assert first.cat.codes.dtype == np.int8
+
+    def test_loads_from_json(self, tmp_path):
+        path = tmp_path / "bins.json"
+        path.write_text('{"bins": [{"output": "score_band", "source": "score", '
+                        '"edges": ["-inf", 0, "inf"], "labels": ["neg", "pos"]}]}')
+        [spec] = load_bin_specs(str(path))
+        assert spec.bin(pd.Series([-3, 0, 2])).tolist() == ['neg', 'neg', 'pos']
+        assert BinSpec.from_dict(spec.to_dict()).edges.tolist() == [-np.inf, 0, np.inf]
+
+    @pytest.mark.parametrize('edges, labels, closed', [
+        ([0, 10, 5], None, 'right'),
+        ([0, 10], ['a', 'b'], 'right'),
+        ([0, 10], None, 'both'),
+    ])
+    def test_invalid_spec_is_rejected(self, edges, labels, closed):
+        with pytest.raises(ValueError):
+            BinSpec('tier', 'x', edges, labels, closed)
+
+
 # ─────────────────────────────────────────────
 #  MODULE 4 TESTS: time_based_feature_extraction
 # ─────────────────────────────────────────────
@@ -203,6 +352,21 @@ class TestTimeBasedFeatureExtraction:
         result = time_based_feature_extraction(sample_df)
         assert len(result) == len(sample_df)
 
+    def test_names_are_categorical(self, sample_df):
+        result = time_based_feature_extraction(sample_df)
+        for name in ['month_name', 'day_name', 'season']:
+            assert isinstance(result[f'purchase_date_{name}'].dtype, pd.CategoricalDtype)
+
+    def test_lookup_matches_dt_accessors(self):
+        dates = pd.Series(pd.to_datetime(['1969-12-31 23:30', '2024-02-29 12:00', None,
+                                          '2021-01-03', '1900-03-01'], format='ISO8601'))
+        result = time_based_feature_extraction(pd.DataFrame({'order_date': dates}))
+        assert result['order_date_day'].equals(dates.dt.day.astype(float))
+        assert result['order_date_days_since_epoch'].equals(
+            (dates - pd.Timestamp('1970-01-01')).dt.days)
+        assert result['order_date_week_of_year'].tolist()[3] == 53
+        assert result['order_date_day_name'].astype(object).equals(dates.dt.day_name().astype(object))
+
 
 # ─────────────────────────────────────────────
 #  MODULE 5 TESTS: flag_anomalies_column
@@ -240,6 +404,159 @@ class TestFlagAnomaliesColumn:
         result = flag_anomalies_column(sample_df)
         assert len(result) == len(sample_df)
 
+    def test_flags_are_int8(self, sample_df):
+        result = flag_anomalies_column(sample_df)
+        flags = [c for c in result.columns if 'anomaly' in c]
+        assert all(result[c].dtype == np.int8 for c in flags)
+        assert result['anomaly_score'].equals(
+            result.filter(like='_is_anomaly').sum(axis=1).astype(np.int8))
+
+    def test_missing_values_not_flagged(self, sample_df):
+        sample_df.loc[1, 'income'] = np.nan
+        result = flag_anomalies_column(sample_df)
+        assert result['income_is_anomaly'].iloc[1] == 0
+        assert result['income_is_anomaly'].iloc[4] == 1
+
+    def test_zscore_matches_scipy(self):
+        stats = pytest.importorskip('scipy.stats')
+        values = np.random.default_rng(1).normal(50, 7, 1001)
+        assert np.array_equal(zscore(values), stats.zscore(values))
+
+
+class TestOnlineAnomalyDetector:
+
+    def test_matches_exact_flags_on_small_input(self, sample_df):
+        online = OnlineAnomalyDetector().update(sample_df.iloc[:2]).update(sample_df.iloc[2:])
+        expected = flag_anomalies_column(sample_df)
+        assert online.flag(sample_df).equals(expected)
+
+    def test_sketch_rank_error_bound(self):
+        values = np.random.default_rng(0).lognormal(size=200_000)
+        parts = [QuantileSketch().update(chunk) for chunk in np.array_split(values, 8)]
+        sketch = parts[0]
+        for part in parts[1:]:
+            sketch.merge(part)
+        assert not sketch.is_exact
+        ordered = np.sort(values)
+        for q in [0.25, 0.5, 0.75]:
+            rank = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+            assert abs(rank - q) < 0.001
+
+    def test_merge_and_state_roundtrip(self, sample_df):
+        a = OnlineAnomalyDetector().update(sample_df.iloc[:3])
+        b = OnlineAnomalyDetector().update(sample_df.iloc[3:])
+        merged = OnlineAnomalyDetector.from_state(a.to_state()).merge(b)
+        whole = OnlineAnomalyDetector().update(sample_df).thresholds()
+        for col, expected in whole.items():
+            assert merged.thresholds()[col] == pytest.approx(expected)
+
+
+# ─────────────────────────────────────────────
+#  SHARED: schema_inference
+# ─────────────────────────────────────────────
+
+class TestSchemaInference:
+
+    def test_detects_iso_dates(self):
+        df = pd.DataFrame({'signup': ['2024-01-15', '2024-06-20'], 'name': ['Ann', 'Bob']})
+        parsed = infer_datetime_columns(df)
+        assert list(parsed) == ['signup']
+        assert parsed['signup'].iloc[1] == pd.Timestamp('2024-06-20')
+
+    def test_probe_returns_explicit_format(self):
+        values = pd.Series(['03/15/2024', '12/01/2023'])
+        assert probe_datetime_format(values, 'order_date') == '%m/%d/%Y'
+
+    def test_formats_not_carried_to_the_next_file(self):
+        probe_datetime_format(pd.Series(['25/12/2024', '13/01/2024']), 'order_date')
+        assert probe_datetime_format(pd.Series(['03/04/2024', '05/06/2024']), 'order_date') == '%m/%d/%Y'
+
+    def test_first_sample_decides_within_a_file(self):
+        with date_formats() as formats:
+            probe_datetime_format(pd.Series(['25/12/2024', '13/01/2024']), 'order_date')
+            assert probe_datetime_format(pd.Series(['03/04/2024']), 'order_date') == '%d/%m/%Y'
+        assert formats == {'order_date': '%d/%m/%Y'}
+
+    def test_free_text_not_datetime(self):
+        values = pd.Series(['Electronics', 'Clothing', 'Food'])
+        assert probe_datetime_format(values) is None
+
+    def test_encode_hands_parsed_dates_to_time_step(self, sample_df):
+        df = sample_df.copy()
+        df['purchase_date'] = df['purchase_date'].dt.strftime('%Y-%m-%d')
+        encoded = encode_categorical_features(df)
+        assert pd.api.types.is_datetime64_any_dtype(encoded['purchase_date'])
+        result = time_based_feature_extraction(encoded)
+        assert result['purchase_date_year'].tolist() == [2024, 2024, 2024, 2023, 2024]
+
+
+# ─────────────────────────────────────────────
+#  SHARED: feature_registry
+# ─────────────────────────────────────────────
+
+class TestFeatureRegistry:
+
+    def test_dependencies_scheduled_first(self, sample_df):
+        levels = [[f.name for f in level] for level in REGISTRY.plan('derive', sample_df.columns)]
+        assert levels[1:] == [['final_price'], ['price_per_rating']]
+        assert 'total_cost' in levels[0] and 'discount_amount' in levels[0]
+
+    def test_missing_input_skips_subtree(self, sample_df):
+        result = derive_computed_columns(sample_df.drop(columns=['shipping_cost']))
+        for col in ['total_cost', 'final_price', 'price_per_rating']:
+            assert col not in result.columns
+        assert 'discount_amount' in result.columns
+        assert 'price_quartile' not in bin_numeric_ranges(result).columns
+
+    def test_requested_outputs_only(self, sample_df):
+        result = derive_computed_columns(sample_df, features=['price_quartile'])
+        added = [c for c in result.columns if c not in sample_df.columns]
+        assert added == ['total_cost', 'discount_amount', 'final_price']
+        assert list(bin_numeric_ranges(result, features=['price_quartile']).columns)[-1] == 'price_quartile'
+
+    def test_concurrent_levels_match_sequential(self, sample_df):
+        sequential = REGISTRY.compute(sample_df, 'derive', workers=1)
+        concurrent = REGISTRY.compute(sample_df, 'derive', workers=4)
+        assert list(sequential) == list(concurrent)
+        for col, values in sequential.items():
+            pd.testing.assert_series_equal(values, concurrent[col])
+
+
+# ─────────────────────────────────────────────
+#  SHARED: dtype_policy
+# ─────────────────────────────────────────────
+
+class TestDtypePolicy:
+
+    def test_generated_columns_are_compact(self, sample_df):
+        df = time_based_feature_extraction(encode_categorical_features(derive_computed_columns(sample_df)))
+        assert df['gender_Male'].dtype == np.int8
+        assert df['education_encoded'].dtype == np.int8
+        assert df['purchase_date_year'].dtype == np.int16
+        assert df['purchase_date_month'].dtype == np.int8
+        assert df['purchase_date_is_weekend'].dtype == np.int8
+        assert df['purchase_date_days_from_today'].dtype == np.int32
+
+    def test_missing_dates_stay_float(self, sample_df):
+        df = sample_df.copy()
+        df.loc[0, 'purchase_date'] = pd.NaT
+        result = time_based_feature_extraction(df)
+        assert result['purchase_date_month'].dtype == float
+        assert np.isnan(result['purchase_date_days_from_today'].iloc[0])
+
+    def test_float32_ratios(self, sample_df):
+        result = derive_computed_columns(sample_df, float32=True)
+        assert result['income_purchase_ratio'].dtype == np.float32
+        assert result['total_cost'].dtype == np.float64
+        expected = derive_computed_columns(sample_df)['income_purchase_ratio']
+        assert result['income_purchase_ratio'].tolist() == pytest.approx(expected.tolist(), rel=1e-6)
+
+    def test_memory_report_counts_savings(self, sample_df):
+        df = encode_categorical_features(sample_df)
+        report = memory_report(df, ['gender_Male']).iloc[0]
+        assert report['bytes'] == len(df)
+        assert report['saved'] == 7 * len(df)
+
 
 # ─────────────────────────────────────────────
 #  INTEGRATION TEST: Full Pipeline
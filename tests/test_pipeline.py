@@ -0,0 +1,1092 @@
+"""
+tests/test_pipeline.py
+PyTest Test Suite - Pipeline execution modes
+Group 6 | DevOps Midterm
+
+Run with: pytest tests/ -v
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+import json
+import os
+import subprocess
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import main
+import benchmark
+import generate_sample_data
+from src.derive_computed_columns import derive_computed_columns
+from src.encode_categorical_features import encode_categorical_features
+from src.bin_numeric_ranges import bin_numeric_ranges
+from src.time_based_feature_extraction import time_based_feature_extraction
+from src.flag_anomalies_column import flag_anomalies_column
+from src.global_statistics import GlobalStatistics
+from src.feature_pipeline import FeaturePipeline
+from src.partitioned_executor import run_partitioned, SharedColumns
+from src.writers import write_frame, read_npy_columns, CsvWriter, NpyColumnsWriter
+from src.result_cache import ResultCache, code_files
+from src.instrumentation import StepMetrics
+from src.feature_pipeline import STEP_NAMES
+from src.column_projection import Projection
+from src import readers
+from src.readers import get_reader
+from src.directory_watcher import DirectoryWatcher
+from src.overlapped_io import OverlappedIO
+
+
+# ─────────────────────────────────────────────
+#  SHARED FIXTURES
+# ─────────────────────────────────────────────
+
+@pytest.fixture
+def input_dir(tmp_path):
+    """input/ folder holding a 300-row CSV with the sample schema"""
+    rng = np.random.default_rng(6)
+    n = 300
+    df = pd.DataFrame({
+        'customer_id':      range(1, n + 1),
+        'age':              rng.integers(18, 80, n),
+        'gender':           rng.choice(['Male', 'Female', 'Other'], n),
+        'education':        rng.choice(['High School', 'Bachelor', 'Master', 'PhD'], n),
+        'income':           rng.integers(20000, 150000, n),
+        'purchase_amount':  rng.uniform(10, 5000, n).round(2),
+        'purchase_date':    pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'product_category': rng.choice(['Electronics', 'Clothing', 'Food', 'Books', 'Home'], n),
+        'region':           rng.choice(['North', 'South', 'East', 'West'], n),
+        'rating':           rng.uniform(1, 5, n).round(1),
+        'discount_percent': rng.uniform(0, 50, n).round(2),
+        'shipping_cost':    rng.uniform(0, 50, n).round(2),
+    })
+    df['purchase_date'] = df['purchase_date'].dt.strftime('%Y-%m-%d')
+    folder = tmp_path / "input"
+    folder.mkdir()
+    df.to_csv(folder / "sample.csv", index=False)
+    return folder
+
+
+def read_outputs(folder):
+    # run_metrics.json holds timings, which differ from run to run
+    return {f: (folder / f).read_bytes() for f in sorted(os.listdir(folder)) if f != main.METRICS_FILE}
+
+
+# ─────────────────────────────────────────────
+#  STREAMING MODE
+# ─────────────────────────────────────────────
+
+class TestStreamingPipeline:
+
+    def test_streaming_matches_in_memory(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "full"), save_steps=True)
+        main.run_pipeline(str(input_dir), str(tmp_path / "chunked"), chunksize=64, save_steps=True)
+        assert read_outputs(tmp_path / "full") == read_outputs(tmp_path / "chunked")
+
+    def test_missing_values_in_one_chunk_match_in_memory(self, input_dir, tmp_path):
+        df = pd.read_csv(input_dir / "sample.csv")
+        df.loc[150, 'purchase_date'] = None
+        df.loc[10, 'age'] = None
+        df.to_csv(input_dir / "sample.csv", index=False)
+        main.run_pipeline(str(input_dir), str(tmp_path / "full"), save_steps=True, as_of='2025-01-01')
+        main.run_pipeline(str(input_dir), str(tmp_path / "chunked"), chunksize=64, save_steps=True,
+                          as_of='2025-01-01')
+        assert read_outputs(tmp_path / "full") == read_outputs(tmp_path / "chunked")
+
+    def test_streaming_matches_in_memory_beyond_the_sketch(self, tmp_path):
+        # 50k values per column compact the quantile sketch (k = 2048) several times
+        generate_sample_data.write_sample(str(tmp_path / "input" / "big.csv"), 50_000, today='2025-01-01')
+        main.run_pipeline(str(tmp_path / "input"), str(tmp_path / "full"), as_of='2025-01-01')
+        main.run_pipeline(str(tmp_path / "input"), str(tmp_path / "chunked"), as_of='2025-01-01',
+                          chunksize=5000, exact_quantiles=True)
+        assert read_outputs(tmp_path / "full") == read_outputs(tmp_path / "chunked")
+
+    def test_sketched_quartiles_within_rank_error(self, tmp_path):
+        path = tmp_path / "big.csv"
+        generate_sample_data.write_sample(str(path), 50_000, today='2025-01-01')
+        stats = GlobalStatistics()
+        for chunk in pd.read_csv(path, chunksize=5000):
+            stats.update(derive_computed_columns(chunk))
+        params = stats.finalize()
+        df = derive_computed_columns(pd.read_csv(path))
+        for col, threshold in params['thresholds'].items():
+            assert not stats.detector.sketches[col].is_exact
+            values = np.sort(df[col].dropna().to_numpy(dtype=float))
+            for q, value in [(0.25, threshold['q1']), (0.75, threshold['q3'])]:
+                # Ranks the value spans (columns such as age have ties)
+                low = np.searchsorted(values, value, side='left') / len(values)
+                high = np.searchsorted(values, value, side='right') / len(values)
+                assert low - 0.001 < q < high + 0.001
+        assert params['price_edges'][1] == params['thresholds']['final_price']['q1']
+
+    def test_streaming_summary(self, input_dir, tmp_path):
+        results = main.run_pipeline(str(input_dir), str(tmp_path / "out"), chunksize=100)
+        assert results['sample.csv']['rows'] == 300
+        assert results['sample.csv']['new_features'] > 0
+
+    def test_statistics_merge_across_chunks(self, input_dir):
+        df = derive_computed_columns(pd.read_csv(input_dir / "sample.csv"))
+        whole, chunked = GlobalStatistics(), GlobalStatistics()
+        whole.update(df)
+        for start in range(0, len(df), 70):
+            chunked.update(df.iloc[start:start + 70])
+        a, b = whole.finalize(), chunked.finalize()
+        assert a['price_edges'] == b['price_edges']
+        assert a['frequencies'] == b['frequencies']
+        for col, t in a['thresholds'].items():
+            assert b['thresholds'][col]['mean'] == pytest.approx(t['mean'])
+            assert b['thresholds'][col]['std'] == pytest.approx(t['std'])
+
+    def test_statistics_memory_does_not_grow_with_rows(self):
+        rng = np.random.default_rng(1)
+        stats = GlobalStatistics()
+        for _ in range(50):
+            stats.update(pd.DataFrame({'final_price': rng.lognormal(5, 1, 10_000)}))
+        assert stats.rows == 500_000 and not stats.values
+        sketch = stats.detector.sketches['final_price']
+        assert sum(len(items) for items in sketch.levels) <= 3 * sketch.k
+        assert stats.finalize()['price_edges'][0] == sketch.min
+
+    def test_fixed_categories_give_stable_schema(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        batch = df[df['gender'] == 'Male'].head(3)
+        cats = {'gender': ['Female', 'Male', 'Other']}
+        result = encode_categorical_features(batch, onehot_categories=cats)
+        assert {'gender_Female', 'gender_Male', 'gender_Other'} <= set(result.columns)
+        assert result['gender_Female'].sum() == 0
+
+
+# ─────────────────────────────────────────────
+#  FIT / TRANSFORM
+# ─────────────────────────────────────────────
+
+class TestFeaturePipeline:
+
+    def test_transform_matches_full_run(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        pipeline = FeaturePipeline().fit(df)
+        full = pipeline.transform(df)
+        batch = pipeline.transform(df.iloc[10:15])
+        pd.testing.assert_frame_equal(batch, full.iloc[10:15])
+
+    def test_schema_stable_for_small_batches(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        pipeline = FeaturePipeline().fit(df)
+        one = pipeline.transform(df.iloc[:1])
+        two = pipeline.transform(df.iloc[100:102])
+        assert list(one.columns) == list(two.columns)
+
+    def test_save_load_roundtrip(self, input_dir, tmp_path):
+        df = pd.read_csv(input_dir / "sample.csv")
+        pipeline = FeaturePipeline().fit(df)
+        pipeline.save(tmp_path / "pipeline.json")
+        loaded = FeaturePipeline.load(tmp_path / "pipeline.json")
+        pd.testing.assert_frame_equal(loaded.transform(df.iloc[:20]),
+                                      pipeline.transform(df.iloc[:20]))
+
+    def test_save_load_keeps_the_options(self, input_dir, tmp_path):
+        df = pd.read_csv(input_dir / "sample.csv")
+        pipeline = FeaturePipeline(float32=True, features=['spending_power_index', 'price_quartile'],
+                                   high_cardinality='hash', exact_quantiles=True).fit(df)
+        pipeline.save(tmp_path / "pipeline.json")
+        loaded = FeaturePipeline.load(tmp_path / "pipeline.json")
+        for name in ('float32', 'features', 'high_cardinality', 'exact_quantiles'):
+            assert getattr(loaded, name) == getattr(pipeline, name)
+        out = loaded.transform(df.iloc[:20])
+        pd.testing.assert_frame_equal(out, pipeline.transform(df.iloc[:20]))
+        assert out['spending_power_index'].dtype == np.float32
+        assert 'price_per_rating' not in out.columns
+
+    def test_transform_inplace_matches_copy(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        pipeline = FeaturePipeline().fit(df)
+        batch = df.iloc[:5].copy()
+        copied = pipeline.transform(batch, as_of='2025-01-01')
+        assert list(batch.columns) == list(df.columns)
+        pd.testing.assert_frame_equal(pipeline.transform(batch, inplace=True, as_of='2025-01-01'), copied)
+
+    def test_unfitted_transform_raises(self, input_dir):
+        with pytest.raises(RuntimeError):
+            FeaturePipeline().transform(pd.read_csv(input_dir / "sample.csv"))
+
+
+# ─────────────────────────────────────────────
+#  PARALLEL FILES
+# ─────────────────────────────────────────────
+
+class TestParallelFiles:
+
+    @pytest.fixture
+    def multi_input_dir(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        df.iloc[:120].to_csv(input_dir / "part_a.csv", index=False)
+        df.iloc[120:].to_csv(input_dir / "part_b.csv", index=False)
+        (input_dir / "broken.csv").write_text("")
+        return input_dir
+
+    def test_parallel_matches_serial(self, multi_input_dir, tmp_path):
+        serial = main.run_pipeline(str(multi_input_dir), str(tmp_path / "serial"), save_steps=True)
+        parallel = main.run_pipeline(str(multi_input_dir), str(tmp_path / "parallel"), workers=3,
+                                     save_steps=True)
+        assert serial == parallel
+        assert list(serial) == list(parallel)
+        assert read_outputs(tmp_path / "serial") == read_outputs(tmp_path / "parallel")
+
+    def test_failed_file_is_isolated(self, multi_input_dir, tmp_path):
+        results = main.run_pipeline(str(multi_input_dir), str(tmp_path / "out"), workers=2)
+        assert 'broken.csv' not in results
+        assert {'sample.csv', 'part_a.csv', 'part_b.csv'} <= set(results)
+
+
+# ─────────────────────────────────────────────
+#  PARTITIONED (INTRA-FILE) EXECUTION
+# ─────────────────────────────────────────────
+
+class TestPartitionedExecutor:
+
+    def test_matches_single_core(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        expected = [derive_computed_columns(df)]
+        expected.append(encode_categorical_features(expected[-1]))
+        expected.append(bin_numeric_ranges(expected[-1]))
+        expected.append(time_based_feature_extraction(expected[-1]))
+        expected.append(flag_anomalies_column(expected[-1]))
+
+        frames = run_partitioned(df, workers=2, partitions=5)
+        for want, got in zip(expected, frames):
+            pd.testing.assert_frame_equal(got, want)
+
+    def test_pipeline_output_matches(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "serial"), save_steps=True)
+        main.run_pipeline(str(input_dir), str(tmp_path / "rows"), row_workers=2, save_steps=True)
+        assert read_outputs(tmp_path / "serial") == read_outputs(tmp_path / "rows")
+
+    def test_missing_values_past_the_probe_rows(self, input_dir, tmp_path):
+        df = pd.read_csv(input_dir / "sample.csv")
+        df.loc[150, 'purchase_date'] = None
+        df.loc[200, 'income'] = None
+        df.to_csv(input_dir / "sample.csv", index=False)
+        main.run_pipeline(str(input_dir), str(tmp_path / "serial"), as_of='2025-01-01')
+        main.run_pipeline(str(input_dir), str(tmp_path / "rows"), as_of='2025-01-01', row_workers=2)
+        assert read_outputs(tmp_path / "serial") == read_outputs(tmp_path / "rows")
+        final = pd.read_csv(tmp_path / "rows" / "sample_FINAL.csv")
+        assert final.loc[150, ['purchase_date_year', 'purchase_date_month_name', 'purchase_date_days_from_today']].isna().all()
+
+    def test_shared_columns_roundtrip(self, tmp_path):
+        cols = SharedColumns.create(str(tmp_path), {'a': np.int64, 'b': np.float32}, 10)
+        cols.array('a')[:] = np.arange(10)
+        other = SharedColumns.attach(cols.spec())
+        assert other.array('a').tolist() == list(range(10))
+        assert other.frame(2, 4).index.tolist() == [2, 3]
+
+
+# ─────────────────────────────────────────────
+#  COPY-FREE EXECUTION
+# ─────────────────────────────────────────────
+
+STEPS = [derive_computed_columns, encode_categorical_features, bin_numeric_ranges,
+         time_based_feature_extraction, flag_anomalies_column]
+
+
+class TestCopyFreeExecution:
+
+    def test_default_leaves_input_untouched(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        before = df.copy()
+        for step in STEPS:
+            step(df)
+        pd.testing.assert_frame_equal(df, before)
+
+    def test_inplace_attaches_to_input(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        result = derive_computed_columns(df, inplace=True)
+        assert result is df
+        assert 'final_price' in df.columns
+
+    def test_inplace_matches_copying_run(self, input_dir):
+        df = pd.read_csv(input_dir / "sample.csv")
+        copied, inplace = df, df.copy()
+        for step in STEPS:
+            copied = step(copied)
+            inplace = step(inplace, inplace=True)
+        pd.testing.assert_frame_equal(inplace, copied)
+
+    def test_peak_memory_bounded(self, input_dir):
+        import tracemalloc
+        df = pd.concat([pd.read_csv(input_dir / "sample.csv")] * 100, ignore_index=True)
+        input_bytes = df.memory_usage(deep=True).sum()
+        # Warm up first-call imports and caches so only the run itself is traced
+        warm = df.head(50).copy()
+        for step in STEPS:
+            warm = step(warm, inplace=True)
+
+        tracemalloc.start()
+        temporaries = 0
+        for step in STEPS:
+            tracemalloc.reset_peak()
+            df = step(df, inplace=True)
+            current, peak = tracemalloc.get_traced_memory()
+            temporaries = max(temporaries, peak - current)
+        tracemalloc.stop()
+
+        added_bytes = df.memory_usage(deep=True).sum() - input_bytes
+        # The input was allocated before tracing, so a copy of it shows up in
+        # full: in what the run keeps if a step returns the copy, in that
+        # step's temporaries if it is dropped again. Either breaks the bound.
+        slack = input_bytes / 2
+        assert current < added_bytes + slack
+        assert temporaries < slack
+
+# ─────────────────────────────────────────────
+#  OUTPUTS AND WRITERS
+# ─────────────────────────────────────────────
+
+class TestOutputs:
+
+    def test_final_only_by_default(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"))
+        assert sorted(os.listdir(tmp_path / "out")) == [main.METADATA_FILE, main.METRICS_FILE,
+                                                        'sample_FINAL.csv']
+
+    def test_save_steps_writes_snapshots(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), save_steps=True)
+        assert len(os.listdir(tmp_path / "out")) == 5 + 2   # + run_metadata.json, run_metrics.json
+
+    def test_npy_roundtrip(self, input_dir, tmp_path):
+        df = FeaturePipeline().fit_transform(pd.read_csv(input_dir / "sample.csv"))
+        write_frame(df, tmp_path / "final.npy", 'npy')
+        loaded = read_npy_columns(tmp_path / "final.npy")
+        assert list(loaded.columns) == list(df.columns)
+        assert loaded['final_price'].tolist() == df['final_price'].tolist()
+        assert loaded['age_group'].astype(str).tolist() == df['age_group'].astype(str).tolist()
+        assert isinstance(loaded['purchase_date_season'].dtype, pd.CategoricalDtype)
+
+    def test_npy_codes_stable_across_appends(self, tmp_path):
+        writer = NpyColumnsWriter(tmp_path / "cols.npy")
+        writer.write(pd.DataFrame({'season': ['Fall', 'Winter']}))
+        writer.write(pd.DataFrame({'season': ['Spring', 'Fall']}))
+        writer.close()
+        loaded = read_npy_columns(tmp_path / "cols.npy")
+        assert loaded['season'].tolist() == ['Fall', 'Winter', 'Spring', 'Fall']
+
+    def test_npy_widens_a_column_for_missing_values(self, tmp_path):
+        writer = NpyColumnsWriter(tmp_path / "cols.npy")
+        writer.write(pd.DataFrame({'year': np.array([2024, 2025], dtype=np.int16)}))
+        writer.write(pd.DataFrame({'year': [np.nan, 2026.0]}))
+        writer.close()
+        loaded = read_npy_columns(tmp_path / "cols.npy")
+        assert loaded['year'].dtype == np.float64
+        np.testing.assert_array_equal(loaded['year'], [2024, 2025, np.nan, 2026])
+
+    def test_npy_rejects_different_columns(self, tmp_path):
+        writer = NpyColumnsWriter(tmp_path / "cols.npy")
+        writer.write(pd.DataFrame({'a': [1], 'b': [2]}))
+        with pytest.raises(ValueError, match="new \\['c'\\]"):
+            writer.write(pd.DataFrame({'a': [1], 'b': [2], 'c': [3]}))
+        with pytest.raises(ValueError, match="missing \\['b'\\]"):
+            writer.write(pd.DataFrame({'a': [1]}))
+
+    def test_csv_append_rejects_different_columns(self, tmp_path):
+        path = tmp_path / "out.csv"
+        write_frame(pd.DataFrame({'a': [1], 'b': [2]}), path)
+        writer = CsvWriter(path, append=True)
+        with pytest.raises(ValueError, match="missing \\['b'\\], new \\['c'\\]"):
+            writer.write(pd.DataFrame({'a': [1], 'c': [3]}))
+        writer.write(pd.DataFrame({'a': [3], 'b': [4]}))
+        writer.close()
+        assert pd.read_csv(path).to_dict('list') == {'a': [1, 3], 'b': [2, 4]}
+
+    def test_feather_rejected_with_chunksize(self, input_dir, tmp_path):
+        with pytest.raises(ValueError, match='chunksize'):
+            main.run_pipeline(str(input_dir), str(tmp_path / "out"), chunksize=100, output_format='feather')
+
+    def test_parquet_output(self, input_dir, tmp_path):
+        pytest.importorskip('pyarrow')
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), output_format='parquet')
+        csv_dir = tmp_path / "csv"
+        main.run_pipeline(str(input_dir), str(csv_dir))
+        loaded = pd.read_parquet(tmp_path / "out" / "sample_FINAL.parquet")
+        expected = pd.read_csv(csv_dir / "sample_FINAL.csv")
+        assert list(loaded.columns) == list(expected.columns)
+        assert isinstance(loaded['age_group'].dtype, pd.CategoricalDtype)
+        assert loaded['spending_ratio_bin'].astype(str).tolist() == expected['spending_ratio_bin'].tolist()
+
+    def test_streaming_parquet_output(self, input_dir, tmp_path):
+        pytest.importorskip('pyarrow')
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), chunksize=100, output_format='parquet')
+        assert len(pd.read_parquet(tmp_path / "out" / "sample_FINAL.parquet")) == 300
+
+
+# ─────────────────────────────────────────────
+#  REFERENCE CLOCK
+# ─────────────────────────────────────────────
+
+class TestAsOf:
+
+    def test_same_as_of_same_bytes(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "a"), as_of='2025-01-01')
+        main.run_pipeline(str(input_dir), str(tmp_path / "b"), chunksize=100, as_of='2025-01-01')
+        assert read_outputs(tmp_path / "a") == read_outputs(tmp_path / "b")
+        assert main.read_metadata(str(tmp_path / "a"))['as_of'] == '2025-01-01T00:00:00'
+
+    def test_as_of_drives_recency(self):
+        df = pd.DataFrame({'purchase_date': pd.to_datetime(['2024-12-20', '2024-06-01'])})
+        result = time_based_feature_extraction(df, as_of='2025-01-01')
+        assert result['purchase_date_days_from_today'].tolist() == [12, 214]
+        assert result['purchase_date_is_recent'].tolist() == [1, 0]
+
+    def test_refresh_matches_full_run(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "moved"), save_steps=True, as_of='2025-01-01')
+        main.refresh_recency(str(tmp_path / "moved"), as_of='2025-03-15')
+        main.run_pipeline(str(input_dir), str(tmp_path / "fresh"), save_steps=True, as_of='2025-03-15')
+        assert read_outputs(tmp_path / "moved") == read_outputs(tmp_path / "fresh")
+
+    def test_refresh_of_projected_output_raises(self, input_dir, tmp_path):
+        out = tmp_path / "projected"
+        main.run_pipeline(str(input_dir), str(out), features=['purchase_date_days_from_today'],
+                          as_of='2025-01-01')
+        before = read_outputs(out)
+        with pytest.raises(ValueError, match="purchase_date"):
+            main.refresh_recency(str(out), as_of='2025-03-15')
+        assert read_outputs(out) == before
+        assert main.read_metadata(str(out))['as_of'] == '2025-01-01T00:00:00'
+
+
+# ─────────────────────────────────────────────
+#  DATE FORMATS
+# ─────────────────────────────────────────────
+
+def write_dates(path, df, fmt, ambiguous=False):
+    """df to path with purchase_date as fmt text; ambiguous keeps the rows whose day could be a month"""
+    if ambiguous:
+        df = df[df['purchase_date'].dt.day <= 12]
+    df.assign(purchase_date=df['purchase_date'].dt.strftime(fmt)).to_csv(path, index=False)
+
+
+class TestDateFormats:
+
+    @pytest.fixture
+    def frame(self, input_dir):
+        return pd.read_csv(input_dir / "sample.csv", parse_dates=['purchase_date'])
+
+    def test_formats_decided_per_file(self, frame, tmp_path):
+        (tmp_path / "both").mkdir()
+        (tmp_path / "alone").mkdir()
+        write_dates(tmp_path / "both" / "a.csv", frame, '%d/%m/%Y')
+        write_dates(tmp_path / "both" / "b.csv", frame, '%d/%m/%Y', ambiguous=True)
+        write_dates(tmp_path / "alone" / "b.csv", frame, '%d/%m/%Y', ambiguous=True)
+        main.run_pipeline(str(tmp_path / "alone"), str(tmp_path / "out_alone"), as_of='2025-01-01')
+        main.run_pipeline(str(tmp_path / "both"), str(tmp_path / "out_both"), as_of='2025-01-01')
+        assert (tmp_path / "out_both" / "b_FINAL.csv").read_bytes() == \
+            (tmp_path / "out_alone" / "b_FINAL.csv").read_bytes()
+
+    def test_delta_parses_as_the_first_run(self, frame, tmp_path):
+        source = tmp_path / "in" / "sample.csv"
+        source.parent.mkdir()
+        write_dates(source, frame.iloc[:150], '%d/%m/%Y')
+        main.run_pipeline(str(source.parent), str(tmp_path / "out"), as_of='2025-01-01', incremental=True)
+        # another file in the same process, whose dates are month first
+        (tmp_path / "other").mkdir()
+        write_dates(tmp_path / "other" / "other.csv", frame, '%m/%d/%Y')
+        main.run_pipeline(str(tmp_path / "other"), str(tmp_path / "other_out"), as_of='2025-01-01')
+
+        lines = source.read_text()
+        write_dates(source, frame.iloc[150:], '%d/%m/%Y', ambiguous=True)
+        delta = source.read_text().split('\n', 1)[1]
+        source.write_text(lines + delta)
+        main.run_pipeline(str(source.parent), str(tmp_path / "out"), as_of='2025-01-01', incremental=True)
+        months = pd.read_csv(tmp_path / "out" / "sample_FINAL.csv")['purchase_date_month']
+        dates = frame['purchase_date']
+        expected = pd.concat([dates.iloc[:150], dates.iloc[150:][dates.iloc[150:].dt.day <= 12]])
+        assert months.tolist() == expected.dt.month.tolist()
+
+
+# ─────────────────────────────────────────────
+#  RESULT CACHE
+# ─────────────────────────────────────────────
+
+class TestResultCache:
+
+    def test_rerun_restores_outputs(self, input_dir, tmp_path, capsys):
+        options = dict(save_steps=True, as_of='2025-01-01', cache_dir=str(tmp_path / "cache"))
+        main.run_pipeline(str(input_dir), str(tmp_path / "first"), **options)
+        main.run_pipeline(str(input_dir), str(tmp_path / "second"), **options)
+        assert "Cache     : 1 hit(s), 0 miss(es)" in capsys.readouterr().out
+        assert read_outputs(tmp_path / "first") == read_outputs(tmp_path / "second")
+
+    def test_changed_input_or_params_miss(self, input_dir, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"))
+        path = input_dir / "sample.csv"
+        key = cache.key(path, {'as_of': '2025-01-01'})
+        assert cache.key(path, {'as_of': '2025-01-02'}) != key
+        with open(path, 'a') as f:
+            f.write("301,30,Male,PhD,50000,100.0,2024-05-05,Books,North,4.0,10.0,5.0\n")
+        assert cache.key(path, {'as_of': '2025-01-01'}) != key
+
+    def test_execution_mode_and_main_are_part_of_the_key(self, input_dir, tmp_path, capsys):
+        options = dict(as_of='2025-01-01', cache_dir=str(tmp_path / "cache"))
+        main.run_pipeline(str(input_dir), str(tmp_path / "memory"), **options)
+        main.run_pipeline(str(input_dir), str(tmp_path / "chunked"), chunksize=100, **options)
+        assert "Cache     : 0 hit(s), 1 miss(es)" in capsys.readouterr().out
+        assert os.path.abspath(main.__file__) in code_files()
+
+    def test_lru_eviction(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"), max_bytes=2500)
+        for i, name in enumerate(['a', 'b', 'c']):
+            out = tmp_path / f"{name}_FINAL.csv"
+            out.write_bytes(b"x" * 1000)
+            cache.store(name, [str(out)], {'rows': i})
+            os.utime(tmp_path / "cache" / name / "entry.json", (i, i))
+        assert cache.restore('a', str(tmp_path)) is None
+        assert cache.restore('c', str(tmp_path)) == {'rows': 2}
+        assert cache.stats['evicted'] == 1
+
+
+# ─────────────────────────────────────────────
+#  INCREMENTAL MODE
+# ─────────────────────────────────────────────
+
+def split_input(input_dir, keep):
+    """Truncate sample.csv to its first `keep` rows; the rest is returned as CSV lines"""
+    path = input_dir / "sample.csv"
+    lines = path.read_text().splitlines(keepends=True)
+    path.write_text(''.join(lines[:keep + 1]))
+    return lines[keep + 1:]
+
+
+class TestIncrementalMode:
+
+    def test_first_run_matches_full_run(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "full"), save_steps=True, as_of='2025-01-01')
+        main.run_pipeline(str(input_dir), str(tmp_path / "inc"), save_steps=True, as_of='2025-01-01',
+                          incremental=True)
+        for name in os.listdir(tmp_path / "full"):
+            if name.endswith('.csv'):
+                assert (tmp_path / "full" / name).read_bytes() == (tmp_path / "inc" / name).read_bytes()
+
+    def test_first_run_matches_full_run_beyond_the_sketch(self, tmp_path):
+        generate_sample_data.write_sample(str(tmp_path / "input" / "big.csv"), 10_000, today='2025-01-01')
+        main.run_pipeline(str(tmp_path / "input"), str(tmp_path / "full"), as_of='2025-01-01')
+        main.run_pipeline(str(tmp_path / "input"), str(tmp_path / "inc"), as_of='2025-01-01',
+                          incremental=True)
+        assert (tmp_path / "full" / "big_FINAL.csv").read_bytes() == \
+            (tmp_path / "inc" / "big_FINAL.csv").read_bytes()
+
+    def test_appended_rows_only(self, input_dir, tmp_path):
+        rest = split_input(input_dir, 200)
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), as_of='2025-01-01', incremental=True)
+        before = (out / "sample_FINAL.csv").read_text()
+
+        with open(input_dir / "sample.csv", 'a') as f:
+            f.write(''.join(rest))
+        results = main.run_pipeline(str(input_dir), str(out), as_of='2025-01-01', incremental=True)
+        assert results['sample.csv']['new_rows'] == 100
+        after = (out / "sample_FINAL.csv").read_text()
+        assert after.startswith(before)
+        assert len(pd.read_csv(out / "sample_FINAL.csv")) == 300
+
+        results = main.run_pipeline(str(input_dir), str(out), as_of='2025-01-01', incremental=True)
+        assert results['sample.csv']['new_rows'] == 0
+
+    def test_running_statistics_match_full_fit(self, input_dir, tmp_path):
+        full = FeaturePipeline().fit_csv(input_dir / "sample.csv").params
+        rest = split_input(input_dir, 120)
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), incremental=True)
+        with open(input_dir / "sample.csv", 'a') as f:
+            f.write(''.join(rest))
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), incremental=True)
+
+        stats = GlobalStatistics.load(tmp_path / "out" / ".incremental" / "sample").finalize()
+        assert stats['price_edges'] == full['price_edges']
+        assert stats['frequencies']['region'] == pytest.approx(full['frequencies']['region'])
+        for col, expected in full['thresholds'].items():
+            assert stats['thresholds'][col] == pytest.approx(expected)
+
+    def test_state_does_not_grow_with_the_history(self, tmp_path):
+        # Past about 3k values per column the quantile sketches stop growing
+        path = tmp_path / "input" / "big.csv"
+        generate_sample_data.write_sample(str(path), 16_000, today='2025-01-01')
+        lines = path.read_text().splitlines(keepends=True)
+        out = tmp_path / "out"
+        state = out / ".incremental" / "big"
+        for end in [8000, 12_000, 16_000]:
+            path.write_text(''.join(lines[:end + 1]))
+            main.run_pipeline(str(tmp_path / "input"), str(out), as_of='2025-01-01', incremental=True)
+            stats = GlobalStatistics.load(state)
+            assert stats.rows == end and not stats.values
+            for sketch in stats.detector.sketches.values():
+                assert sum(len(items) for items in sketch.levels) <= 3 * sketch.k
+        assert sorted(f.name for f in state.iterdir()) == ['statistics.json', 'watermark.json']
+
+    def test_exact_quantiles_keep_every_value(self, input_dir, tmp_path):
+        full = FeaturePipeline().fit_csv(input_dir / "sample.csv").params
+        rest = split_input(input_dir, 120)
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), incremental=True, exact_quantiles=True)
+        with open(input_dir / "sample.csv", 'a') as f:
+            f.write(''.join(rest))
+        main.run_pipeline(str(input_dir), str(out), incremental=True, exact_quantiles=True)
+
+        stats = GlobalStatistics.load(out / ".incremental" / "sample")
+        assert len(stats.values['final_price'][0]) == 300
+        params = stats.finalize()
+        assert params['price_edges'] == full['price_edges']
+        assert params['thresholds']['income']['q1'] == full['thresholds']['income']['q1']
+
+    def test_high_cardinality_columns_keep_their_schema(self, input_dir, tmp_path):
+        path = input_dir / "sample.csv"
+        df = pd.read_csv(path)
+        df['product_category'] = [f'SKU{i % 60:02d}' for i in range(len(df))]
+        df.to_csv(path, index=False)
+        rest = split_input(input_dir, 150)
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+        with open(path, 'a') as f:
+            f.write(''.join(rest).replace('SKU59', 'SKU99'))
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+        final = pd.read_csv(out / "sample_FINAL.csv")
+        assert len(final) == 300 and 'product_category__other' in final.columns
+        assert not final.isna().any().any()
+
+    @pytest.mark.parametrize('output_format', ['csv', 'npy'])
+    def test_new_low_cardinality_category_keeps_the_schema(self, input_dir, tmp_path, output_format):
+        rest = split_input(input_dir, 200)
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), incremental=True, output_format=output_format)
+        with open(input_dir / "sample.csv", 'a') as f:
+            f.write(''.join(rest).replace('Electronics', 'Toys').replace('Female', 'Unknown'))
+        main.run_pipeline(str(input_dir), str(out), incremental=True, output_format=output_format)
+
+        final = pd.read_csv(out / "sample_FINAL.csv") if output_format == 'csv' else \
+            read_npy_columns(out / "sample_FINAL.npy")
+        assert len(final) == 300
+        assert not any(c.endswith(('_Toys', '_Unknown')) for c in final.columns)
+        appended = final.iloc[200:]
+        toys = (appended['product_category'] == 'Toys').to_numpy()
+        assert toys.any()
+        onehot = [c for c in final.columns if c.startswith('product_category_')]
+        assert (appended.loc[toys, onehot] == 0).all().all()
+
+    def test_delta_without_dates_keeps_the_header(self, input_dir, tmp_path):
+        rest = split_input(input_dir, 200)
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+        undated = [line.split(',') for line in rest]
+        for fields in undated:
+            fields[6] = ''      # purchase_date
+        with open(input_dir / "sample.csv", 'a') as f:
+            f.write(''.join(','.join(fields) for fields in undated))
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+
+        final = pd.read_csv(out / "sample_FINAL.csv")
+        assert len(final) == 300
+        assert final['purchase_date_year'].iloc[:200].notna().all()
+        assert final['purchase_date_year'].iloc[200:].isna().all()
+
+    def test_delta_with_a_missing_int_writes_int_text(self, input_dir, tmp_path):
+        rest = split_input(input_dir, 200)
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+        fields = rest[0].split(',')
+        fields[1] = ''      # age
+        rest[0] = ','.join(fields)
+        with open(input_dir / "sample.csv", 'a') as f:
+            f.write(''.join(rest))
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+
+        final = pd.read_csv(out / "sample_FINAL.csv", dtype=str)
+        assert len(final) == 300
+        for col in ['age', 'age_squared', 'income']:
+            values = final[col].dropna()
+            assert not values.str.contains('.', regex=False).any()
+        assert final['age'].isna().sum() == 1
+
+    def test_rewritten_file_is_reprocessed(self, input_dir, tmp_path):
+        out = tmp_path / "out"
+        main.run_pipeline(str(input_dir), str(out), incremental=True)
+        split_input(input_dir, 50)
+        results = main.run_pipeline(str(input_dir), str(out), incremental=True)
+        assert results['sample.csv']['new_rows'] == 50
+        assert len(pd.read_csv(out / "sample_FINAL.csv")) == 50
+
+
+# ─────────────────────────────────────────────
+#  INSTRUMENTATION
+# ─────────────────────────────────────────────
+
+def read_metrics(output_dir):
+    with open(os.path.join(output_dir, main.METRICS_FILE)) as f:
+        return json.load(f)
+
+
+class TestInstrumentation:
+
+    def test_metrics_file_covers_every_step(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), save_steps=True)
+        stages = {r['stage']: r for r in read_metrics(tmp_path / "out")['files']['sample.csv']['stages']}
+        assert list(stages) == ['read_csv'] + STEP_NAMES[:1] + ['write'] + STEP_NAMES[1:]
+        assert stages['write']['calls'] == 5
+        assert all(r['rows'] == 300 and r['seconds'] > 0 for r in stages.values() if r['stage'] != 'write')
+
+    def test_streaming_chunks_add_up(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), chunksize=100)
+        stages = {r['stage']: r for r in read_metrics(tmp_path / "out")['files']['sample.csv']['stages']}
+        assert stages['read_csv']['calls'] == 3 and stages['read_csv']['rows'] == 300
+        assert stages['flag_anomalies_column']['rows'] == 300
+
+    def test_cprofile_hook_writes_profiles(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), profile='cprofile')
+        profiles = read_metrics(tmp_path / "out")['files']['sample.csv']['profiles']
+        assert len(profiles) == 7 and all(os.path.exists(p) for p in profiles)
+
+    def test_tracemalloc_peak(self):
+        metrics = StepMetrics(profile='tracemalloc')
+        with metrics.measure('alloc', 10):
+            block = np.ones(2**20)
+        metrics.close()
+        assert metrics.records()[0]['traced_peak_mb'] >= 8
+        del block
+
+    def test_without_resource_module(self, monkeypatch):
+        """Windows has neither /proc nor the resource module"""
+        from src import instrumentation
+        monkeypatch.setitem(sys.modules, 'resource', None)
+        monkeypatch.setattr(instrumentation, '_status_mb', lambda field: None)
+        assert instrumentation.peak_rss_mb() is None and instrumentation.children_peak_rss_mb() is None
+        metrics = StepMetrics()
+        with metrics.measure('step', rows=3):
+            pass
+        assert metrics.records()[0]['peak_delta_mb'] is None
+        code = "import sys; sys.modules['resource'] = None; import main, benchmark"
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(main.__file__) or '.')
+
+
+# ─────────────────────────────────────────────
+#  COLUMN PROJECTION
+# ─────────────────────────────────────────────
+
+class TestColumnProjection:
+
+    def test_reads_only_the_needed_columns(self, input_dir):
+        projection = Projection.from_csv(str(input_dir / "sample.csv"), ['price_quartile', 'income_is_anomaly'])
+        # price_quartile comes from final_price, which needs the cost columns
+        assert projection.sources == ['income', 'purchase_amount', 'discount_percent', 'shipping_cost']
+        time_only = Projection.from_csv(str(input_dir / "sample.csv"), ['time'])
+        assert time_only.sources == ['purchase_date']
+
+    @pytest.mark.parametrize("options", [{}, {'chunksize': 100}, {'row_workers': 2}])
+    def test_requested_columns_match_full_run(self, input_dir, tmp_path, options):
+        features = ['anomaly', 'price_quartile', 'purchase_date_month', 'gender_Male']
+        main.run_pipeline(str(input_dir), str(tmp_path / "full"), as_of='2025-01-01')
+        main.run_pipeline(str(input_dir), str(tmp_path / "proj"), as_of='2025-01-01', features=features,
+                          **options)
+        full = pd.read_csv(tmp_path / "full" / "sample_FINAL.csv")
+        projected = pd.read_csv(tmp_path / "proj" / "sample_FINAL.csv")
+        assert {'anomaly_score', 'income_is_anomaly', 'price_quartile', 'gender_Male'} <= set(projected.columns)
+        assert 'age_group' not in projected.columns and 'income' not in projected.columns
+        pd.testing.assert_frame_equal(projected, full[list(projected.columns)])
+
+    def test_passthrough_keeps_every_input_column(self, input_dir, tmp_path):
+        main.run_pipeline(str(input_dir), str(tmp_path / "out"), features=['bin'], passthrough=True)
+        source = pd.read_csv(input_dir / "sample.csv")
+        output = pd.read_csv(tmp_path / "out" / "sample_FINAL.csv")
+        assert list(output.columns[:source.shape[1]]) == list(source.columns)
+        assert 'price_quartile' in output.columns and 'gender_Male' not in output.columns
+        pd.testing.assert_frame_equal(output[source.columns], source)
+
+    @pytest.mark.parametrize("options", [{}, {'workers': 2}, {'overlap': True}])
+    def test_file_lacking_a_requested_column_fails_alone(self, input_dir, tmp_path, options):
+        pd.read_csv(input_dir / "sample.csv").drop(columns='region').to_csv(input_dir / "a.csv", index=False)
+        results = main.run_pipeline(str(input_dir), str(tmp_path / "out"),
+                                    features=['region', 'income_is_anomaly'], **options)
+        assert list(results) == ['sample.csv']
+        assert os.path.exists(tmp_path / "out" / "sample_FINAL.csv")
+        assert not os.path.exists(tmp_path / "out" / "a_FINAL.csv")
+
+    def test_unknown_feature_and_incremental_are_rejected(self, input_dir, tmp_path):
+        with pytest.raises(ValueError, match="Unknown feature"):
+            Projection.from_csv(str(input_dir / "sample.csv"), ['no_such_column'])
+        with pytest.raises(ValueError):
+            main.run_pipeline(str(input_dir), str(tmp_path / "out"), features=['bin'], incremental=True)
+
+
+# ─────────────────────────────────────────────
+#  CSV READERS
+# ─────────────────────────────────────────────
+
+class TestCsvReaders:
+
+    def test_pyarrow_frame_matches_pandas(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        path = tmp_path / "mixed.csv"
+        path.write_text("age,income,gender,code,purchase_date\n"
+                        "30,,None,7,2024-01-01\n41,52000,,x,\n,61000,Male,9,2024-02-01\n")
+        expected = pd.read_csv(path)
+        for name in ('pyarrow', 'pyarrow+mmap'):
+            pd.testing.assert_frame_equal(get_reader(name).read(str(path)), expected)
+
+    def test_pyarrow_falls_back_on_undeclared_text(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        path = tmp_path / "bad.csv"
+        path.write_text("age,rating\n30,4.5\nunknown,3.0\n")
+        pd.testing.assert_frame_equal(get_reader('pyarrow').read(str(path)), pd.read_csv(path))
+
+    def test_int_column_with_missing_values(self, input_dir, tmp_path, monkeypatch):
+        pytest.importorskip('pyarrow')
+        df = pd.read_csv(input_dir / "sample.csv")
+        df.loc[250, 'age'] = np.nan
+        df.to_csv(input_dir / "sample.csv", index=False)    # every age written as 43.0
+        path = str(input_dir / "sample.csv")
+        pd.testing.assert_frame_equal(get_reader('pyarrow').read(path), pd.read_csv(path))
+        chunks = list(get_reader('pyarrow').chunks(path, 100))
+        pd.testing.assert_frame_equal(pd.concat(chunks), pd.read_csv(path))
+
+    @pytest.mark.parametrize("options", [{}, {'chunksize': 100}])
+    def test_float_text_after_the_first_block(self, input_dir, tmp_path, monkeypatch, options):
+        pytest.importorskip('pyarrow')
+        monkeypatch.setattr(readers, 'BLOCK_SIZE', 2048)
+        path = input_dir / "sample.csv"
+        lines = path.read_text().splitlines(keepends=True)
+        for i in range(150, len(lines)):
+            fields = lines[i].split(',')
+            fields[1] = '' if i == 250 else fields[1] + '.0'    # age, as pandas writes it with a NaN
+            lines[i] = ','.join(fields)
+        path.write_text(''.join(lines))
+        assert pd.read_csv(path)['age'].dtype == np.float64
+        pd.testing.assert_frame_equal(get_reader('pyarrow').read(str(path)), pd.read_csv(path))
+
+        main.run_pipeline(str(input_dir), str(tmp_path / "pandas"), as_of='2025-01-01', **options)
+        main.run_pipeline(str(input_dir), str(tmp_path / "arrow"), as_of='2025-01-01', reader='pyarrow',
+                          **options)
+        assert read_outputs(tmp_path / "pandas") == read_outputs(tmp_path / "arrow")
+
+    def test_chunks_are_indexed_like_pandas(self, input_dir):
+        pytest.importorskip('pyarrow')
+        path = str(input_dir / "sample.csv")
+        expected = list(pd.read_csv(path, chunksize=128))
+        chunks = list(get_reader('pyarrow').chunks(path, 128, usecols=['age', 'gender']))
+        assert [len(c) for c in chunks] == [128, 128, 44]
+        for chunk, want in zip(chunks, expected):
+            pd.testing.assert_frame_equal(chunk, want[['age', 'gender']])
+
+    @pytest.mark.parametrize("options", [{}, {'chunksize': 100}])
+    def test_pipeline_output_is_identical(self, input_dir, tmp_path, options):
+        pytest.importorskip('pyarrow')
+        main.run_pipeline(str(input_dir), str(tmp_path / "pandas"), as_of='2025-01-01', **options)
+        main.run_pipeline(str(input_dir), str(tmp_path / "arrow"), as_of='2025-01-01', reader='pyarrow',
+                          **options)
+        assert read_outputs(tmp_path / "pandas") == read_outputs(tmp_path / "arrow")
+
+    def test_unknown_reader(self):
+        with pytest.raises(ValueError, match="Unknown reader"):
+            get_reader('polars')
+
+
+# ─────────────────────────────────────────────
+#  OVERLAPPED I/O
+# ─────────────────────────────────────────────
+
+class TestOverlappedIO:
+
+    def test_overlap_matches_serial(self, input_dir, tmp_path):
+        df = pd.read_csv(input_dir / "sample.csv")
+        df.iloc[:120].to_csv(input_dir / "part_a.csv", index=False)
+        (input_dir / "broken.csv").write_text("")
+        serial = main.run_pipeline(str(input_dir), str(tmp_path / "serial"), save_steps=True)
+        overlapped = main.run_pipeline(str(input_dir), str(tmp_path / "overlap"), save_steps=True,
+                                       overlap=True)
+        assert set(overlapped) == {'sample.csv', 'part_a.csv'}
+        assert overlapped == serial
+        assert read_outputs(tmp_path / "serial") == read_outputs(tmp_path / "overlap")
+        stages = [s['stage'] for s in read_metrics(tmp_path / "overlap")['files']['sample.csv']['stages']]
+        assert {'read_wait', 'read_csv', 'write_wait', 'write'} <= set(stages)
+
+    def test_write_queue_is_bounded(self, tmp_path):
+        loaded = []
+        io = OverlappedIO(lambda key: loaded.append(key) or key.upper(), max_pending=1)
+        io.prefetch('a')
+        assert io.load('a')[0] == 'A' and loaded == ['a']
+        release = threading.Event()
+        io._writer.submit(release.wait)     # the writer thread is busy
+        df = pd.DataFrame({'x': [1, 2]})
+        io.write('a', df, str(tmp_path / "a.csv"))
+        blocked = threading.Thread(target=io.write, args=('a', df, str(tmp_path / "b.csv")))
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive()           # the queue holds one write
+        release.set()
+        blocked.join()
+        assert [rows for rows, _, _ in io.finish('a')] == [2, 2]
+        io.close()
+
+    def test_write_errors_surface_on_finish(self, tmp_path):
+        io = OverlappedIO(lambda key: key)
+        io.write('a', pd.DataFrame({'x': [1]}), str(tmp_path / "missing" / "a.csv"))
+        with pytest.raises(OSError):
+            io.finish('a')
+        assert io.finish('a') == []
+        io.close()
+
+
+# ─────────────────────────────────────────────
+#  WATCH MODE
+# ─────────────────────────────────────────────
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDirectoryWatcher:
+
+    def test_waits_for_the_file_to_settle(self, tmp_path):
+        clock = FakeClock()
+        watcher = DirectoryWatcher(str(tmp_path), settle_seconds=10, clock=clock)
+        path = tmp_path / "export.csv"
+        path.write_text("a,b\n1,2\n")
+        (tmp_path / ".partial.csv").write_text("a\n")
+        (tmp_path / "notes.txt").write_text("x")
+        assert watcher.poll() == []
+        clock.now = 5
+        with open(path, 'a') as f:
+            f.write("3,4\n")      # still being written: the wait starts over
+        assert watcher.poll() == []
+        clock.now = 12
+        assert watcher.poll() == []
+        clock.now = 15
+        [(name, signature)] = watcher.poll()
+        assert name == 'export.csv'
+        assert watcher.poll(exclude={'export.csv'}) == []
+
+    def test_done_files_return_only_when_changed(self, tmp_path):
+        clock = FakeClock()
+        watcher = DirectoryWatcher(str(tmp_path), settle_seconds=0, clock=clock)
+        path = tmp_path / "export.csv"
+        path.write_text("a,b\n1,2\n")
+        [(name, signature)] = watcher.poll()
+        watcher.done(name, signature)
+        assert watcher.poll() == []
+        with open(path, 'a') as f:
+            f.write("3,4\n")
+        assert [name for name, _ in watcher.poll()] == ['export.csv']
+
+
+class TestWatchMode:
+
+    def test_processes_files_as_they_land(self, input_dir, tmp_path):
+        expected = main.run_pipeline(str(input_dir), str(tmp_path / "batch"), as_of='2025-06-01')
+        watch_dir = tmp_path / "watched"
+        watch_dir.mkdir()
+        (watch_dir / "sample.csv").write_bytes((input_dir / "sample.csv").read_bytes())
+        results = main.watch(str(watch_dir), str(tmp_path / "out"), poll_interval=0.05,
+                             settle_seconds=0, as_of='2025-06-01', max_files=1)
+        assert results == expected
+        assert read_outputs(tmp_path / "batch") == read_outputs(tmp_path / "out")
+
+    def test_stops_when_asked(self, tmp_path):
+        stop = threading.Event()
+        stop.set()
+        assert main.watch(str(tmp_path / "in"), str(tmp_path / "out"), stop=stop) == {}
+
+
+# ─────────────────────────────────────────────
+#  BIN SPEC FILES
+# ─────────────────────────────────────────────
+
+class TestBinSpecFiles:
+
+    def test_cli_bins_reach_row_workers(self, input_dir, tmp_path):
+        # In a subprocess: the spec registers its feature for the whole process
+        spec = tmp_path / "bins.json"
+        spec.write_text('{"bins": [{"output": "age_band", "source": "age", '
+                        '"edges": [0, 40, "inf"], "labels": ["young", "older"]}]}')
+        out = tmp_path / "out"
+        subprocess.run([sys.executable, 'main.py', '--input-dir', str(input_dir), '--output-dir', str(out),
+                        '--row-workers', '2', '--bin-spec', str(spec)],
+                       cwd=os.path.join(os.path.dirname(__file__), '..'), capture_output=True, check=True)
+        final = pd.read_csv(out / "sample_FINAL.csv")
+        columns = list(final.columns)
+        assert columns[columns.index('spending_ratio_bin') + 1] == 'age_band'
+        assert (final['age_band'] == np.where(final['age'] <= 40, 'young', 'older')).all()
+
+
+# ─────────────────────────────────────────────
+#  STARTUP
+# ─────────────────────────────────────────────
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Seconds `import main` may add on top of numpy and pandas
+IMPORT_BUDGET = 0.5
+
+
+def run_python(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+                          check=True).stdout.split()
+
+
+class TestStartup:
+
+    def test_src_resolves_feature_pipeline_lazily(self):
+        loaded, pipeline = run_python(
+            "import sys, src; print('src.feature_pipeline' in sys.modules); "
+            "print(src.FeaturePipeline.__name__)")
+        assert loaded == 'False' and pipeline == 'FeaturePipeline'
+
+    def test_step_exports_survive_submodule_imports(self):
+        kinds = run_python(
+            "import main, src.derive_computed_columns, src.time_based_feature_extraction; "
+            "from src import derive_computed_columns, time_based_feature_extraction, flag_anomalies_column; "
+            "print(*[type(f).__name__ for f in (derive_computed_columns, time_based_feature_extraction, "
+            "flag_anomalies_column)])")
+        assert kinds == ['function'] * 3
+
+    def test_main_leaves_optional_modes_unloaded(self):
+        loaded = run_python(
+            "import sys, main; print(*[m in sys.modules for m in ('src.partitioned_executor', "
+            "'src.incremental_pipeline', 'src.result_cache', 'src.directory_watcher', 'src.overlapped_io')])")
+        assert loaded == ['False'] * 5
+
+    def test_main_import_budget(self):
+        seconds, scipy_loaded = run_python(
+            "import sys, time, numpy, pandas; start = time.perf_counter(); import main; "
+            "print(time.perf_counter() - start); print('scipy' in sys.modules)")
+        assert scipy_loaded == 'False'
+        assert float(seconds) < IMPORT_BUDGET
+
+
+# ─────────────────────────────────────────────
+#  BENCHMARK SUITE
+# ─────────────────────────────────────────────
+
+class TestBenchmark:
+
+    def test_generator_chunks_and_extra_columns(self, tmp_path):
+        path = generate_sample_data.write_sample(str(tmp_path / "big.csv"), 2500, chunk_rows=1000,
+                                                 today='2025-01-01', extra_categoricals=2, extra_dates=1)
+        df = pd.read_csv(path)
+        assert len(df) == 2500 and df['customer_id'].is_unique
+        assert df['extra_category_2'].nunique() == 20
+        dates = pd.to_datetime(df['purchase_date'])
+        assert dates.max() <= pd.Timestamp('2025-01-01') and dates.min() > pd.Timestamp('2024-01-01')
+
+    def test_results_cover_every_stage(self):
+        report = benchmark.run_benchmarks([300])
+        stages = [r['stage'] for r in report['results']]
+        assert stages == ['generate', 'read_csv'] + benchmark.STEPS + ['run_pipeline']
+        assert all(r['rows_per_s'] > 0 and r['peak_rss_mb'] > 0 for r in report['results'])
+
+    def test_compare_flags_regressions(self):
+        record = {'rows': 1000, 'stage': 'run_pipeline', 'seconds': 1.0, 'peak_rss_mb': 100.0}
+        slower = dict(record, seconds=1.5)
+        noise = dict(record, stage='derive_computed_columns', seconds=0.01)
+        baseline = {'results': [record, dict(noise, seconds=0.001)]}
+        regressions = benchmark.compare(baseline, {'results': [slower, noise]})
+        assert [(r[1], r[2]) for r in regressions] == [('run_pipeline', 'seconds')]